@@ -0,0 +1,235 @@
+import re
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import numpy as np
+import srt
+
+from mezclador_audio import regiones_voz_en_cache
+from sprites_subtitulos import MAX_LINEAS_SUBTITULO, cabe_en_lineas, partir_lineas
+from subtitles import format_srt_time, guardar_palabras
+
+# Proporción mínima de palabras del guion reconocidas en el audio para fiarse de los
+# tiempos de Whisper; por debajo (guion distinto al audio) se alinea por energía
+COINCIDENCIA_MINIMA = 0.3
+# Pausa entre palabras a partir de la cual se empieza un subtítulo nuevo, en segundos
+PAUSA_CORTE = 0.7
+# Fin de frase: el subtítulo se corta aquí aunque quepan más palabras
+_FIN_FRASE = re.compile(r'[.!?…:;]["»”)\]]*$')
+# Puntuación donde una voz TTS hace pausa
+_PUNTUACION = re.compile(r'[.,!?…:;]["»”)\]]*$')
+
+
+def normalizar_palabra(palabra):
+    """Forma de comparación de una palabra: minúsculas, sin tildes ni puntuación."""
+    sin_tildes = ''.join(c for c in unicodedata.normalize('NFD', palabra.lower())
+                         if unicodedata.category(c) != 'Mn')
+    return re.sub(r'[\W_]+', '', sin_tildes)
+
+
+def palabras_guion(texto):
+    """Palabras del guion tal como están escritas (con su puntuación), sin las que son solo signos."""
+    return [palabra for palabra in texto.split() if normalizar_palabra(palabra)]
+
+
+def _repartir(palabras, inicio, fin):
+    """Reparte [inicio, fin] entre las palabras en proporción a su longitud."""
+    pesos = np.array([len(normalizar_palabra(p)) + 1 for p in palabras], dtype=float)
+    bordes = inicio + (fin - inicio) * np.concatenate([[0.0], np.cumsum(pesos) / pesos.sum()])
+    return [(p, float(a), float(b)) for p, a, b in zip(palabras, bordes[:-1], bordes[1:])]
+
+
+def alinear_con_transcripcion(guion, transcritas):
+    """
+    Alinea las palabras del guion con las de una transcripción de Whisper (palabra,
+    inicio, fin). Las palabras que coinciden toman los tiempos de Whisper; las que
+    Whisper escribió distinto (nombres, cifras) se reparten el tramo de las palabras
+    transcritas que sustituyen, y las que faltan, la pausa entre sus vecinas.
+
+    Returns:
+        Tupla (palabras, coincidencia): lista de (palabra del guion, inicio, fin) y la
+        proporción de palabras del guion que coincidieron.
+    """
+    a = [normalizar_palabra(p) for p in guion]
+    b = [normalizar_palabra(p) for p, _, _ in transcritas]
+    tiempos = [None] * len(guion)
+    coincidentes = 0
+    for operacion, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if operacion == 'equal':
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                tiempos[i] = transcritas[j][1:]
+            coincidentes += i2 - i1
+        elif operacion == 'replace':
+            for i, (_, inicio, fin) in zip(range(i1, i2), _repartir(guion[i1:i2], transcritas[j1][1],
+                                                                   transcritas[j2 - 1][2])):
+                tiempos[i] = (inicio, fin)
+
+    # Palabras que Whisper no oyó: se reparten el hueco entre la anterior y la siguiente
+    principio = transcritas[0][1] if transcritas else 0.0
+    final = transcritas[-1][2] if transcritas else 0.0
+    i = 0
+    while i < len(guion):
+        if tiempos[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(guion) and tiempos[j] is None:
+            j += 1
+        inicio = tiempos[i - 1][1] if i > 0 else principio
+        fin = tiempos[j][0] if j < len(guion) else final
+        for k, (_, a_k, b_k) in zip(range(i, j), _repartir(guion[i:j], inicio, max(inicio, fin))):
+            tiempos[k] = (a_k, b_k)
+        i = j
+
+    palabras = [(p, float(inicio), float(fin)) for p, (inicio, fin) in zip(guion, tiempos)]
+    return palabras, coincidentes / max(1, len(guion))
+
+
+def alinear_por_energia(guion, regiones):
+    """
+    Alineación sin Whisper: reparte las palabras del guion entre las regiones habladas
+    de la voz (mezclador_audio.detectar_regiones_voz). Cada pausa de la voz se asigna
+    al signo de puntuación del guion que cae más cerca en proporción de texto (la voz
+    TTS hace sus pausas ahí), y dentro de cada región las palabras se reparten por su
+    longitud. Con una voz de ritmo constante los subtítulos quedan a unas décimas.
+
+    Returns:
+        Lista de (palabra del guion, inicio, fin).
+    """
+    if not guion or not regiones:
+        return []
+    duraciones = np.array([fin - inicio for inicio, fin in regiones], dtype=float)
+    fraccion_pausas = np.cumsum(duraciones)[:-1] / duraciones.sum()
+    pesos = np.array([len(normalizar_palabra(p)) + 1 for p in guion], dtype=float)
+    fraccion_palabras = np.concatenate([[0.0], np.cumsum(pesos) / pesos.sum()])
+    puntuacion = [i + 1 for i, p in enumerate(guion[:-1]) if _PUNTUACION.search(p)]
+
+    # Palabra del guion en la que empieza cada región
+    cortes = [0]
+    for k, objetivo in enumerate(fraccion_pausas):
+        # Un signo de puntuación vale si queda a menos de media región contigua de la pausa
+        tolerancia = 0.5 * max(duraciones[k], duraciones[k + 1]) / duraciones.sum()
+        candidatos = [i for i in puntuacion if i > cortes[-1]]
+        corte = min(candidatos, key=lambda i: abs(fraccion_palabras[i] - objetivo)) if candidatos else None
+        if corte is None or abs(fraccion_palabras[corte] - objetivo) > tolerancia:
+            corte = int(np.clip(np.searchsorted(fraccion_palabras, objetivo), cortes[-1], len(guion)))
+        cortes.append(corte)
+    cortes.append(len(guion))
+
+    palabras = []
+    for (inicio, fin), desde, hasta in zip(regiones, cortes, cortes[1:]):
+        if hasta > desde:
+            palabras += _repartir(guion[desde:hasta], float(inicio), float(fin))
+    return palabras
+
+
+def agrupar_en_lineas(palabras, max_chars_per_line=42, max_words_per_line=10, pausa_corte=PAUSA_CORTE,
+                      estilo=None, max_lineas=MAX_LINEAS_SUBTITULO):
+    """
+    Agrupa palabras con tiempos en subtítulos, cortando por longitud, por número de
+    palabras, al final de cada frase y en las pausas largas. Con `estilo`, la longitud
+    es el ancho en píxeles del render: cada subtítulo cabe en `max_lineas` líneas.
+
+    Returns:
+        Lista de (inicio, fin, [(palabra, inicio, fin), ...]).
+    """
+    lineas = []
+    actual = []
+    for i, palabra in enumerate(palabras):
+        actual.append(palabra)
+        texto = " ".join(p for p, _, _ in actual)
+        siguiente = palabras[i + 1] if i + 1 < len(palabras) else None
+        if estilo is not None:
+            lleno = (len(actual) >= max_words_per_line * max_lineas
+                     or (siguiente is not None
+                         and not cabe_en_lineas(f"{texto} {siguiente[0]}", estilo, max_lineas)))
+        else:
+            lleno = len(texto) >= max_chars_per_line or len(actual) >= max_words_per_line
+        if (siguiente is None or lleno or _FIN_FRASE.search(palabra[0])
+                or siguiente[1] - palabra[2] >= pausa_corte):
+            lineas.append((actual[0][1], max(actual[-1][2], actual[0][1]), actual))
+            actual = []
+    return lineas
+
+
+def generar_srt_desde_guion(archivo_guion, archivo_audio, archivo_srt, palabras_audio=None,
+                            max_chars_per_line=42, max_words_per_line=10, cache_dir=None, estilo=None):
+    """
+    Genera el SRT de una narración cuyo texto ya se conoce (guion.txt) con la
+    redacción exacta del guion: solo se calculan los tiempos. Con la transcripción de
+    un modelo pequeño (palabras_audio) las palabras toman los tiempos de Whisper; sin
+    ella, o si el guion no se parece al audio, se reparten por la energía de la voz.
+
+    Args:
+        archivo_guion: Texto de la narración.
+        archivo_audio: Voz en off.
+        archivo_srt: Ruta del SRT de salida (los tiempos por palabra se guardan al lado).
+        palabras_audio: Lista opcional de (palabra, inicio, fin) transcritas con Whisper.
+        max_chars_per_line: Límite de caracteres por subtítulo.
+        max_words_per_line: Límite de palabras por subtítulo.
+        cache_dir: Carpeta de la caché de análisis de la voz (por defecto, .cache/analisis
+                   junto al audio).
+        estilo: SubtitleStyle del render, para agrupar por ancho en píxeles.
+
+    Returns:
+        True si el SRT se generó correctamente.
+    """
+    inicio_proceso = time.perf_counter()
+    try:
+        with open(archivo_guion, 'r', encoding='utf-8') as f:
+            guion = palabras_guion(f.read())
+    except OSError as e:
+        print(f"ERROR SRT: No se pudo leer el guion {archivo_guion}: {e}")
+        return False
+    if not guion:
+        print(f"ERROR SRT: El guion está vacío: {archivo_guion}")
+        return False
+
+    palabras = None
+    if palabras_audio:
+        palabras, coincidencia = alinear_con_transcripcion(guion, palabras_audio)
+        print(f" - Alineación con Whisper: {coincidencia:.0%} de las palabras del guion reconocidas")
+        if coincidencia < COINCIDENCIA_MINIMA:
+            print(" - El guion no coincide con el audio; se alinea por energía")
+            palabras = None
+    if palabras is None:
+        if cache_dir is None:
+            cache_dir = Path(archivo_audio).parent / '.cache' / 'analisis'
+        regiones = regiones_voz_en_cache(archivo_audio, cache_dir)
+        palabras = alinear_por_energia(guion, regiones)
+        print(f" - Alineación por energía en {len(regiones)} regiones habladas")
+        if not palabras:
+            print("ERROR SRT: No se detectó voz en el audio.")
+            return False
+
+    entradas = escribir_srt_palabras(palabras, archivo_srt, max_chars_per_line, max_words_per_line, estilo)
+    print(f"SRT alineado con el guion: {entradas} entradas en {archivo_srt} "
+          f"({time.perf_counter() - inicio_proceso:.1f} s)")
+    return True
+
+
+def escribir_srt_palabras(palabras, archivo_srt, max_chars_per_line=42, max_words_per_line=10, estilo=None):
+    """
+    Escribe un SRT a partir de palabras con tiempos, y sus tiempos por palabra al lado
+    (para el karaoke). Con `estilo`, cada subtítulo se escribe ya partido en líneas
+    equilibradas que caben en el ancho del render.
+
+    Returns:
+        Número de subtítulos escritos.
+    """
+    lineas = agrupar_en_lineas(palabras, max_chars_per_line, max_words_per_line, estilo=estilo)
+    subtitulos = []
+    for n, (inicio, fin, linea) in enumerate(lineas, start=1):
+        texto = " ".join(p for p, _, _ in linea)
+        if estilo is not None:
+            texto = "\n".join(partir_lineas(texto, estilo))
+        subtitulos.append(srt.Subtitle(index=n, start=format_srt_time(inicio), end=format_srt_time(fin),
+                                       content=texto))
+    archivo_srt = Path(archivo_srt)
+    archivo_srt.parent.mkdir(parents=True, exist_ok=True)
+    with open(archivo_srt, 'w', encoding='utf-8') as f:
+        f.write(srt.compose(subtitulos))
+    guardar_palabras(archivo_srt, lineas)
+    return len(subtitulos)
@@ -1,18 +1,165 @@
-from moviepy import VideoFileClip, ImageClip, AudioFileClip, concatenate_videoclips, CompositeVideoClip, vfx
-# Updated import for MoviePy 2.0+
-from moviepy.audio import fx as afx
+from moviepy import VideoFileClip, ImageClip, concatenate_videoclips, vfx
+import hashlib
 import os
-from glob import glob
+import random
+import shutil
+import time
+import numpy as np
 from pathlib import Path
 # Import the custom effects
-from efectos import ZoomEffect, PanUpEffect, PanDownEffect, PanLeftEffect, FlipEffect, PanRightEffect, KenBurnsEffect, VignetteZoomEffect, RotateEffect
+from registro_efectos import EFFECT_REGISTRY
+from ingesta import escanear_imagenes, normalizar_imagenes, RESOLUCION_SALIDA
 from transiciones import TransitionEffect
 from overlay_effects import OverlayEffect
-from subtitles import SubtitleEffect
+from subtitles import SubtitleEffect, cargar_palabras, ruta_palabras
+from sprites_subtitulos import estilo_subtitulos_video, GROSOR_BORDE_1080P
+from subtitulos_ass import escribir_ass, escribir_vtt, filtro_ass
+from mezclador_audio import (decodificar_audio, construir_cama_musical, curva_ducking, mezclar, escribir_wav,
+                             medir_loudness, ganancia_para_loudness, normalizar_mezcla, regiones_voz_en_cache,
+                             Pista, FRECUENCIA_MUESTREO)
+from planificador import planificar_duraciones, limites_desde_srt, limites_desde_regiones
+from ffmpeg_writer import escribir_escalera, escribir_reanudable, mux_subtitulos, obtener_perfil, PERFIL_FINAL, PERFIL_BORRADOR
 
-# Importar componentes específicos para subtítulos
-from moviepy.video.tools.subtitles import SubtitlesClip
-from moviepy.video.VideoClip import TextClip
+# Parámetros de crear_video_desde_imagenes que solo afectan a la codificación de las
+# salidas: cambiarlos no obliga a volver a componer el intermedio de las dos pasadas
+PARAMETROS_CODIFICACION = ('perfil_render', 'escalera', 'tamano_objetivo_mb', 'bitrate_video',
+                           'conservar_intermedio', 'reanudable', 'duracion_segmento')
+
+
+def construir_linea_de_tiempo(archivos, duracion_img=6,
+                              aplicar_efectos=True, secuencia_efectos=None,
+                              aplicar_transicion=False, tipo_transicion='none', duracion_transicion=2.0,
+                              aplicar_fade_in=False, duracion_fade_in=2.0,
+                              aplicar_fade_out=False, duracion_fade_out=2.0,
+                              aplicar_overlay=False, archivos_overlay=None, opacidad_overlay=0.3,
+                              settings=None, tamano_salida=RESOLUCION_SALIDA, ajustes_calidad=None,
+                              rng_efectos=None, cache_dir=None, progress_callback=None):
+    """
+    Construye la línea de tiempo de vídeo (efectos, transiciones, fades y overlays) sin
+    audio ni subtítulos. La usan tanto el render final como la vista previa de la GUI,
+    de modo que lo que se ve al previsualizar es exactamente lo que se renderiza.
+    
+    Args:
+        archivos: Lista ordenada de rutas de imágenes
+        duracion_img: Duración en segundos de cada imagen, o lista con la duración de
+                      cada una (p. ej. la calculada por planificador.planificar_duraciones)
+        settings: Diccionario con ajustes personalizados para los efectos
+        tamano_salida: Resolución (ancho, alto) a la que se normalizan las imágenes
+        ajustes_calidad: Ajustes que sustituyen a los de `settings` (p. ej. {'quality': 'draft'})
+        rng_efectos: Generador aleatorio para las elecciones de los efectos
+        cache_dir: Carpeta de la caché de imágenes normalizadas
+        progress_callback: Función de callback para mostrar el progreso
+        (el resto de argumentos son los mismos que en crear_video_desde_imagenes)
+    
+    Returns:
+        El clip de vídeo compuesto, o None si alguna imagen no se pudo leer.
+    """
+    if rng_efectos is None:
+        rng_efectos = random.Random()
+    
+    # Duración de cada clip: los efectos se parametrizan con la duración de su clip
+    if isinstance(duracion_img, (int, float)):
+        duraciones = [duracion_img] * len(archivos)
+    else:
+        duraciones = list(duracion_img)
+        if len(duraciones) != len(archivos):
+            print(f"ERROR: Se recibieron {len(duraciones)} duraciones para {len(archivos)} imágenes")
+            return None
+    
+    # Validar los parámetros de cada efecto distinto una sola vez
+    efectos_enlazados = {}
+    if aplicar_efectos and secuencia_efectos:
+        efectos_enlazados = EFFECT_REGISTRY.bind_sequence(secuencia_efectos, settings, ajustes_calidad)
+    
+    # Efecto asignado a cada imagen (si hay menos efectos que clips, se repite la secuencia)
+    efectos_por_imagen = []
+    for i in range(len(archivos)):
+        tipo_efecto = None
+        if aplicar_efectos and secuencia_efectos:
+            tipo_efecto = secuencia_efectos[i % len(secuencia_efectos)]
+        efecto_enlazado = efectos_enlazados.get(tipo_efecto.strip().lower()) if tipo_efecto else None
+        efectos_por_imagen.append((tipo_efecto, efecto_enlazado))
+    
+    # Normalizar todas las imágenes a la resolución de salida una sola vez
+    archivos_normalizados, errores_ingesta = normalizar_imagenes(archivos, tamano_salida, cache_dir=cache_dir)
+    if errores_ingesta:
+        # Abortar antes de empezar a codificar en lugar de fallar a mitad del render
+        print(f"ERROR: {len(errores_ingesta)} imágenes no se pudieron leer. Corrígelas o elimínalas:")
+        for archivo, mensaje in errores_ingesta:
+            print(f"  - {os.path.basename(archivo)}: {mensaje}")
+        return None
+    
+    # Crear clips de imagen
+    clips = []
+    total_imagenes = len(archivos)
+    for i, archivo in enumerate(archivos_normalizados):
+        clip = ImageClip(archivo).with_duration(duraciones[i])
+        tipo_efecto, efecto_enlazado = efectos_por_imagen[i]
+        
+        # Aplicar efectos si se solicita
+        if tipo_efecto:
+            print(f"DEBUG: Procesando imagen {i+1}, tipo_efecto = '{tipo_efecto}'")
+            if efecto_enlazado:
+                # Las instancias idénticas se reutilizan entre clips (caché del registro)
+                effect = efecto_enlazado.create(clip_duration=duraciones[i], rng=rng_efectos)
+                clip = clip.transform(effect.apply)
+                print(f"Aplicando efecto {tipo_efecto} a la imagen {i+1} ({efecto_enlazado.parametros})")
+        
+        clips.append(clip)
+        
+        # Actualizar progreso si hay un callback definido
+        if progress_callback:
+            progress_callback(1, total_imagenes)
+    
+    # Aplicar transiciones si se solicita
+    if aplicar_transicion and tipo_transicion != 'none':
+        print(f"Aplicando transición {tipo_transicion} con duración {duracion_transicion} segundos")
+        video_final = TransitionEffect.apply_transition(clips, tipo_transicion, duracion_transicion)
+    else:
+        # Concatenar clips sin transiciones
+        video_final = concatenate_videoclips(clips)
+    
+    # Aplicar fade in al inicio del video si se solicita
+    if aplicar_fade_in and duracion_fade_in > 0:
+        print(f"Aplicando fade in con duración {duracion_fade_in} segundos")
+        fade_in_effect = vfx.FadeIn(duracion_fade_in)
+        video_final = video_final.with_effects([fade_in_effect])  # Pasar como lista de efectos
+    
+    # Aplicar fade out al final del video si se solicita
+    if aplicar_fade_out and duracion_fade_out > 0:
+        print(f"Aplicando fade out con duración {duracion_fade_out} segundos")
+        fade_out_effect = vfx.FadeOut(duracion_fade_out)
+        video_final = video_final.with_effects([fade_out_effect])  # Pasar como lista de efectos
+    
+    # Aplicar overlay si se solicita
+    if aplicar_overlay and archivos_overlay:
+        print(f"Aplicando overlays: {archivos_overlay}")
+        # Verificar si tenemos múltiples overlays para aplicar secuencialmente a los clips
+        if len(archivos_overlay) > 1:
+            # Guardar los clips originales antes de aplicar transiciones
+            clips_originales = clips.copy()
+            
+            print(f"Aplicando {len(archivos_overlay)} overlays de forma secuencial a las imágenes")
+            # Aplicar overlays secuencialmente antes de las transiciones
+            clips_con_overlay = OverlayEffect.apply_sequential_overlays(clips_originales, archivos_overlay, opacidad_overlay)
+            
+            # Volver a aplicar transiciones con los clips modificados
+            if aplicar_transicion and tipo_transicion != 'none':
+                video_final = TransitionEffect.apply_transition(clips_con_overlay, tipo_transicion, duracion_transicion)
+            else:
+                video_final = concatenate_videoclips(clips_con_overlay)
+        else:
+            # Si solo hay un overlay, aplicar el overlay al video final
+            overlay_path = archivos_overlay[0]
+            print(f"Aplicando overlay {os.path.basename(overlay_path)} con opacidad {opacidad_overlay}")
+            video_final = OverlayEffect.apply_overlay(video_final, overlay_path, opacidad_overlay)
+    else:
+        if aplicar_overlay:
+            print("Se seleccionó aplicar overlay pero no se proporcionaron archivos de overlay")
+        else:
+            print("No se seleccionó aplicar overlay")
+    
+    return video_final
 
 
 def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24, 
@@ -29,8 +176,18 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
                                aplicar_fade_out_voz=False, duracion_fade_out_voz=1.0,
                                aplicar_subtitulos=False, archivo_subtitulos=None, 
                                tamano_fuente_subtitulos=None, color_fuente_subtitulos='orange',
-                               color_borde_subtitulos='black', grosor_borde_subtitulos=6,
-                               progress_callback=None, settings=None):
+                               color_borde_subtitulos='black', grosor_borde_subtitulos=GROSOR_BORDE_1080P,
+                               progress_callback=None, settings=None,
+                               resolucion_salida=RESOLUCION_SALIDA,
+                               modo_borrador=False, escala_borrador=0.5, fps_borrador=12,
+                               semilla_efectos=None, perfil_render=None, escalera=None,
+                               tamano_objetivo_mb=None, bitrate_video=None, conservar_intermedio=True,
+                               reanudable=False, duracion_segmento=10.0,
+                               aplicar_ducking=True, reduccion_ducking_db=-12.0,
+                               normalizar_loudness=True, objetivo_lufs=-14.0, nivel_musica_lu=-8.0,
+                               ajustar_a_voz=False, subtitulos_ffmpeg=False,
+                               subtitulos_pista=False, subtitulos_externos=None, idioma_subtitulos='spa',
+                               subtitulos_karaoke=False, color_resaltado_subtitulos='yellow'):
     """
     Crea un video usando recursos de una carpeta de proyecto específica.
     
@@ -71,7 +228,62 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
         grosor_borde_subtitulos: Grosor del borde de los subtítulos
         progress_callback: Función de callback para mostrar el progreso
         settings: Diccionario con ajustes personalizados para los efectos
+        resolucion_salida: Resolución final del video (ancho, alto). Todas las imágenes
+                           se normalizan a este tamaño antes de aplicar efectos
+        modo_borrador: Renderizar una vista previa rápida (resolución y fps reducidos,
+                       filtros más rápidos y preset 'ultrafast') en <proyecto>_borrador.mp4
+        escala_borrador: Fracción de la resolución de salida usada en modo borrador
+        fps_borrador: FPS máximos en modo borrador
+        semilla_efectos: Semilla para las elecciones aleatorias de los efectos (p. ej. la
+                         dirección de Ken Burns). Por defecto se deriva del nombre del
+                         proyecto, de modo que el borrador y el render final coinciden
+        perfil_render: RenderProfile o nombre de un perfil de PERFILES_RENDER con los
+                       parámetros de x264 (preset, CRF, tune, GOP). Por defecto
+                       PERFIL_FINAL, o PERFIL_BORRADOR en modo borrador
+        escalera: Lista de perfiles (nombres o RenderProfile), p. ej. ['1080p', '720p',
+                  'vertical']. La línea de tiempo se renderiza una vez a
+                  `resolucion_salida` y se codifica en <proyecto>_<perfil>.mp4 para
+                  cada perfil desde el mismo flujo de frames
+        tamano_objetivo_mb: Tamaño final objetivo en MB de cada salida. Codifica en dos
+                            pasadas a partir de un intermedio guardado en
+                            <proyecto>/.cache/render, sin volver a aplicar los efectos
+        bitrate_video: Bitrate de vídeo objetivo en kbps (dos pasadas, como el anterior)
+        conservar_intermedio: Conservar el intermedio de las dos pasadas. Si el siguiente
+                              render tiene las mismas entradas y parámetros de imagen y
+                              audio (p. ej. solo cambia el tamaño objetivo), se reutiliza
+                              sin volver a componer el vídeo. False lo borra al terminar
+        reanudable: Renderizar por segmentos alineados con el GOP en
+                    <proyecto>/.cache/render. Si el proceso se interrumpe, la siguiente
+                    ejecución con los mismos parámetros continúa desde el último
+                    segmento completo
+        duracion_segmento: Duración aproximada de cada segmento en segundos
+        aplicar_ducking: Bajar automáticamente la música mientras habla la voz en off
+        reduccion_ducking_db: Atenuación de la música bajo la voz, en dB
+        normalizar_loudness: Medir la sonoridad (EBU R128) de la voz y la música y
+                             ajustar sus ganancias y la de la mezcla final al objetivo.
+                             `volumen_voz` y `volumen_musica` actúan como ajuste fino
+        objetivo_lufs: Sonoridad integrada de la mezcla final (-14 LUFS para YouTube)
+        nivel_musica_lu: Nivel de la música respecto a la voz, en LU (antes del ducking)
+        ajustar_a_voz: Repartir la duración de la voz en off entre las imágenes en lugar
+                       de usar `duracion_img` fijo, con los cambios de imagen en las pausas
+                       de la narración (detectadas en la voz y entre subtítulos). El video
+                       dura lo mismo que la voz
+        subtitulos_ffmpeg: Quemar los subtítulos con el filtro ASS de ffmpeg (libass)
+                           durante la codificación, en lugar de dibujarlos en Python frame
+                           a frame. El estilo se traduce a un archivo .ass en
+                           <proyecto>/.cache/render
+        subtitulos_pista: Añadir los subtítulos como pista de texto (mov_text en MP4) en
+                          lugar de quemarlos. Cambiar de idioma después solo requiere
+                          ffmpeg_writer.mux_subtitulos, un remux sin recodificar
+        subtitulos_externos: Lista de formatos de archivos de subtítulos que se guardan
+                             junto a cada salida en lugar de quemarlos ('vtt', 'ass', 'srt')
+        idioma_subtitulos: Código ISO 639-2 del idioma de la pista de subtítulos
+        subtitulos_karaoke: Resaltar cada palabra mientras se pronuncia, con los tiempos por
+                            palabra que guarda la generación con Whisper (<srt>.palabras.json)
+        color_resaltado_subtitulos: Color de la palabra resaltada en modo karaoke
     """
+    # Parámetros del render (identifican un render a medias al reanudarlo)
+    parametros_render = {clave: valor for clave, valor in locals().items() if clave != 'progress_callback'}
     # Importar Path al principio de la función
     from pathlib import Path
     # Usar ajustes por defecto si no se proporcionan
@@ -94,6 +306,51 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
     output_filename_base = project_path.name  # Usa el nombre de la carpeta del proyecto
     output_video_path = project_path / f"{output_filename_base}_final.mp4"
     
+    # Resolución, fps y calidad de render (el modo borrador comparte la línea de tiempo
+    # y los parámetros de efectos; solo cambian la resolución, los fps y los filtros)
+    tamano_salida = (int(resolucion_salida[0]), int(resolucion_salida[1]))
+    ajustes_calidad = None
+    perfil = obtener_perfil(perfil_render or PERFIL_FINAL)
+    if perfil is None:
+        return
+    if modo_borrador:
+        ancho = max(2, int(tamano_salida[0] * escala_borrador))
+        alto = max(2, int(tamano_salida[1] * escala_borrador))
+        tamano_salida = (ancho + ancho % 2, alto + alto % 2)
+        fps = min(fps, fps_borrador)
+        ajustes_calidad = {'quality': 'draft'}
+        perfil = obtener_perfil(perfil_render or PERFIL_BORRADOR)
+        if perfil is None:
+            return
+        if escalera:
+            print("La escalera de salidas se ignora en modo borrador")
+            escalera = None
+        output_video_path = project_path / f"{output_filename_base}_borrador.mp4"
+        print(f"MODO BORRADOR: {tamano_salida[0]}x{tamano_salida[1]} a {fps} fps, preset {perfil.preset}")
+    
+    # Salidas: una por perfil de la escalera, o la salida única de siempre
+    salidas = [(output_video_path, perfil)]
+    if escalera:
+        perfiles_escalera = [obtener_perfil(p) for p in escalera]
+        if None in perfiles_escalera:
+            return
+        salidas = [(project_path / f"{output_filename_base}_{p.nombre}.mp4", p) for p in perfiles_escalera]
+    
+    # Codificación a tamaño o bitrate objetivo (dos pasadas) en lugar de CRF
+    ruta_intermedio = None
+    if tamano_objetivo_mb or bitrate_video:
+        salidas = [(ruta, p.copy(tamano_objetivo_mb=tamano_objetivo_mb, bitrate=bitrate_video))
+                   for ruta, p in salidas]
+        ruta_intermedio = project_path / ".cache" / "render" / f"{output_filename_base}_intermedio.mkv"
+        ruta_intermedio.parent.mkdir(parents=True, exist_ok=True)
+    
+    if reanudable and (len(salidas) > 1 or ruta_intermedio):
+        print("El render reanudable solo admite una salida con CRF; se renderiza de una vez")
+        reanudable = False
+    
+    # Generador aleatorio reproducible para los efectos
+    rng_efectos = random.Random(semilla_efectos if semilla_efectos is not None else output_filename_base)
+    
     print(f"\n--- Iniciando Creación de Vídeo para Proyecto en: {project_folder} ---")
     
     # Verificar si existe la carpeta de imágenes
@@ -102,25 +359,8 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
         print("Por favor, crea la carpeta 'imagenes' dentro de la carpeta del proyecto y añade imágenes.")
         return
     
-    # Obtener lista de archivos de imagen
-    formatos = ['*.jpg', '*.jpeg', '*.png', '*.bmp']
-    archivos = []
-    for formato in formatos:
-        archivos.extend(glob(str(image_folder / formato)))
-    
-    # Ordenar archivos por el número que aparece al final del nombre
-    def extraer_numero(archivo):
-        # Extraer el nombre base del archivo sin la ruta ni la extensión
-        nombre_base = os.path.basename(archivo)
-        # Buscar el último número en el nombre del archivo
-        import re
-        match = re.search(r'_(\d+)\.', nombre_base)
-        if match:
-            return int(match.group(1))  # Convertir a entero para ordenar numéricamente
-        return 0  # Si no hay número, devolver 0
-    
-    # Ordenar los archivos por el número extraído
-    archivos.sort(key=extraer_numero)
+    # Obtener lista de archivos de imagen (un único recorrido, ordenados por número)
+    archivos = escanear_imagenes(image_folder)
     
     # Imprimir los nombres de los archivos ordenados para depuración
     print("Orden de archivos:")
@@ -128,289 +368,117 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
         print(f"  - {os.path.basename(archivo)}")
     
     if not archivos:
-        print(f"No se encontraron imágenes en {directorio_imagenes}")
+        print(f"No se encontraron imágenes en {image_folder}")
         return
     
     print(f"Se encontraron {len(archivos)} imágenes")
     
-    # Crear clips de imagen
-    clips = []
-    total_imagenes = len(archivos)
-    for i, archivo in enumerate(archivos):
-        clip = ImageClip(archivo).with_duration(duracion_img)
-        
-        # Aplicar efectos si se solicita
-        if aplicar_efectos and secuencia_efectos:
-            # Obtener el efecto para este clip según la secuencia
-            # Si hay menos efectos que clips, se repite la secuencia
-            efecto_idx = i % len(secuencia_efectos)
-            tipo_efecto = secuencia_efectos[efecto_idx]
-            print(f"DEBUG: Procesando imagen {i+1}, tipo_efecto = '{tipo_efecto}'") 
-            effect = None# Mantenemos el debug
-            
-            # Aplicar el efecto correspondiente
-            if tipo_efecto.lower() == 'in':
-                # Usar los ajustes personalizados para el zoom
-                zoom_ratio = settings.get('zoom_ratio', 0.5)
-                zoom_quality = settings.get('zoom_quality', 'high')
-                effect = ZoomEffect(zoom_in=True, ratio=zoom_ratio, clip_duration=duracion_img, quality=zoom_quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto zoom in a la imagen {i+1} (ratio={zoom_ratio}, quality={zoom_quality})")
-            elif tipo_efecto.lower() == 'out':
-                # Usar los ajustes personalizados para el zoom
-                zoom_ratio = settings.get('zoom_ratio', 0.5)
-                zoom_quality = settings.get('zoom_quality', 'high')
-                effect = ZoomEffect(zoom_in=False, ratio=zoom_ratio, clip_duration=duracion_img, quality=zoom_quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto zoom out a la imagen {i+1} (ratio={zoom_ratio}, quality={zoom_quality})")
-            elif tipo_efecto.lower() == 'panup':
-                # Usar los ajustes personalizados para el pan
-                scale_factor = settings.get('pan_scale_factor', 1.2)
-                easing = settings.get('pan_easing', True)
-                quality = settings.get('pan_quality', 'high')
-                effect = PanUpEffect(speed=0.25, clip_duration=duracion_img, scale_factor=scale_factor, easing=easing, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto pan up a la imagen {i+1} (scale_factor={scale_factor}, easing={easing})")
-            elif tipo_efecto.lower() == 'pandown':
-                # Usar los ajustes personalizados para el pan
-                scale_factor = settings.get('pan_scale_factor', 1.2)
-                easing = settings.get('pan_easing', True)
-                quality = settings.get('pan_quality', 'high')
-                effect = PanDownEffect(speed=0.25, clip_duration=duracion_img, scale_factor=scale_factor, easing=easing, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto pan down a la imagen {i+1} (scale_factor={scale_factor}, easing={easing})")
-            elif tipo_efecto.lower() == 'panleft':
-                # Usar los ajustes personalizados para el pan
-                scale_factor = settings.get('pan_scale_factor', 1.2)
-                easing = settings.get('pan_easing', True)
-                quality = settings.get('pan_quality', 'high')
-                effect = PanLeftEffect(speed=0.25, clip_duration=duracion_img, scale_factor=scale_factor, easing=easing, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto pan left a la imagen {i+1} (scale_factor={scale_factor}, easing={easing})")
-            elif tipo_efecto.lower() == 'panright':
-                # Usar los ajustes personalizados para el pan
-                scale_factor = settings.get('pan_scale_factor', 1.2)
-                easing = settings.get('pan_easing', True)
-                quality = settings.get('pan_quality', 'high')
-                effect = PanRightEffect(speed=0.25, clip_duration=duracion_img, scale_factor=scale_factor, easing=easing, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto pan right a la imagen {i+1} (scale_factor={scale_factor}, easing={easing})")
-            elif tipo_efecto.lower() == 'kenburns':
-                # Usar los ajustes personalizados para Ken Burns
-                zoom_ratio = settings.get('kb_zoom_ratio', 0.3)
-                scale_factor = settings.get('kb_scale_factor', 1.3)
-                quality = settings.get('kb_quality', 'high')
-                direction = settings.get('kb_direction', 'random')
-                
-                # Determinar las direcciones basadas en el ajuste
-                if direction == 'random':
-                    import random
-                    zoom_dir = random.choice(['in', 'out'])
-                    pan_dir = random.choice(['up', 'down', 'left', 'right'])
-                else:
-                    zoom_dir = 'in'  # Por defecto
-                    pan_dir = direction
-                
-                effect = KenBurnsEffect(zoom_direction=zoom_dir, pan_direction=pan_dir, 
-                                       clip_duration=duracion_img, zoom_ratio=zoom_ratio, 
-                                       scale_factor=scale_factor, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto Ken Burns a la imagen {i+1} (zoom_ratio={zoom_ratio}, scale_factor={scale_factor}, direction={direction})")
-            elif tipo_efecto.lower() == 'kenburns1':
-                # Variante 1: zoom in con pan left
-                zoom_ratio = settings.get('kb_zoom_ratio', 0.3)
-                scale_factor = settings.get('kb_scale_factor', 1.3)
-                quality = settings.get('kb_quality', 'high')
-                effect = KenBurnsEffect(zoom_direction='in', pan_direction='left', 
-                                       clip_duration=duracion_img, zoom_ratio=zoom_ratio, 
-                                       scale_factor=scale_factor, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto Ken Burns (variante 1) a la imagen {i+1}")
-            elif tipo_efecto.lower() == 'kenburns2':
-                # Variante 2: zoom out con pan right
-                zoom_ratio = settings.get('kb_zoom_ratio', 0.3)
-                scale_factor = settings.get('kb_scale_factor', 1.3)
-                quality = settings.get('kb_quality', 'high')
-                effect = KenBurnsEffect(zoom_direction='out', pan_direction='right', 
-                                       clip_duration=duracion_img, zoom_ratio=zoom_ratio, 
-                                       scale_factor=scale_factor, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto Ken Burns (variante 2) a la imagen {i+1}")
-            elif tipo_efecto.lower() == 'kenburns3':
-                # Variante 3: zoom out con pan down
-                zoom_ratio = settings.get('kb_zoom_ratio', 0.3)
-                scale_factor = settings.get('kb_scale_factor', 1.3)
-                quality = settings.get('kb_quality', 'high')
-                effect = KenBurnsEffect(zoom_direction='out', pan_direction='down', 
-                                       clip_duration=duracion_img, zoom_ratio=zoom_ratio, 
-                                       scale_factor=scale_factor, quality=quality)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto Ken Burns (variante 3) a la imagen {i+1}")
-            
-            elif tipo_efecto.lower() == 'flip_horizontal':
-                 effect = FlipEffect(direction='horizontal')
-                # Nota: FlipEffect no necesita clip_duration
-                 if effect:
-                    clip = clip.transform(effect.apply)
-                    print(f"Aplicando efecto flip_horizontal a la imagen {i+1}")
-
-            elif tipo_efecto.lower() == 'flip_vertical':
-                 effect = FlipEffect(direction='vertical')
-    # Nota: FlipEffect no necesita clip_duration
-                 if effect:
-                    clip = clip.transform(effect.apply)
-                    print(f"Aplicando efecto flip_vertical a la imagen {i+1}")
-            
-            elif tipo_efecto.lower() == 'vignette_zoom_in':
-                effect = VignetteZoomEffect(zoom_in=True, zoom_ratio=0.05,
-                                 vignette_strength=0.7, vignette_radius=0.8,
-                                 vignette_fade_duration=2.0, clip_duration=duracion_img)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto vignette_zoom_in a la imagen {i+1}")
-                
-            elif tipo_efecto.lower() == 'vignette_zoom_out':
-                effect = VignetteZoomEffect(zoom_in=False, zoom_ratio=0.05,
-                                 vignette_strength=0.7, vignette_radius=0.8,
-                                 vignette_fade_duration=2.0, clip_duration=duracion_img)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto vignette_zoom_out a la imagen {i+1}")
-            
-            elif tipo_efecto.lower() == 'rotate_clockwise':
-                effect = RotateEffect(speed=30, direction='clockwise', clip_duration=duracion_img)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto de rotación en sentido horario a la imagen {i+1}")
-                
-            elif tipo_efecto.lower() == 'rotate_counter_clockwise':
-                effect = RotateEffect(speed=30, direction='counter-clockwise', clip_duration=duracion_img)
-                clip = clip.transform(effect.apply)
-                print(f"Aplicando efecto de rotación en sentido antihorario a la imagen {i+1}")
-            
-            elif effect is None:
-                print(f"Tipo de efecto desconocido: {tipo_efecto}")
-        
-        clips.append(clip)
-        
-        
-        
-        # Actualizar progreso si hay un callback definido
-        if progress_callback:
-            progress_callback(1, total_imagenes)
-    
-    # Aplicar transiciones si se solicita
-    if aplicar_transicion and tipo_transicion != 'none':
-        print(f"Aplicando transición {tipo_transicion} con duración {duracion_transicion} segundos")
-        video_final = TransitionEffect.apply_transition(clips, tipo_transicion, duracion_transicion)
-    else:
-        # Concatenar clips sin transiciones
-        video_final = concatenate_videoclips(clips)
-    
-    # Aplicar fade in al inicio del video si se solicita
-    if aplicar_fade_in and duracion_fade_in > 0:
-        print(f"Aplicando fade in con duración {duracion_fade_in} segundos")
-        fade_in_effect = vfx.FadeIn(duracion_fade_in)
-        video_final = video_final.with_effects([fade_in_effect])  # Pasar como lista de efectos
-    
-    # Aplicar fade out al final del video si se solicita
-    if aplicar_fade_out and duracion_fade_out > 0:
-        print(f"Aplicando fade out con duración {duracion_fade_out} segundos")
-        fade_out_effect = vfx.FadeOut(duracion_fade_out)
-        video_final = video_final.with_effects([fade_out_effect])  # Pasar como lista de efectos
-    
-    # Aplicar overlay si se solicita
-    if aplicar_overlay and archivos_overlay:
-        print(f"Aplicando overlays: {archivos_overlay}")
-        # Verificar si tenemos múltiples overlays para aplicar secuencialmente a los clips
-        if len(archivos_overlay) > 1:
-            # Guardar los clips originales antes de aplicar transiciones
-            clips_originales = clips.copy()
-            
-            print(f"Aplicando {len(archivos_overlay)} overlays de forma secuencial a las imágenes")
-            # Aplicar overlays secuencialmente antes de las transiciones
-            clips_con_overlay = OverlayEffect.apply_sequential_overlays(clips_originales, archivos_overlay, opacidad_overlay)
-            
-            # Volver a aplicar transiciones con los clips modificados
-            if aplicar_transicion and tipo_transicion != 'none':
-                video_final = TransitionEffect.apply_transition(clips_con_overlay, tipo_transicion, duracion_transicion)
-            else:
-                video_final = concatenate_videoclips(clips_con_overlay)
+    # Duración de cada imagen: fija, o planificada para cubrir exactamente la voz en off
+    voz = None
+    duraciones_img = duracion_img
+    if ajustar_a_voz:
+        if archivo_voz and os.path.exists(archivo_voz):
+            # La voz se decodifica una sola vez y se reutiliza en la mezcla de audio
+            voz = decodificar_audio(archivo_voz)
+            # Candidatos para los cortes: las pausas detectadas en la voz (en caché junto
+            # al proyecto) y, si hay subtítulos, los huecos entre ellos
+            regiones = regiones_voz_en_cache(archivo_voz, project_path / ".cache" / "analisis", voz=voz)
+            limites = limites_desde_regiones(regiones)
+            if aplicar_subtitulos and archivo_subtitulos:
+                limites += limites_desde_srt(archivo_subtitulos)
+            transicion_plan = duracion_transicion if aplicar_transicion and tipo_transicion != 'none' else 0.0
+            duraciones_img = planificar_duraciones(len(archivos), len(voz) / FRECUENCIA_MUESTREO, limites,
+                                                   duracion_transicion=transicion_plan)
         else:
-            # Si solo hay un overlay, aplicar el overlay al video final
-            overlay_path = archivos_overlay[0]
-            print(f"Aplicando overlay {os.path.basename(overlay_path)} con opacidad {opacidad_overlay}")
-            video_final = OverlayEffect.apply_overlay(video_final, overlay_path, opacidad_overlay)
-    else:
-        if aplicar_overlay:
-            print("Se seleccionó aplicar overlay pero no se proporcionaron archivos de overlay")
-        else:
-            print("No se seleccionó aplicar overlay")
+            print("No hay voz en off: se usa la duración fija por imagen")
+    
+    video_final = construir_linea_de_tiempo(
+        archivos, duracion_img=duraciones_img,
+        aplicar_efectos=aplicar_efectos, secuencia_efectos=secuencia_efectos,
+        aplicar_transicion=aplicar_transicion, tipo_transicion=tipo_transicion,
+        duracion_transicion=duracion_transicion,
+        aplicar_fade_in=aplicar_fade_in, duracion_fade_in=duracion_fade_in,
+        aplicar_fade_out=aplicar_fade_out, duracion_fade_out=duracion_fade_out,
+        aplicar_overlay=aplicar_overlay, archivos_overlay=archivos_overlay,
+        opacidad_overlay=opacidad_overlay,
+        settings=settings, tamano_salida=tamano_salida, ajustes_calidad=ajustes_calidad,
+        rng_efectos=rng_efectos, cache_dir=project_path / ".cache" / "ingesta",
+        progress_callback=progress_callback)
+    if video_final is None:
+        print(f"Revisa las imágenes de {image_folder}")
+        return
     
-    # Aplicar audio (música de fondo y/o voz en off)
-    audio_clips = []
+    # Aplicar audio (música de fondo y/o voz en off): cada pista se decodifica una vez a
+    # PCM, las ganancias y los fades se aplican como vectores y la mezcla se escribe en
+    # un único WAV que se entrega directamente al codificador
+    pistas_audio = []
     
     # Aplicar voz en off primero si se proporciona
     if archivo_voz and os.path.exists(archivo_voz):
         print(f"Aplicando voz en off: {os.path.basename(archivo_voz)}")
-        voz = AudioFileClip(archivo_voz)
+        if voz is None:
+            voz = decodificar_audio(archivo_voz)
         
-        # Ajustar la duración de la voz a la duración del video si es necesario
-        if voz.duration > video_final.duration:
-            voz = voz.subclipped(0, video_final.duration)
-        
-        # Ajustar el volumen
-        voz = voz.with_effects([afx.MultiplyVolume(volumen_voz)])
-        
-        # Aplicar fade in/out a la voz si se solicita
-        if aplicar_fade_in_voz and duracion_fade_in_voz > 0:
-            print(f"Aplicando fade in a la voz con duración {duracion_fade_in_voz} segundos")
-            voz = voz.with_effects([afx.AudioFadeIn(duracion_fade_in_voz)])
-        
-        if aplicar_fade_out_voz and duracion_fade_out_voz > 0:
-            print(f"Aplicando fade out a la voz con duración {duracion_fade_out_voz} segundos")
-            voz = voz.with_effects([afx.AudioFadeOut(duracion_fade_out_voz)])
-        
-        audio_clips.append(voz)
+        # La mezcla recorta la voz a la duración del video si es necesario
+        fade_in_voz = duracion_fade_in_voz if aplicar_fade_in_voz and duracion_fade_in_voz > 0 else 0.0
+        fade_out_voz = duracion_fade_out_voz if aplicar_fade_out_voz and duracion_fade_out_voz > 0 else 0.0
+        if fade_in_voz:
+            print(f"Aplicando fade in a la voz con duración {fade_in_voz} segundos")
+        if fade_out_voz:
+            print(f"Aplicando fade out a la voz con duración {fade_out_voz} segundos")
+        # El fade out debe terminar donde termina la voz recortada, no el archivo original
+        voz = voz[:int(round(video_final.duration * FRECUENCIA_MUESTREO))]
+        ganancia_voz = volumen_voz
+        if normalizar_loudness:
+            # Medida sobre el PCM ya decodificado: no hace falta volver a leer el archivo
+            loudness_voz = medir_loudness(voz)
+            ganancia_voz *= ganancia_para_loudness(loudness_voz, objetivo_lufs)
+            print(f"Sonoridad de la voz: {loudness_voz:.1f} LUFS (ganancia {ganancia_voz:.2f})")
+        pistas_audio.append(Pista('voz', voz, ganancia_voz, fade_in_voz, fade_out_voz))
     
     # Aplicar música de fondo después si se solicita
     if aplicar_musica and archivo_musica and os.path.exists(archivo_musica):
         print(f"Aplicando música de fondo: {os.path.basename(archivo_musica)}")
-        musica = AudioFileClip(archivo_musica)
-        
-        # Ajustar la duración de la música a la duración del video
-        if musica.duration > video_final.duration:
-            musica = musica.subclipped(0, video_final.duration)
-        else:
-            # Si la música es más corta que el video, repetirla hasta cubrir todo el video
-            from moviepy.audio.AudioClip import concatenate_audioclips
-            repeticiones = int(video_final.duration / musica.duration) + 1
-            musica = concatenate_audioclips([musica] * repeticiones).subclipped(0, video_final.duration)
+        # Se decodifica una vez; si es más corta que el video se repite con fundidos
+        # cruzados en los empalmes (en caché por pista y duración)
+        musica = construir_cama_musical(archivo_musica, video_final.duration)
         
         # Ajustar el volumen
-        # Aplicar un factor de reducción moderado (0.7) para música ambiental suave pero audible
-        volumen_musica_ajustado = volumen_musica * 0.7
-        print(f"Volumen de música original: {volumen_musica}, ajustado: {volumen_musica_ajustado}")
-        musica = musica.with_effects([afx.MultiplyVolume(volumen_musica_ajustado)])
-        
-        # Aplicar fade in/out a la música si se solicita
-        if aplicar_fade_in_musica and duracion_fade_in_musica > 0:
-            print(f"Aplicando fade in a la música con duración {duracion_fade_in_musica} segundos")
-            musica = musica.with_effects([afx.AudioFadeIn(duracion_fade_in_musica)])
+        if normalizar_loudness:
+            # Llevar la música a su nivel relativo a la voz
+            loudness_musica = medir_loudness(musica)
+            volumen_musica_ajustado = volumen_musica * ganancia_para_loudness(loudness_musica,
+                                                                              objetivo_lufs + nivel_musica_lu)
+            print(f"Sonoridad de la música: {loudness_musica:.1f} LUFS (ganancia {volumen_musica_ajustado:.2f})")
+        else:
+            # Aplicar un factor de reducción moderado (0.7) para música ambiental suave pero audible
+            volumen_musica_ajustado = volumen_musica * 0.7
+            print(f"Volumen de música original: {volumen_musica}, ajustado: {volumen_musica_ajustado}")
         
-        if aplicar_fade_out_musica and duracion_fade_out_musica > 0:
-            print(f"Aplicando fade out a la música con duración {duracion_fade_out_musica} segundos")
-            musica = musica.with_effects([afx.AudioFadeOut(duracion_fade_out_musica)])
+        fade_in_musica = duracion_fade_in_musica if aplicar_fade_in_musica and duracion_fade_in_musica > 0 else 0.0
+        fade_out_musica = duracion_fade_out_musica if aplicar_fade_out_musica and duracion_fade_out_musica > 0 else 0.0
+        if fade_in_musica:
+            print(f"Aplicando fade in a la música con duración {fade_in_musica} segundos")
+        if fade_out_musica:
+            print(f"Aplicando fade out a la música con duración {fade_out_musica} segundos")
         
-        audio_clips.append(musica)
-    
-    # Combinar los clips de audio y aplicarlos al video
-    if audio_clips:
-        if len(audio_clips) == 1:
-            # Si solo hay un clip de audio, usarlo directamente
-            video_final = video_final.with_audio(audio_clips[0])
-        else:
-            # Si hay múltiples clips de audio, mezclarlos
-            from moviepy.audio.AudioClip import CompositeAudioClip
-            audio_final = CompositeAudioClip(audio_clips)
-            video_final = video_final.with_audio(audio_final)
+        # Ducking: la música baja mientras suena la voz y vuelve a subir en las pausas
+        ganancia_ducking = None
+        if aplicar_ducking and voz is not None:
+            ganancia_ducking = curva_ducking(voz, reduccion_db=reduccion_ducking_db)
+        pistas_audio.append(Pista('musica', musica, volumen_musica_ajustado, fade_in_musica, fade_out_musica,
+                                  ganancia_variable=ganancia_ducking))
+    
+    # Mezclar todas las pistas en un solo paso
+    archivo_audio_mezcla = None
+    if pistas_audio:
+        inicio_mezcla = time.perf_counter()
+        mezcla = mezclar(pistas_audio, video_final.duration, recortar=not normalizar_loudness)
+        if normalizar_loudness:
+            normalizar_mezcla(mezcla, objetivo_lufs)
+            np.clip(mezcla, -1.0, 1.0, out=mezcla)
+        archivo_audio_mezcla = escribir_wav(project_path / ".cache" / "render" / f"{output_filename_base}_mezcla.wav", mezcla)
+        print(f"Mezcla de audio ({len(pistas_audio)} pistas) en {time.perf_counter() - inicio_mezcla:.2f} s")
     
     # Mostrar el directorio de trabajo actual para depuración
     print(f"DEBUG: Directorio de trabajo actual (CWD): {os.getcwd()}")
@@ -420,6 +488,8 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
 # con el siguiente código:
 
     # --- APLICAR SUBTÍTULOS ---
+    filtro_subtitulos = None
+    subtitulos_sin_quemar = None
     if aplicar_subtitulos and archivo_subtitulos and Path(archivo_subtitulos).is_file():
         print(f"Aplicando subtítulos desde: {archivo_subtitulos}")
         try:
@@ -432,64 +502,55 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
                 else:
                     print(f"Archivo de subtítulos tiene {len(contenido)} caracteres")
             
-            # Calculamos el ancho del texto como un entero (no float)
-            text_width = int(video_final.w * 0.8)
-            
-            # Obtener la ruta de la fuente (usar la especificada o intentar una fuente del sistema)
+            # Fuente del proyecto (si no existe se usa una del sistema como respaldo)
             font_path = '/Users/olga/Development/proyectosPython/VideoPython/fonts/Roboto-Regular.ttf'
-            if not os.path.exists(font_path):
-                # Intentar con una fuente del sistema como respaldo
-                for system_font in ['/System/Library/Fonts/Helvetica.ttc', '/Library/Fonts/Arial.ttf']:
-                    if os.path.exists(system_font):
-                        font_path = system_font
-                        print(f"Usando fuente del sistema: {font_path}")
-                        break
             
-            # Generator con los parámetros correctos
-            generator = lambda txt: TextClip(
-                font_path,  # Primer argumento posicional debe ser font
-                text=txt,   # Texto como argumento nombrado
-                font_size=80,  # Usar font_size, no fontsize
-                color=color_fuente_subtitulos,
+            subtitulos = SubtitleEffect.parse_srt_file_with_library(archivo_subtitulos)
+            print(f"Subtítulos leídos: {len(subtitulos)}")
+            # El tamaño del texto es relativo a 1080p para que el borrador se vea igual. Es
+            # el mismo estilo con el que la cola de lotes agrupa las palabras del SRT por su
+            # ancho, así que cada subtítulo cabe tal como está escrito
+            estilo = estilo_subtitulos_video((video_final.w, tamano_salida[1]), font_path,
+                                             color_fuente_subtitulos, color_borde_subtitulos,
+                                             grosor_borde_subtitulos)
+            estilo_subtitulos = dict(
+                font_size=estilo.font_size,
+                font_color=color_fuente_subtitulos,
                 stroke_color=color_borde_subtitulos,
-                stroke_width=grosor_borde_subtitulos,
-                method='caption',
-                text_align='center',
-                size=(text_width, None)  # Ancho como entero, no float
-            )
-
-            # Crear SubtitlesClip
-            print("Creando SubtitlesClip...")
-            subs_clip = SubtitlesClip(
-                archivo_subtitulos,
-                make_textclip=generator,
-                encoding='utf-8'
-            )
-            print("SubtitlesClip creado.")
-            
-            # Verificación de tipo y atributos
-            print(f"Tipo de subs_clip: {type(subs_clip)}")
-            
-            if hasattr(subs_clip, 'duration'):
-                print(f"Duración de subtítulos: {subs_clip.duration}")
-                
-                # IMPORTANTE: Ajustar la duración de los subtítulos a la duración del video
-                if subs_clip.duration > video_final.duration:
-                    print(f"Ajustando duración de subtítulos de {subs_clip.duration}s a {video_final.duration}s")
-                    subs_clip = subs_clip.with_duration(video_final.duration)
-                
-                # Establecer posición para los subtítulos
-                positioned_subs = subs_clip.with_position(('center', 0.9), relative=True)
-                
-                # Crear clip final compuesto
-                print("Componiendo vídeo + subtítulos...")
-                video_final = CompositeVideoClip(
-                    [video_final, positioned_subs],
-                    size=video_final.size
-                )
-                print("Composición exitosa con subtítulos.")
+                stroke_width=estilo.stroke_width,
+                position=('center', 'bottom'),
+                position_relative=True)
+            palabras = cargar_palabras(archivo_subtitulos) if subtitulos_karaoke else None
+            if subtitulos_pista or subtitulos_externos:
+                # Subtítulos de texto (pista o archivos junto al vídeo): no se queman en la
+                # imagen y se añaden después de codificar
+                subtitulos_sin_quemar = subtitulos
+                print("Los subtítulos se añadirán como pista y/o archivos externos, sin quemarlos en la imagen.")
+            elif palabras:
+                # Línea y palabra resaltada salen de la caché de sprites: el resaltado solo
+                # añade la mezcla de una palabra por frame
+                if subtitulos_ffmpeg:
+                    print("El karaoke se dibuja en Python; se ignora subtitulos_ffmpeg.")
+                video_final = SubtitleEffect.apply_karaoke(video_final, subtitulos, palabras, font=font_path,
+                                                           highlight_color=color_resaltado_subtitulos,
+                                                           **estilo_subtitulos)
+                print("Composición exitosa con subtítulos karaoke.")
+            elif subtitulos_ffmpeg:
+                # Los subtítulos se queman con libass durante la codificación: ningún
+                # texto pasa por Python frame a frame
+                ruta_ass = escribir_ass(subtitulos, project_path / ".cache" / "render" / f"{output_filename_base}.ass",
+                                        estilo, video_final.size, duracion=video_final.duration,
+                                        position=estilo_subtitulos['position'], position_relative=True)
+                filtro_subtitulos = filtro_ass(ruta_ass, Path(estilo.font).parent if estilo.font else None)
+                print("Subtítulos preparados para quemarse con ffmpeg.")
             else:
-                print("ERROR: SubtitlesClip no tiene atributo 'duration'. No se aplicarán subtítulos.")
+                if subtitulos_karaoke:
+                    print(f"No hay tiempos por palabra ({ruta_palabras(archivo_subtitulos).name}); "
+                          "subtítulos sin resaltado.")
+                # Cada texto distinto se rasteriza una sola vez con Pillow en un sprite RGBA
+                video_final = SubtitleEffect.apply_subtitles(video_final, subtitulos, font=font_path,
+                                                             **estilo_subtitulos)
+                print("Composición exitosa con subtítulos.")
 
         except Exception as e:
             print(f"Error al aplicar subtítulos: {str(e)}")
@@ -498,15 +559,57 @@ def crear_video_desde_imagenes(project_folder, duracion_img=6, fps=24,
             print("Continuando sin subtítulos...")
     
     # Guardar el video
-    print(f"Escribiendo archivo de video final en: {output_video_path}")
-    video_final.write_videofile(
-        str(output_video_path),
-        fps=fps,
-        codec='libx264', audio_codec='aac',
-        threads=os.cpu_count(), preset='medium',
-        ffmpeg_params=['-crf', '23']
-    )
-    print(f"Video guardado como {output_video_path}")
+    print(f"Escribiendo archivo de video final en: {', '.join(str(ruta) for ruta, _ in salidas)}")
+    # Los frames van directamente a ffmpeg por una tubería (sin el iterador de MoviePy);
+    # con escalera, el mismo flujo se reparte entre todas las codificaciones
+    # La clave cambia si cambian los parámetros o algún archivo de entrada, y entonces el
+    # render reanudable empieza de cero y el intermedio se vuelve a componer (la voz y los
+    # subtítulos también cuentan: con ajustar_a_voz deciden la duración de cada imagen)
+    firma_imagenes = [(str(archivo), os.stat(archivo).st_mtime_ns, os.stat(archivo).st_size)
+                      for archivo in [*archivos, archivo_voz, archivo_musica, archivo_subtitulos,
+                                      archivo_subtitulos and ruta_palabras(archivo_subtitulos)]
+                      if archivo and os.path.exists(archivo)]
+    if reanudable:
+        clave_render = hashlib.sha1(repr((sorted(parametros_render.items(), key=lambda item: item[0]),
+                                          firma_imagenes)).encode('utf-8')).hexdigest()
+        escribir_reanudable(video_final, output_video_path, fps, perfil,
+                            carpeta_segmentos=project_path / ".cache" / "render" / f"{output_filename_base}_segmentos",
+                            clave=clave_render, duracion_segmento=duracion_segmento,
+                            archivo_audio=archivo_audio_mezcla, filtro_video=filtro_subtitulos)
+    else:
+        # El intermedio no depende de cómo se codifican las salidas
+        parametros_intermedio = sorted((clave, valor) for clave, valor in parametros_render.items()
+                                       if clave not in PARAMETROS_CODIFICACION)
+        escribir_escalera(video_final, salidas, fps, ruta_intermedio=ruta_intermedio,
+                          archivo_audio=archivo_audio_mezcla, filtro_video=filtro_subtitulos,
+                          clave_intermedio=repr((parametros_intermedio, firma_imagenes)),
+                          conservar_intermedio=conservar_intermedio)
+    for ruta, _ in salidas:
+        print(f"Video guardado como {ruta}")
+    
+    # Subtítulos como pista de texto y/o archivos externos junto a cada salida
+    if subtitulos_sin_quemar:
+        for ruta, _ in salidas:
+            ruta = Path(ruta)
+            for formato in subtitulos_externos or []:
+                destino = ruta.with_suffix(f".{formato}")
+                if formato == 'vtt':
+                    escribir_vtt(subtitulos_sin_quemar, destino, duracion=video_final.duration)
+                elif formato == 'ass':
+                    escribir_ass(subtitulos_sin_quemar, destino, estilo, video_final.size,
+                                 duracion=video_final.duration, position=estilo_subtitulos['position'],
+                                 position_relative=True)
+                elif formato == 'srt':
+                    shutil.copyfile(archivo_subtitulos, destino)
+                else:
+                    print(f"Formato de subtítulos no soportado: {formato} (usa 'vtt', 'ass' o 'srt')")
+                    continue
+                print(f"Subtítulos guardados como {destino}")
+            if subtitulos_pista:
+                try:
+                    mux_subtitulos(ruta, [(archivo_subtitulos, idioma_subtitulos)])
+                except (IOError, ValueError) as e:
+                    print(f"Error al añadir la pista de subtítulos a {ruta.name}: {e}")
     
     # Indicar que el proceso ha terminado (100% completado)
     if progress_callback:
@@ -549,13 +652,13 @@ def main():
         elif opciones == "2":
             # Modo secuencia personalizada
             print("\nDefinir secuencia de efectos:")
-            print("Opciones disponibles: in, out, panup, pandown, panleft, panright, kenburns")
+            print(f"Opciones disponibles: {', '.join(EFFECT_REGISTRY.available_effects())}")
             print("Ejemplo: in,panup,kenburns,out (separados por comas)")
             secuencia_input = input("Secuencia de efectos: ")
             secuencia_efectos = [efecto.strip() for efecto in secuencia_input.split(',')]
             
-            # Validar cada efecto en la secuencia (permitir todos los efectos válidos)
-            efectos_validos = ['in', 'out', 'panup', 'pandown', 'panleft', 'panright', 'kenburns', 'kenburns1', 'kenburns2', 'kenburns3']
+            # Validar cada efecto en la secuencia (permitir todos los efectos registrados)
+            efectos_validos = EFFECT_REGISTRY.available_effects()
             secuencia_efectos = [efecto if efecto in efectos_validos else 'in' for efecto in secuencia_efectos]
             
             if not secuencia_efectos:
@@ -17,26 +17,24 @@ except ImportError:
     print("Advertencia: No se pudo importar 'create_voiceover_from_script' o 'OUTPUT_FORMAT'.")
     print("Asegúrate de que el archivo tts_generator.py esté accesible.")
     # Define valores por defecto si la importación falla
-    async def create_voiceover_from_script(script_path, output_path, voice=None):
-        print(f"Simulando: Generando audio desde '{script_path}' a '{output_path}'")
+    async def create_voiceover_from_script(script_path, output_audio_path, voice=None, output_srt_path=None,
+                                           estilo_subtitulos=None):
+        print(f"Simulando: Generando audio desde '{script_path}' a '{output_audio_path}'")
         # En una ejecución real, esto crearía el archivo
-        Path(output_path).touch()  # Crea un archivo vacío como marcador
-        return output_path  # Devuelve la ruta simulada
+        Path(output_audio_path).touch()  # Crea un archivo vacío como marcador
+        return output_audio_path  # Devuelve la ruta simulada
     OUTPUT_FORMAT = "mp3"
 
-# Importar generador de subtítulos
+# Importar el servicio de transcripción (subtítulos con Whisper)
 try:
-    from subtitles import generate_srt_with_whisper, WHISPER_AVAILABLE
-    if WHISPER_AVAILABLE:
-        try:
-            from faster_whisper import WhisperModel
-        except ImportError:
-            print("Advertencia: No se pudo importar WhisperModel a pesar de que WHISPER_AVAILABLE es True")
-            WHISPER_AVAILABLE = False
+    from transcripcion import TranscriptionService, WHISPER_AVAILABLE
+    # Sin Whisper los subtítulos aún se alinean con el guion por la energía de la voz
+    ALINEACION_DISPONIBLE = True
 except ImportError:
-    print("Advertencia: No se pudo importar 'generate_srt_with_whisper' o 'WHISPER_AVAILABLE'.")
-    print("Asegúrate de que el archivo subtitles.py esté accesible.")
+    print("Advertencia: No se pudo importar 'TranscriptionService' o 'WHISPER_AVAILABLE'.")
+    print("Asegúrate de que los archivos transcripcion.py y subtitles.py estén accesibles.")
     WHISPER_AVAILABLE = False
+    ALINEACION_DISPONIBLE = False
 
 # Importar la función para crear video
 try:
@@ -76,6 +74,10 @@ class BatchTTSManager:
         self.worker_running = False
         self.worker_thread = None
         
+        # Transcripción: la GUI asigna un TranscriptionService con su configuración de
+        # Whisper; si no, se crea uno por defecto al transcribir el primer trabajo
+        self.transcripcion = None
+        
         # Variables para la interfaz
         self.tree_queue = None  # Se inicializará cuando se cree la interfaz
     
@@ -186,6 +188,7 @@ class BatchTTSManager:
                 output_folder = Path(job['carpeta_salida'])
                 voice = job['voz']
                 audio_output_path = str(output_folder / f"voz.{OUTPUT_FORMAT}")
+                srt_output_path = str(output_folder / "subtitulos.srt")
                 
                 # Actualizar estado y tiempo de inicio
                 job['tiempo_inicio'] = time.time()
@@ -199,10 +202,14 @@ class BatchTTSManager:
                 
                 try:
                     # Ejecutar la corutina create_voiceover_from_script
+                    # El TTS escribe también el SRT con los límites de palabra de la síntesis
                     final_audio_path = asyncio.run(create_voiceover_from_script(
                         script_path=script_path,
                         output_audio_path=audio_output_path,
-                        voice=voice
+                        voice=voice,
+                        output_srt_path=srt_output_path,
+                        # Mismo estilo con el que la transcripción agrupa las palabras
+                        estilo_subtitulos=self.transcripcion.estilo_subtitulos if self.transcripcion else None
                     ))
                     
                     # Calcular tiempo transcurrido para la generación de audio
@@ -216,79 +223,26 @@ class BatchTTSManager:
                         job['archivo_voz'] = final_audio_path
                         success_tts = True
                         
-                        # --- Generar subtítulos con Whisper ---
-                        if WHISPER_AVAILABLE:
+                        # --- Generar subtítulos (Whisper o alineación con el guion) ---
+                        srt_de_tts = (Path(srt_output_path).is_file()
+                                      and Path(srt_output_path).stat().st_mtime >= job['tiempo_inicio'])
+                        if srt_de_tts:
+                            # Los tiempos salen de la propia síntesis: no hace falta Whisper
+                            self.update_job_status_gui(job_id, "Audio y SRT OK", audio_tiempo_formateado)
+                            job['archivo_subtitulos'] = srt_output_path
+                            job['aplicar_subtitulos'] = True
+                        elif WHISPER_AVAILABLE or ALINEACION_DISPONIBLE:
                             self.update_job_status_gui(job_id, "Audio OK. Generando SRT...", audio_tiempo_formateado)
                             
-                            # Buscar el modelo Whisper en la GUI
-                            whisper_model = None
-                            try:
-                                # Intentar obtener el modelo Whisper directamente
-                                if WHISPER_AVAILABLE:
-                                    # Primero, buscar en la instancia actual de la aplicación
-                                    app_instance = None
-                                    for widget in self.root.winfo_children():
-                                        if hasattr(widget, 'whisper_model'):
-                                            app_instance = widget
-                                            break
-                                    
-                                    if app_instance and hasattr(app_instance, 'whisper_model') and app_instance.whisper_model is not None:
-                                        print("Usando modelo Whisper de la instancia de la aplicación")
-                                        whisper_model = app_instance.whisper_model
-                                    else:
-                                        # Si no se encuentra en la GUI, crear un nuevo modelo
-                                        print("No se encontró modelo Whisper en la GUI. Creando uno nuevo...")
-                                        try:
-                                            from faster_whisper import WhisperModel
-                                            # Usar un modelo base por defecto
-                                            whisper_model = WhisperModel("base", device="cpu", compute_type="int8")
-                                            print("Modelo Whisper creado exitosamente")
-                                        except Exception as e_model:
-                                            print(f"Error al crear modelo Whisper: {e_model}")
-                            except Exception as e_gui:
-                                print(f"Error al buscar modelo Whisper: {e_gui}")
-                            
-                            # Generar subtítulos si tenemos el modelo
-                            srt_output_path = str(output_folder / "subtitulos.srt")
-                            srt_success = False
-                            
-                            if whisper_model:
-                                try:
-                                    # Obtener configuración del modelo Whisper de la GUI
-                                    whisper_language = "es"  # Valor por defecto
-                                    word_timestamps = True  # Valor por defecto
-                                    
-                                    # Intentar obtener configuración de la GUI
-                                    if hasattr(app_instance, 'whisper_language') and hasattr(app_instance.whisper_language, 'get'):
-                                        whisper_language = app_instance.whisper_language.get()
-                                    
-                                    if hasattr(app_instance, 'whisper_word_timestamps') and hasattr(app_instance.whisper_word_timestamps, 'get'):
-                                        word_timestamps = app_instance.whisper_word_timestamps.get()
-                                    
-                                    print(f"Generando subtítulos con idioma: {whisper_language}, timestamps por palabra: {word_timestamps}")
-                                    
-                                    # Generar subtítulos con la configuración
-                                    srt_success = generate_srt_with_whisper(
-                                        whisper_model,
-                                        final_audio_path,
-                                        srt_output_path,
-                                        language=whisper_language,
-                                        word_timestamps=word_timestamps
-                                    )
-                                except Exception as e_srt:
-                                    print(f"Error al generar subtítulos: {e_srt}")
-                            else:
-                                print("No se encontró el modelo Whisper para generar subtítulos.")
-                            
-                            # Actualizar el job con la información de subtítulos
-                            if srt_success:
-                                self.update_job_status_gui(job_id, "Audio y SRT OK", audio_tiempo_formateado)
-                                job['archivo_subtitulos'] = srt_output_path
-                                job['aplicar_subtitulos'] = True
-                                print(f"Subtítulos generados exitosamente en: {srt_output_path}")
-                            else:
-                                self.update_job_status_gui(job_id, "Audio OK. Error SRT", audio_tiempo_formateado)
-                                job['aplicar_subtitulos'] = False
+                            # La transcripción corre en el pool del servicio: el worker
+                            # pasa a generar la voz del siguiente trabajo mientras tanto.
+                            # El texto ya se conoce (el guion): Whisper solo aporta los
+                            # tiempos y los subtítulos conservan la redacción del guion
+                            futuro = self.servicio_transcripcion().enviar(final_audio_path, srt_output_path,
+                                                                          archivo_guion=script_path)
+                            futuro.add_done_callback(
+                                lambda f, job=job, srt=srt_output_path, tiempo=audio_tiempo_formateado:
+                                    self._transcripcion_terminada(job, srt, tiempo, f))
                         else:
                             # Si Whisper no está disponible, solo actualizar estado de audio
                             self.update_job_status_gui(job_id, "Audio Completo", audio_tiempo_formateado)
@@ -333,6 +287,31 @@ class BatchTTSManager:
         
         print("Worker de cola finalizado.")
     
+    def servicio_transcripcion(self):
+        """Devuelve el servicio de transcripción, creando uno por defecto si la GUI no asignó ninguno."""
+        if self.transcripcion is None:
+            self.transcripcion = TranscriptionService()
+        return self.transcripcion
+    
+    def _transcripcion_terminada(self, job, srt_output_path, audio_tiempo_formateado, futuro):
+        """Actualiza el trabajo cuando termina su transcripción (se llama desde el pool de Whisper)."""
+        job_id = job['id']
+        try:
+            srt_success = futuro.result()
+        except Exception as e_srt:
+            print(f"Error al generar subtítulos: {e_srt}")
+            srt_success = False
+        
+        if srt_success:
+            self.update_job_status_gui(job_id, "Audio y SRT OK", audio_tiempo_formateado)
+            job['archivo_subtitulos'] = srt_output_path
+            job['aplicar_subtitulos'] = True
+            print(f"Subtítulos generados exitosamente en: {srt_output_path}")
+        else:
+            self.update_job_status_gui(job_id, "Audio OK. Error SRT", audio_tiempo_formateado)
+            job['aplicar_subtitulos'] = False
+        job['tiempo_fin'] = time.time()
+    
     def update_job_status_gui(self, job_id, status, tiempo=""):
         """Actualiza el estado de un trabajo en la GUI."""
         # Usar root.after para asegurar que la actualización de la GUI
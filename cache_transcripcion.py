@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Versión del formato de la caché; cambiarla invalida las transcripciones guardadas
+VERSION_TRANSCRIPCION = 1
+# Bloque de lectura al calcular el hash del audio
+BLOQUE_HASH = 1 << 20
+
+# Mismos atributos que los objetos de faster-whisper, para que el código que agrupa
+# palabras en subtítulos funcione igual con una transcripción nueva o de la caché
+Palabra = namedtuple('Palabra', 'word start end probability')
+Segmento = namedtuple('Segmento', 'start end text words')
+InfoTranscripcion = namedtuple('InfoTranscripcion', 'language language_probability')
+
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def hash_audio(archivo_audio):
+    """
+    SHA-1 del contenido del audio. Se recalcula solo si cambian la fecha de
+    modificación o el tamaño del archivo; copiar o renombrar el audio no invalida
+    su transcripción.
+    """
+    st = os.stat(archivo_audio)
+    firma = (os.path.abspath(archivo_audio), st.st_mtime_ns, st.st_size)
+    with _hashes_lock:
+        valor = _hashes.get(firma)
+    if valor is None:
+        sha = hashlib.sha1()
+        with open(archivo_audio, 'rb') as f:
+            for bloque in iter(lambda: f.read(BLOQUE_HASH), b''):
+                sha.update(bloque)
+        valor = sha.hexdigest()
+        with _hashes_lock:
+            _hashes[firma] = valor
+    return valor
+
+
+def clave_transcripcion(hash_contenido, nombre_modelo, opciones):
+    """Clave de una transcripción: contenido del audio, modelo y opciones (idioma incluido)."""
+    datos = json.dumps([hash_contenido, nombre_modelo, opciones, VERSION_TRANSCRIPCION],
+                       sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(datos.encode('utf-8')).hexdigest()
+
+
+def cargar_transcripcion(ruta_cache):
+    """
+    Lee una transcripción guardada con guardar_transcripcion.
+
+    Returns:
+        Tupla (segmentos, info) o None si no existe o no se puede leer.
+    """
+    if not ruta_cache.is_file():
+        return None
+    try:
+        with open(ruta_cache, 'r', encoding='utf-8') as f:
+            cabecera = json.loads(f.readline())
+            if cabecera.get('version') != VERSION_TRANSCRIPCION:
+                return None
+            segmentos = []
+            for linea in f:
+                inicio, fin, texto, palabras = json.loads(linea)
+                segmentos.append(Segmento(inicio, fin, texto, [Palabra(*p) for p in palabras]))
+        return segmentos, InfoTranscripcion(cabecera['idioma'], cabecera['probabilidad'])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Caché de transcripción ilegible ({ruta_cache.name}), se vuelve a transcribir: {e}")
+        return None
+
+
+def guardar_transcripcion(ruta_cache, segmentos, info, descripcion=None):
+    """
+    Guarda una transcripción en JSON-lines: una cabecera y un segmento por línea
+    ([inicio, fin, texto, [[palabra, inicio, fin, probabilidad], ...]]). Se escribe en
+    un archivo temporal y se renombra, así un proceso interrumpido no deja una
+    caché a medias.
+    """
+    ruta_cache.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta_cache.with_name(f"{ruta_cache.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    cabecera = {'version': VERSION_TRANSCRIPCION, 'idioma': info.language,
+                'probabilidad': round(info.language_probability or 0.0, 4), **(descripcion or {})}
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(cabecera, ensure_ascii=False, separators=(',', ':')) + '\n')
+        for s in segmentos:
+            palabras = [[w.word, round(w.start, 3), round(w.end, 3), round(w.probability or 0.0, 3)]
+                        for w in (s.words or [])]
+            f.write(json.dumps([round(s.start, 3), round(s.end, 3), s.text, palabras],
+                               ensure_ascii=False, separators=(',', ':')) + '\n')
+    os.replace(temporal, ruta_cache)
+
+
+def transcribir_en_cache(modelo, archivo_audio, opciones, nombre_modelo=None, cache_dir=None):
+    """
+    Transcribe con `modelo.transcribe(archivo_audio, **opciones)` guardando el
+    resultado (segmentos y palabras) en disco. Volver a generar los subtítulos del
+    mismo audio (otro reparto de líneas, otro estilo, un trabajo relanzado) lee la
+    caché en lugar de volver a pasar Whisper.
+
+    Args:
+        modelo: WhisperModel cargado.
+        archivo_audio: Archivo de audio.
+        opciones: Opciones de transcribe (idioma, beam_size, vad_filter...).
+        nombre_modelo: Modelo cargado ('base', 'small'...). Sin él no se usa la caché,
+                       porque modelos distintos dan transcripciones distintas.
+        cache_dir: Carpeta de la caché (por defecto, .cache/transcripcion junto al audio).
+
+    Returns:
+        Tupla (segmentos, info) como la de faster-whisper, con los segmentos en una lista.
+    """
+    ruta_cache = None
+    if nombre_modelo:
+        if cache_dir is None:
+            cache_dir = Path(archivo_audio).parent / '.cache' / 'transcripcion'
+        clave = clave_transcripcion(hash_audio(archivo_audio), nombre_modelo, opciones)
+        # Solo la clave en el nombre: una copia del mismo audio reutiliza la transcripción
+        ruta_cache = Path(cache_dir) / f"{clave}.jsonl"
+        guardada = cargar_transcripcion(ruta_cache)
+        if guardada is not None:
+            print(f"Transcripción en caché: {Path(archivo_audio).name} ({nombre_modelo}, {ruta_cache.name})")
+            return guardada
+
+    inicio = time.perf_counter()
+    segmentos, info = modelo.transcribe(str(archivo_audio), **opciones)
+    # faster-whisper devuelve un generador: la transcripción ocurre al recorrerlo
+    segmentos = [Segmento(s.start, s.end, s.text,
+                          [Palabra(w.word, w.start, w.end, getattr(w, 'probability', None)) for w in s.words]
+                          if s.words else [])
+                 for s in segmentos]
+    info = InfoTranscripcion(info.language, info.language_probability)
+    if ruta_cache is not None:
+        try:
+            guardar_transcripcion(ruta_cache, segmentos, info,
+                                  {'audio': Path(archivo_audio).name, 'modelo': nombre_modelo})
+        except OSError as e:
+            print(f"No se pudo guardar la transcripción en caché: {e}")
+    print(f"Transcripción de {Path(archivo_audio).name}: {len(segmentos)} segmentos en "
+          f"{time.perf_counter() - inicio:.1f} s")
+    return segmentos, info
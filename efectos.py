@@ -6,6 +6,14 @@ import math
 import numpy as np
 
 
+def modo_remuestreo(quality):
+    """Filtro de redimensionado para una calidad: 'high' -> LANCZOS, 'draft' -> NEAREST, resto -> BILINEAR."""
+    if quality == 'high':
+        return Resampling.LANCZOS
+    if quality == 'draft':
+        return Resampling.NEAREST
+    return Resampling.BILINEAR
+
 
 class ZoomEffect(Effect):
     """
@@ -20,7 +28,7 @@ class ZoomEffect(Effect):
             ratio: Factor total de zoom a aplicar durante la duración del clip.
                    Ej: ratio=0.5 significa un 50% de zoom total (factor final 1.5 para zoom-in).
             clip_duration: Duración TOTAL del clip (¡Obligatorio!).
-            quality: Calidad del redimensionado ('high' para LANCZOS, 'medium' para BILINEAR).
+            quality: Calidad del redimensionado ('high' para LANCZOS, 'medium' para BILINEAR, 'draft' para NEAREST).
         """
         if clip_duration is None or clip_duration <= 0:
             raise ValueError(f"{self.__class__.__name__} requiere una clip_duration válida > 0.")
@@ -28,7 +36,7 @@ class ZoomEffect(Effect):
         self.zoom_in = zoom_in
         self.total_zoom_change = abs(ratio)
         self.clip_duration = clip_duration
-        self.resample_mode = Resampling.LANCZOS if quality == 'high' else Resampling.BILINEAR
+        self.resample_mode = modo_remuestreo(quality)
 
     def apply(self, get_frame: Callable[[float], np.ndarray], t: float) -> np.ndarray:
         img = None # Inicializar
@@ -89,14 +97,14 @@ class PanEffect(Effect):
                          Valores más altos permiten más movimiento pero pueden reducir calidad.
             clip_duration: Duración del clip en segundos. Si no se proporciona, se usará un valor por defecto.
             easing: Si se debe aplicar suavizado al movimiento.
-            quality: Calidad del redimensionado ('high' para LANCZOS, 'medium' para BILINEAR).
+            quality: Calidad del redimensionado ('high' para LANCZOS, 'medium' para BILINEAR, 'draft' para NEAREST).
         """
         self.direction = direction.lower()
         self.speed = speed
         self.scale_factor = scale_factor
         self.clip_duration = clip_duration
         self.easing = easing
-        self.resample_mode = Resampling.LANCZOS if quality == 'high' else Resampling.BILINEAR
+        self.resample_mode = modo_remuestreo(quality)
         
     def apply(self, get_frame: Callable[[float], np.ndarray], t: float) -> np.ndarray:
         try:
@@ -243,17 +251,19 @@ class KenBurnsEffect(Effect):
     """
     
     def __init__(self, zoom_direction='in', pan_direction='up', 
-                 zoom_ratio=0.05, pan_speed=0.12, scale_factor=1.3, clip_duration=None):
+                 zoom_ratio=0.05, pan_speed=0.12, scale_factor=1.3, clip_duration=None, quality='high'):
         """Inicializa el efecto Ken Burns.
         
         Args:
             zoom_direction: Dirección del zoom ('in' o 'out')
             pan_direction: Dirección del paneo ('up', 'down', 'left', 'right', 'diagonal_up_right',
-                          'diagonal_up_left', 'diagonal_down_right', 'diagonal_down_left')
+                          'diagonal_up_left', 'diagonal_down_right', 'diagonal_down_left';
+                          'center' para solo zoom con el encuadre centrado)
             zoom_ratio: Factor de zoom por segundo
             pan_speed: Velocidad del paneo
             scale_factor: Factor para redimensionar la imagen original
             clip_duration: Duración del clip en segundos. Si no se proporciona, se usará un valor predeterminado.
+            quality: Calidad del redimensionado ('high' para LANCZOS, 'medium' para BILINEAR, 'draft' para NEAREST).
         """
         self.zoom_in = zoom_direction.lower() == 'in'
         self.zoom_ratio = zoom_ratio
@@ -261,6 +271,7 @@ class KenBurnsEffect(Effect):
         self.pan_speed = pan_speed
         self.scale_factor = scale_factor
         self.clip_duration = clip_duration
+        self.resample_mode = modo_remuestreo(quality)
     
     def apply(self, get_frame: Callable[[float], np.ndarray], t: float) -> np.ndarray:
         try:
@@ -290,7 +301,7 @@ class KenBurnsEffect(Effect):
             )
             
             # Redimensionar la imagen con zoom aplicado
-            img_zoomed = img.resize(new_size, Resampling.LANCZOS)
+            img_zoomed = img.resize(new_size, self.resample_mode)
             
             # Calcular desplazamientos máximos posibles
             max_offset_x = new_size[0] - base_size[0]
@@ -376,7 +387,7 @@ class KenBurnsEffect(Effect):
 
                 # Si el tamaño del recorte no coincide con el tamaño base, redimensionar
                 if img_result.size != base_size:
-                    img_result = img_result.resize(base_size, Resampling.LANCZOS)
+                    img_result = img_result.resize(base_size, self.resample_mode)
                 
                 result = np.array(img_result)
                 img_result.close()
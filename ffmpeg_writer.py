@@ -0,0 +1,771 @@
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+# Frecuencia de muestreo del audio intermedio
+FPS_AUDIO = 44100
+# Cada cuántos segundos se informa de la velocidad de codificación
+INTERVALO_INFORME = 2.0
+# Margen para la sobrecarga del contenedor MP4 al calcular el bitrate para un tamaño objetivo
+SOBRECARGA_CONTENEDOR = 0.02
+# Duración aproximada de cada segmento de un render reanudable, en segundos
+DURACION_SEGMENTO = 10.0
+# Versión del formato del manifiesto de segmentos; cambiarla invalida los renders a medias
+VERSION_MANIFIESTO = 1
+
+
+class RenderProfile:
+    """
+    Parámetros de una salida: resolución y encuadre, más los de codificación
+    (códec, preset, CRF, tune y GOP).
+    """
+    def __init__(self, nombre, codec='libx264', preset='medium', crf=23, tune=None, gop=None,
+                 pix_fmt='yuv420p', audio_codec='aac', audio_bitrate='192k', extra=None,
+                 resolucion=None, encuadre='crop', bitrate=None, tamano_objetivo_mb=None):
+        """
+        Args:
+            nombre: Nombre del perfil (se usa en mensajes y nombres de archivo).
+            codec: Códec de vídeo de ffmpeg.
+            preset: Preset de x264 ('ultrafast' ... 'veryslow').
+            crf: Factor de calidad constante (menor = más calidad y más tamaño).
+            tune: Ajuste de x264 opcional ('film', 'animation', 'stillimage', 'fastdecode'...).
+            gop: Distancia máxima entre fotogramas clave, en frames. None = valor de x264.
+            pix_fmt: Formato de píxel de salida (yuv420p es el compatible con reproductores).
+            audio_codec: Códec de audio.
+            audio_bitrate: Bitrate del audio.
+            extra: Lista de argumentos adicionales de ffmpeg para la salida.
+            resolucion: Resolución (ancho, alto) de la salida. None = la del render.
+            encuadre: Cómo adaptar una relación de aspecto distinta: 'crop' recorta el
+                      centro (p. ej. el corte vertical 9:16) y 'pad' añade bandas negras.
+            bitrate: Bitrate de vídeo objetivo en kbps. Activa la codificación en dos
+                     pasadas en lugar de CRF.
+            tamano_objetivo_mb: Tamaño final objetivo en MB (vídeo + audio). Activa la
+                                codificación en dos pasadas con el bitrate que lo cumple.
+        """
+        self.nombre = nombre
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.tune = tune
+        self.gop = gop
+        self.pix_fmt = pix_fmt
+        self.audio_codec = audio_codec
+        self.audio_bitrate = audio_bitrate
+        self.extra = list(extra or [])
+        self.resolucion = tuple(resolucion) if resolucion else None
+        self.encuadre = encuadre
+        self.bitrate = bitrate
+        self.tamano_objetivo_mb = tamano_objetivo_mb
+
+    def copy(self, **cambios):
+        """Devuelve una copia del perfil con los atributos indicados cambiados."""
+        perfil = RenderProfile(self.nombre, self.codec, self.preset, self.crf, self.tune, self.gop,
+                               self.pix_fmt, self.audio_codec, self.audio_bitrate, self.extra,
+                               self.resolucion, self.encuadre, self.bitrate, self.tamano_objetivo_mb)
+        for nombre, valor in cambios.items():
+            if not hasattr(perfil, nombre):
+                raise ValueError(f"Atributo de perfil desconocido: {nombre}")
+            setattr(perfil, nombre, valor)
+        return perfil
+
+    def filtro(self, tamano_entrada):
+        """
+        Filtro de ffmpeg que lleva los frames del render a la resolución del perfil,
+        o None si no hace falta transformarlos.
+        """
+        if not self.resolucion or tuple(self.resolucion) == tuple(tamano_entrada):
+            return None
+        ancho, alto = self.resolucion
+        ancho_in, alto_in = tamano_entrada
+        filtros = []
+        if ancho * alto_in != alto * ancho_in:
+            if self.encuadre == 'pad':
+                filtros.append(f"scale={ancho}:{alto}:force_original_aspect_ratio=decrease:flags=lanczos")
+                filtros.append(f"pad={ancho}:{alto}:(ow-iw)/2:(oh-ih)/2:black")
+                return ','.join(filtros)
+            # Recortar el centro con la relación de aspecto de destino (dimensiones pares)
+            if ancho * alto_in < alto * ancho_in:
+                recorte = (alto_in * ancho // alto // 2 * 2, alto_in)
+            else:
+                recorte = (ancho_in, ancho_in * alto // ancho // 2 * 2)
+            filtros.append(f"crop={recorte[0]}:{recorte[1]}")
+        filtros.append(f"scale={ancho}:{alto}:flags=lanczos")
+        return ','.join(filtros)
+
+    def ampliacion(self, tamano_entrada):
+        """
+        Factor con el que el perfil amplía los píxeles del render (1.0 si no los amplía).
+        El corte vertical de un render 1080p es de 608x1080: llevarlo a 1080x1920 lo
+        amplía 1.78x, así que esa salida tiene calidad de vista previa.
+        """
+        if not self.resolucion:
+            return 1.0
+        ancho, alto = self.resolucion
+        ancho_in, alto_in = tamano_entrada
+        if self.encuadre == 'pad':
+            return max(1.0, min(ancho / ancho_in, alto / alto_in))
+        return max(1.0, max(ancho / ancho_in, alto / alto_in))
+
+    @property
+    def dos_pasadas(self):
+        """True si el perfil codifica a un bitrate o tamaño objetivo (dos pasadas)."""
+        return bool(self.bitrate or self.tamano_objetivo_mb)
+
+    def bitrate_audio_kbps(self):
+        """Bitrate del audio en kbps a partir de `audio_bitrate` ('192k' -> 192)."""
+        valor = str(self.audio_bitrate).strip().lower()
+        if valor.endswith('k'):
+            return float(valor[:-1])
+        return float(valor) / 1000
+
+    def bitrate_video_kbps(self, duracion, con_audio=True):
+        """
+        Bitrate de vídeo para este perfil: el indicado, o el que cumple el tamaño
+        objetivo para la duración dada (descontando el audio y la sobrecarga del MP4).
+        """
+        if self.bitrate:
+            return float(self.bitrate)
+        bits_totales = self.tamano_objetivo_mb * 8 * 1024 * 1024 * (1 - SOBRECARGA_CONTENEDOR)
+        kbps = bits_totales / duracion / 1000
+        if con_audio:
+            kbps -= self.bitrate_audio_kbps()
+        if kbps <= 0:
+            raise ValueError(f"El tamaño objetivo de {self.tamano_objetivo_mb} MB no alcanza "
+                             f"para {duracion:.0f} s de vídeo")
+        return kbps
+
+    def tamano_previsto_mb(self, duracion, con_audio=True):
+        """Tamaño previsto en MB de una codificación en dos pasadas."""
+        kbps = self.bitrate_video_kbps(duracion, con_audio)
+        if con_audio:
+            kbps += self.bitrate_audio_kbps()
+        return kbps * 1000 * duracion / 8 / (1024 * 1024) / (1 - SOBRECARGA_CONTENEDOR)
+
+    def video_args(self, bitrate_kbps=None):
+        """
+        Argumentos de ffmpeg para el vídeo de salida. Con `bitrate_kbps` se codifica a
+        bitrate medio (para las dos pasadas) en lugar de con CRF.
+        """
+        args = ['-c:v', self.codec, '-preset', self.preset]
+        if bitrate_kbps:
+            args += ['-b:v', f'{int(bitrate_kbps)}k']
+        elif self.crf is not None:
+            args += ['-crf', str(self.crf)]
+        if self.tune:
+            args += ['-tune', self.tune]
+        if self.gop:
+            args += ['-g', str(int(self.gop))]
+        args += ['-pix_fmt', self.pix_fmt]
+        return args + self.extra
+
+    def audio_args(self):
+        """Argumentos de ffmpeg para el audio de salida."""
+        return ['-c:a', self.audio_codec, '-b:a', self.audio_bitrate]
+
+    def __repr__(self):
+        resolucion = f"{self.resolucion[0]}x{self.resolucion[1]}, " if self.resolucion else ""
+        if self.tamano_objetivo_mb:
+            calidad = f"tamano_objetivo_mb={self.tamano_objetivo_mb}"
+        elif self.bitrate:
+            calidad = f"bitrate={self.bitrate}k"
+        else:
+            calidad = f"crf={self.crf}"
+        return (f"RenderProfile({self.nombre!r}, {resolucion}preset={self.preset!r}, {calidad}, "
+                f"tune={self.tune!r}, gop={self.gop})")
+
+
+PERFIL_FINAL = RenderProfile('final', preset='medium', crf=23)
+PERFIL_BORRADOR = RenderProfile('borrador', preset='ultrafast', crf=28, tune='fastdecode')
+# Intermedio sin pérdidas para las dos pasadas: rápido de escribir y de leer
+PERFIL_INTERMEDIO = RenderProfile('intermedio', preset='ultrafast', crf=None, pix_fmt='yuv420p',
+                                  audio_codec='pcm_s16le', audio_bitrate='1411k', extra=['-qp', '0'])
+
+# Perfiles con nombre para publicar (GOP de 2 s a 24 fps, como piden las plataformas).
+# 'vertical' se recorta del render horizontal y se amplía (ver RenderProfile.ampliacion):
+# es una salida de calidad de vista previa, con un CRF más alto porque más bits no
+# recuperan el detalle que el recorte no tiene. Para un vertical a resolución completa,
+# renderizar con resolucion_salida=(1080, 1920)
+PERFILES_RENDER = {
+    'final': PERFIL_FINAL,
+    'borrador': PERFIL_BORRADOR,
+    '1080p': RenderProfile('1080p', preset='medium', crf=21, tune='stillimage', gop=48,
+                           resolucion=(1920, 1080)),
+    '720p': RenderProfile('720p', preset='medium', crf=23, tune='stillimage', gop=48,
+                          resolucion=(1280, 720)),
+    'vertical': RenderProfile('vertical', preset='medium', crf=28, tune='stillimage', gop=48,
+                              resolucion=(1080, 1920), encuadre='crop'),
+}
+
+
+def obtener_perfil(perfil):
+    """
+    Devuelve un RenderProfile a partir de su nombre (o el propio perfil si ya lo es).
+
+    Returns:
+        El perfil, o None si el nombre no existe (se informa por consola).
+    """
+    if isinstance(perfil, RenderProfile):
+        return perfil
+    encontrado = PERFILES_RENDER.get(str(perfil).strip().lower())
+    if encontrado is None:
+        print(f"Perfil de render desconocido: {perfil}. Disponibles: {', '.join(PERFILES_RENDER)}")
+    return encontrado
+
+
+class FFmpegWriter:
+    """
+    Envía frames RGB uint8 directamente a la entrada estándar de un proceso ffmpeg.
+
+    Los frames que no son uint8 contiguos (p. ej. los float que producen las
+    transiciones) se convierten sobre un único búfer reutilizado, sin crear copias
+    nuevas por frame. Con varias salidas, el mismo flujo de frames se reparte dentro de
+    ffmpeg (filtro split) y cada rama se escala, recorta y codifica con su perfil, así
+    los efectos se renderizan una sola vez. Cada salida se escribe en un archivo
+    temporal que se renombra al cerrar, de modo que nunca queda un MP4 truncado con
+    el nombre final.
+    """
+    def __init__(self, salidas, tamano, fps, archivo_audio=None, duracion=None, ffmpeg_binary=None,
+                 filtro_video=None):
+        """
+        Args:
+            salidas: Lista de tuplas (ruta_salida, RenderProfile).
+            tamano: Tamaño de los frames (ancho, alto).
+            fps: Frames por segundo.
+            archivo_audio: Archivo de audio opcional que se multiplexa con el vídeo.
+            duracion: Duración máxima de las salidas en segundos (recorta el audio que
+                      sobre; un audio más corto que el vídeo se deja tal cual).
+            ffmpeg_binary: Ejecutable de ffmpeg. Por defecto, el que usa MoviePy.
+            filtro_video: Filtro de ffmpeg aplicado a los frames antes de repartirlos
+                          entre las salidas (p. ej. subtítulos con subtitulos_ass.filtro_ass).
+        """
+        self.salidas = [(Path(ruta), perfil) for ruta, perfil in salidas]
+        if not self.salidas:
+            raise ValueError("FFmpegWriter necesita al menos una salida")
+        self.tamano = (int(tamano[0]), int(tamano[1]))
+        self.fps = fps
+        self.archivo_audio = archivo_audio
+        self.duracion = duracion
+        self.filtro_video = filtro_video
+        self.ffmpeg_binary = ffmpeg_binary or FFMPEG_BINARY
+        self.frames_escritos = 0
+        self._rutas_temporales = [ruta.with_name(f"{ruta.stem}.part{ruta.suffix}") for ruta, _ in self.salidas]
+        self._buffer = np.empty((self.tamano[1], self.tamano[0], 3), dtype=np.uint8)
+        self._proceso = None
+        self._log = None
+
+    def _grafo_filtros(self):
+        """Filtro que reparte la entrada entre las salidas, o None si no hace falta."""
+        filtros = [perfil.filtro(self.tamano) for _, perfil in self.salidas]
+        if len(self.salidas) == 1 and filtros[0] is None and not self.filtro_video:
+            return None
+        # El filtro común se aplica una sola vez, antes de repartir los frames
+        entrada, grafo = '[0:v]', []
+        if self.filtro_video:
+            entrada, grafo = '[base]', [f"[0:v]{self.filtro_video}[base]"]
+        if len(self.salidas) == 1:
+            return ';'.join(grafo + [f"{entrada}{filtros[0] or 'null'}[v0]"])
+        ramas = ''.join(f"[s{i}]" for i in range(len(self.salidas)))
+        grafo.append(f"{entrada}split={len(self.salidas)}{ramas}")
+        for i, filtro in enumerate(filtros):
+            grafo.append(f"[s{i}]{filtro or 'null'}[v{i}]")
+        return ';'.join(grafo)
+
+    def comando(self):
+        """Línea de comandos de ffmpeg para estas salidas."""
+        ancho, alto = self.tamano
+        cmd = [self.ffmpeg_binary, '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{ancho}x{alto}', '-r', str(self.fps),
+               '-i', '-']
+        if self.archivo_audio:
+            cmd += ['-i', str(self.archivo_audio)]
+        grafo = self._grafo_filtros()
+        if grafo:
+            cmd += ['-filter_complex', grafo]
+        for i, (_, perfil) in enumerate(self.salidas):
+            cmd += ['-map', f'[v{i}]' if grafo else '0:v:0']
+            if self.archivo_audio:
+                cmd += ['-map', '1:a:0']
+            cmd += perfil.video_args()
+            if self.archivo_audio:
+                cmd += perfil.audio_args()
+            if self.duracion:
+                cmd += ['-t', f'{self.duracion:.3f}']
+            cmd += ['-movflags', '+faststart', str(self._rutas_temporales[i])]
+        return cmd
+
+    def open(self):
+        for ruta, _ in self.salidas:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+        # stderr a un archivo temporal: una tubería llena bloquearía a ffmpeg
+        self._log = tempfile.TemporaryFile()
+        self._proceso = subprocess.Popen(self.comando(), stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=self._log)
+        return self
+
+    def write_frame(self, frame):
+        """Escribe un frame (alto, ancho, 3) en ffmpeg."""
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+        if frame.shape[0] != self._buffer.shape[0] or frame.shape[1] != self._buffer.shape[1]:
+            raise ValueError(f"Frame de {frame.shape[1]}x{frame.shape[0]}, se esperaba "
+                             f"{self.tamano[0]}x{self.tamano[1]}")
+        if frame.shape[2] != 3:
+            # Escala de grises -> RGB por difusión; RGBA -> descartar alfa
+            frame = np.broadcast_to(frame[:, :, :1], self._buffer.shape) if frame.shape[2] == 1 else frame[:, :, :3]
+        if frame.dtype == np.uint8 and frame.flags.c_contiguous:
+            datos = frame
+        else:
+            np.copyto(self._buffer, frame, casting='unsafe')
+            datos = self._buffer
+        try:
+            self._proceso.stdin.write(memoryview(datos).cast('B'))
+        except BrokenPipeError:
+            # Esperar a que ffmpeg termine para que su mensaje de error esté en el log
+            self._proceso.wait()
+            raise IOError(f"ffmpeg terminó inesperadamente:\n{self._leer_log()}")
+        self.frames_escritos += 1
+
+    def close(self):
+        """Cierra ffmpeg y renombra las salidas. Lanza IOError si ffmpeg falló."""
+        if self._proceso is None:
+            return
+        try:
+            self._proceso.stdin.close()
+        except BrokenPipeError:
+            pass
+        codigo = self._proceso.wait()
+        self._proceso = None
+        log = self._leer_log()
+        self._log.close()
+        if codigo != 0:
+            raise IOError(f"ffmpeg devolvió el código {codigo}:\n{log}")
+        for temporal, (ruta, _) in zip(self._rutas_temporales, self.salidas):
+            os.replace(temporal, ruta)
+
+    def abort(self):
+        """Detiene ffmpeg y elimina las salidas parciales."""
+        if self._proceso is not None:
+            self._proceso.kill()
+            self._proceso.wait()
+            self._proceso = None
+            self._log.close()
+        for temporal in self._rutas_temporales:
+            if temporal.exists():
+                temporal.unlink()
+
+    def _leer_log(self):
+        self._log.seek(0)
+        return self._log.read().decode('utf-8', errors='replace').strip()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        if tipo_excepcion is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def escribir_audio_temporal(audio, carpeta=None):
+    """
+    Escribe la pista de audio de un clip en un WAV temporal para multiplexarla con ffmpeg.
+
+    Returns:
+        Ruta del archivo WAV (el llamador debe borrarlo).
+    """
+    descriptor, ruta = tempfile.mkstemp(suffix='.wav', dir=carpeta)
+    os.close(descriptor)
+    audio.write_audiofile(ruta, fps=FPS_AUDIO, nbytes=2, codec='pcm_s16le', logger=None)
+    return ruta
+
+
+def escribir_video(clip, ruta_salida, fps, perfil=PERFIL_FINAL, informe_progreso=None, archivo_audio=None,
+                   filtro_video=None):
+    """
+    Renderiza un clip frame a frame y lo codifica con ffmpeg a través de una tubería,
+    sin pasar por write_videofile de MoviePy.
+
+    Args:
+        clip: Clip de vídeo (con audio opcional).
+        ruta_salida: Ruta del archivo de salida.
+        fps: Frames por segundo.
+        perfil: RenderProfile con los parámetros de codificación.
+        informe_progreso: Callback opcional (frames_escritos, total_frames, fps_codificacion).
+        archivo_audio: Audio ya mezclado. Si no se indica, se usa el audio del clip.
+        filtro_video: Filtro de ffmpeg aplicado a los frames antes de codificar.
+
+    Returns:
+        True si el vídeo se escribió correctamente.
+    """
+    return escribir_escalera(clip, [(ruta_salida, perfil)], fps, informe_progreso, archivo_audio=archivo_audio,
+                             filtro_video=filtro_video)
+
+
+def _renderizar(clip, salidas, fps, archivo_audio, informe_progreso, filtro_video=None):
+    """Envía todos los frames del clip a un FFmpegWriter con las salidas indicadas."""
+    total_frames = int(clip.duration * fps)
+    print(f"Codificando {total_frames} frames a {clip.size[0]}x{clip.size[1]} en {len(salidas)} salida(s):")
+    for ruta, perfil in salidas:
+        print(f"  - {os.path.basename(str(ruta))}: {perfil}")
+    inicio = ultimo_informe = time.perf_counter()
+    with FFmpegWriter(salidas, clip.size, fps, archivo_audio, duracion=clip.duration,
+                      filtro_video=filtro_video) as writer:
+        for indice in range(total_frames):
+            writer.write_frame(clip.get_frame(indice / fps))
+            ahora = time.perf_counter()
+            if ahora - ultimo_informe >= INTERVALO_INFORME or indice + 1 == total_frames:
+                ultimo_informe = ahora
+                fps_codificacion = (indice + 1) / max(ahora - inicio, 1e-6)
+                print(f"  {indice + 1}/{total_frames} frames ({fps_codificacion:.1f} fps)")
+                if informe_progreso:
+                    informe_progreso(indice + 1, total_frames, fps_codificacion)
+    duracion = time.perf_counter() - inicio
+    print(f"Codificación terminada en {duracion:.1f} s ({total_frames / max(duracion, 1e-6):.1f} fps medios)")
+
+
+def _ejecutar_ffmpeg(cmd):
+    """Ejecuta ffmpeg y lanza IOError con su salida de error si falla."""
+    resultado = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if resultado.returncode != 0:
+        raise IOError(f"ffmpeg devolvió el código {resultado.returncode}:\n"
+                      f"{resultado.stderr.decode('utf-8', errors='replace').strip()}")
+
+
+def codificar_desde_intermedio(intermedio, ruta_salida, perfil, tamano, duracion, con_audio=True,
+                               ffmpeg_binary=None):
+    """
+    Codifica una salida a partir del intermedio ya renderizado, sin volver a aplicar
+    efectos. Los perfiles con bitrate o tamaño objetivo se codifican en dos pasadas
+    (la primera también lee el intermedio) y se informa del tamaño previsto y el real.
+
+    Args:
+        intermedio: Ruta del intermedio sin pérdidas.
+        ruta_salida: Ruta del vídeo de salida.
+        perfil: RenderProfile de la salida.
+        tamano: Tamaño (ancho, alto) de los frames del intermedio.
+        duracion: Duración del vídeo en segundos.
+        con_audio: Si el intermedio tiene pista de audio.
+        ffmpeg_binary: Ejecutable de ffmpeg. Por defecto, el que usa MoviePy.
+
+    Returns:
+        Tamaño final del archivo en MB.
+    """
+    ffmpeg_binary = ffmpeg_binary or FFMPEG_BINARY
+    ruta_salida = Path(ruta_salida)
+    temporal = ruta_salida.with_name(f"{ruta_salida.stem}.part{ruta_salida.suffix}")
+    entrada = [ffmpeg_binary, '-y', '-loglevel', 'error', '-i', str(intermedio)]
+    filtro = perfil.filtro(tamano)
+    filtros = ['-vf', filtro] if filtro else []
+    salida_audio = (['-map', '0:a:0'] + perfil.audio_args() if con_audio else [])
+
+    if not perfil.dos_pasadas:
+        _ejecutar_ffmpeg(entrada + ['-map', '0:v:0'] + filtros + perfil.video_args() + salida_audio
+                         + ['-movflags', '+faststart', str(temporal)])
+        os.replace(temporal, ruta_salida)
+        return os.path.getsize(ruta_salida) / (1024 * 1024)
+
+    bitrate = perfil.bitrate_video_kbps(duracion, con_audio)
+    previsto = perfil.tamano_previsto_mb(duracion, con_audio)
+    print(f"Dos pasadas para {ruta_salida.name}: {bitrate:.0f} kbps de vídeo, tamaño previsto {previsto:.2f} MB")
+    log_pasadas = str(ruta_salida.with_name(f"{ruta_salida.stem}.2pass"))
+    try:
+        inicio = time.perf_counter()
+        _ejecutar_ffmpeg(entrada + ['-map', '0:v:0'] + filtros + perfil.video_args(bitrate)
+                         + ['-pass', '1', '-passlogfile', log_pasadas, '-an', '-f', 'null', os.devnull])
+        print(f"  Primera pasada: {time.perf_counter() - inicio:.1f} s")
+        inicio = time.perf_counter()
+        _ejecutar_ffmpeg(entrada + ['-map', '0:v:0'] + filtros + perfil.video_args(bitrate)
+                         + ['-pass', '2', '-passlogfile', log_pasadas] + salida_audio
+                         + ['-movflags', '+faststart', str(temporal)])
+        print(f"  Segunda pasada: {time.perf_counter() - inicio:.1f} s")
+    finally:
+        for archivo in Path(log_pasadas).parent.glob(f"{Path(log_pasadas).name}*"):
+            archivo.unlink()
+    os.replace(temporal, ruta_salida)
+
+    real = os.path.getsize(ruta_salida) / (1024 * 1024)
+    desviacion = (real - previsto) / previsto * 100 if previsto else 0.0
+    print(f"  Tamaño de {ruta_salida.name}: previsto {previsto:.2f} MB, real {real:.2f} MB ({desviacion:+.1f}%)")
+    if perfil.tamano_objetivo_mb and real > perfil.tamano_objetivo_mb:
+        print(f"  ADVERTENCIA: {ruta_salida.name} supera el tamaño objetivo de {perfil.tamano_objetivo_mb} MB")
+    return real
+
+
+def escribir_escalera(clip, salidas, fps, informe_progreso=None, ruta_intermedio=None, archivo_audio=None,
+                      filtro_video=None, clave_intermedio=None, conservar_intermedio=True):
+    """
+    Renderiza un clip una sola vez y lo codifica en varias salidas (p. ej. 1080p, 720p y
+    vertical 9:16) desde el mismo flujo de frames.
+
+    Si algún perfil pide un bitrate o tamaño objetivo, los frames se escriben una vez en
+    un intermedio sin pérdidas y todas las salidas se codifican a partir de él (las de
+    dos pasadas leen el intermedio en ambas pasadas, sin repetir los efectos).
+
+    Args:
+        clip: Clip de vídeo (con audio opcional), a la resolución más alta de la escalera.
+        salidas: Lista de tuplas (ruta_salida, RenderProfile).
+        fps: Frames por segundo.
+        informe_progreso: Callback opcional (frames_escritos, total_frames, fps_codificacion).
+        ruta_intermedio: Dónde guardar el intermedio (se conserva para poder volver a
+                         codificar con otro objetivo). Por defecto, un temporal que se borra.
+        clave_intermedio: Firma del contenido del render (parámetros que afectan a los
+                          frames y al audio, y archivos de entrada). Se guarda junto al
+                          intermedio; si coincide en la siguiente ejecución, no se vuelve
+                          a componer el vídeo y solo se codifican las salidas.
+        conservar_intermedio: False para borrar `ruta_intermedio` tras codificar las
+                              salidas (un intermedio sin pérdidas a 1080p ocupa varios GB).
+        archivo_audio: Audio ya mezclado (p. ej. WAV del mezclador). Si no se indica, se
+                       escribe el audio del clip en un temporal.
+        filtro_video: Filtro de ffmpeg aplicado a los frames antes de repartirlos entre
+                      las salidas (o antes de escribir el intermedio).
+
+    Returns:
+        True si todas las salidas se escribieron correctamente.
+    """
+    for ruta, perfil in salidas:
+        ampliacion = perfil.ampliacion(clip.size)
+        if ampliacion > 1.0:
+            print(f"ADVERTENCIA: La salida '{perfil.nombre}' amplía el render {ampliacion:.2f}x "
+                  f"({Path(ruta).name}): calidad de vista previa")
+
+    audio_temporal = None
+    if archivo_audio is None and clip.audio is not None:
+        archivo_audio = audio_temporal = escribir_audio_temporal(clip.audio, carpeta=Path(salidas[0][0]).parent)
+
+    try:
+        if not any(perfil.dos_pasadas for _, perfil in salidas):
+            _renderizar(clip, salidas, fps, archivo_audio, informe_progreso, filtro_video)
+            return True
+
+        conservar = ruta_intermedio is not None and conservar_intermedio
+        if ruta_intermedio is None:
+            ruta_intermedio = Path(salidas[0][0]).with_name(f".{Path(salidas[0][0]).stem}_intermedio.mkv")
+        ruta_intermedio = Path(ruta_intermedio)
+        ruta_manifiesto = ruta_intermedio.with_suffix('.json')
+        clave = None
+        if clave_intermedio:
+            datos = repr((clave_intermedio, fps, tuple(clip.size), filtro_video, archivo_audio is not None))
+            clave = hashlib.sha1(datos.encode('utf-8')).hexdigest()
+        if clave and ruta_intermedio.is_file() and _cargar_manifiesto(ruta_manifiesto, clave):
+            print(f"Reutilizando el intermedio sin pérdidas {ruta_intermedio.name} (mismo render): "
+                  f"solo se codifican las salidas")
+        else:
+            if ruta_manifiesto.exists():
+                ruta_manifiesto.unlink()
+            print(f"Renderizando intermedio sin pérdidas en {ruta_intermedio}")
+            _renderizar(clip, [(ruta_intermedio, PERFIL_INTERMEDIO)], fps, archivo_audio, informe_progreso,
+                        filtro_video)
+            if clave and conservar:
+                _guardar_manifiesto(ruta_manifiesto, {'version': VERSION_MANIFIESTO, 'clave': clave})
+        try:
+            for ruta, perfil in salidas:
+                codificar_desde_intermedio(ruta_intermedio, ruta, perfil, clip.size, clip.duration,
+                                           con_audio=archivo_audio is not None)
+        finally:
+            if not conservar:
+                for archivo in (ruta_intermedio, ruta_manifiesto):
+                    if archivo.exists():
+                        archivo.unlink()
+        return True
+    finally:
+        if audio_temporal and os.path.exists(audio_temporal):
+            os.remove(audio_temporal)
+
+
+# Códec de la pista de subtítulos según el contenedor (MP4 solo admite mov_text)
+CODECS_SUBTITULOS = {'.mp4': 'mov_text', '.m4v': 'mov_text', '.mov': 'mov_text', '.webm': 'webvtt', '.mkv': 'ass'}
+
+
+def mux_subtitulos(ruta_video, pistas, ruta_salida=None, ffmpeg_binary=None):
+    """
+    Añade pistas de subtítulos a un vídeo ya codificado sin recodificar la imagen ni el
+    audio (-c copy). Las pistas de subtítulos que ya tuviera se sustituyen, así que
+    cambiar el idioma de los subtítulos cuesta un remux de pocos segundos en lugar de
+    un render completo.
+
+    Args:
+        ruta_video: Vídeo de entrada.
+        pistas: Lista de tuplas (archivo_subtitulos, idioma ISO 639-2, p. ej. 'spa').
+                Admite SRT, VTT y ASS.
+        ruta_salida: Vídeo de salida. Por defecto se sustituye el de entrada.
+        ffmpeg_binary: Ejecutable de ffmpeg. Por defecto, el que usa MoviePy.
+
+    Returns:
+        Ruta del vídeo con subtítulos.
+    """
+    ruta_video = Path(ruta_video)
+    ruta_salida = Path(ruta_salida) if ruta_salida else ruta_video
+    codec = CODECS_SUBTITULOS.get(ruta_salida.suffix.lower())
+    if codec is None:
+        raise ValueError(f"El contenedor {ruta_salida.suffix} no admite pistas de subtítulos de texto")
+    temporal = ruta_salida.with_name(f"{ruta_salida.stem}.part{ruta_salida.suffix}")
+
+    cmd = [ffmpeg_binary or FFMPEG_BINARY, '-y', '-loglevel', 'error', '-i', str(ruta_video)]
+    for archivo, _ in pistas:
+        cmd += ['-i', str(archivo)]
+    cmd += ['-map', '0:v', '-map', '0:a?']
+    for i, (_, idioma) in enumerate(pistas):
+        cmd += ['-map', f'{i + 1}:0', f'-metadata:s:s:{i}', f'language={idioma}']
+    cmd += ['-c:v', 'copy', '-c:a', 'copy', '-c:s', codec]
+    if codec == 'mov_text':
+        cmd += ['-movflags', '+faststart']
+    cmd.append(str(temporal))
+
+    inicio = time.perf_counter()
+    _ejecutar_ffmpeg(cmd)
+    os.replace(temporal, ruta_salida)
+    idiomas = ', '.join(idioma for _, idioma in pistas)
+    print(f"Subtítulos ({idiomas}) añadidos como pista {codec} a {ruta_salida.name} "
+          f"en {time.perf_counter() - inicio:.1f} s")
+    return ruta_salida
+
+
+def _guardar_manifiesto(ruta, manifiesto):
+    """Escribe el manifiesto en un temporal y lo renombra (nunca queda a medias)."""
+    temporal = ruta.with_suffix('.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+def _cargar_manifiesto(ruta, clave):
+    """Devuelve el manifiesto guardado si corresponde al mismo render, o None."""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifiesto.get('version') != VERSION_MANIFIESTO or manifiesto.get('clave') != clave:
+        return None
+    return manifiesto
+
+
+def escribir_reanudable(clip, ruta_salida, fps, perfil=PERFIL_FINAL, carpeta_segmentos=None, clave='',
+                        duracion_segmento=DURACION_SEGMENTO, informe_progreso=None, archivo_audio=None,
+                        filtro_video=None):
+    """
+    Renderiza un clip en segmentos independientes alineados con el GOP y los une al
+    final sin recodificar (concat con -c copy). Un manifiesto JSON registra los
+    segmentos terminados, de modo que si el proceso muere a mitad del render, la
+    siguiente llamada con la misma clave continúa desde el último segmento completo.
+
+    Args:
+        clip: Clip de vídeo (con audio opcional).
+        ruta_salida: Ruta del archivo de salida.
+        fps: Frames por segundo.
+        perfil: RenderProfile de codificación (no admite dos pasadas).
+        carpeta_segmentos: Carpeta de los segmentos y el manifiesto.
+        clave: Identificador del render (p. ej. un hash de sus parámetros). Si no
+               coincide con el del manifiesto guardado, se empieza de cero.
+        duracion_segmento: Duración aproximada de cada segmento en segundos.
+        informe_progreso: Callback opcional (frames_escritos, total_frames, fps_codificacion).
+        archivo_audio: Audio ya mezclado. Si no se indica, se usa el audio del clip.
+        filtro_video: Filtro de ffmpeg aplicado a los frames de cada segmento, con las
+                      marcas de tiempo del vídeo completo (los subtítulos ASS caen en su sitio).
+
+    Returns:
+        True si el vídeo se escribió correctamente.
+    """
+    ruta_salida = Path(ruta_salida)
+    if carpeta_segmentos is None:
+        carpeta_segmentos = ruta_salida.with_name(f".{ruta_salida.stem}_segmentos")
+    carpeta_segmentos = Path(carpeta_segmentos)
+    carpeta_segmentos.mkdir(parents=True, exist_ok=True)
+    ruta_manifiesto = carpeta_segmentos / 'manifiesto.json'
+
+    # Segmentos de un número entero de GOPs; cada uno empieza con un fotograma clave
+    gop = int(perfil.gop or round(2 * fps))
+    perfil = perfil.copy(gop=gop)
+    frames_por_segmento = max(1, round(duracion_segmento * fps / gop)) * gop
+    total_frames = int(clip.duration * fps)
+    num_segmentos = max(1, -(-total_frames // frames_por_segmento))
+
+    clave_completa = f"{clave}|{clip.size[0]}x{clip.size[1]}|{fps}|{total_frames}|{frames_por_segmento}|{perfil!r}"
+    manifiesto = _cargar_manifiesto(ruta_manifiesto, clave_completa)
+    if manifiesto is None:
+        manifiesto = {'version': VERSION_MANIFIESTO, 'clave': clave_completa, 'segmentos': {}}
+        _guardar_manifiesto(ruta_manifiesto, manifiesto)
+
+    # Solo cuentan los segmentos anotados cuyo archivo sigue existiendo
+    terminados = {int(i) for i, nombre in manifiesto['segmentos'].items()
+                  if (carpeta_segmentos / nombre).is_file()}
+    if terminados:
+        print(f"Reanudando render: {len(terminados)}/{num_segmentos} segmentos ya completados")
+
+    print(f"Codificando {total_frames} frames a {clip.size[0]}x{clip.size[1]} en {num_segmentos} "
+          f"segmentos de {frames_por_segmento} frames con {perfil}")
+    inicio = ultimo_informe = time.perf_counter()
+    frames_nuevos = 0
+    for indice_segmento in range(num_segmentos):
+        if indice_segmento in terminados:
+            continue
+        primer_frame = indice_segmento * frames_por_segmento
+        ultimo_frame = min(primer_frame + frames_por_segmento, total_frames)
+        nombre = f"segmento_{indice_segmento:05d}.mp4"
+        filtro_segmento = None
+        if filtro_video:
+            # Cada segmento empieza en t=0: el filtro ve el tiempo del vídeo completo
+            filtro_segmento = (f"setpts=PTS+{primer_frame / fps:.6f}/TB,{filtro_video},"
+                               f"setpts=PTS-STARTPTS")
+        with FFmpegWriter([(carpeta_segmentos / nombre, perfil)], clip.size, fps,
+                          filtro_video=filtro_segmento) as writer:
+            for indice in range(primer_frame, ultimo_frame):
+                writer.write_frame(clip.get_frame(indice / fps))
+                frames_nuevos += 1
+                ahora = time.perf_counter()
+                if ahora - ultimo_informe >= INTERVALO_INFORME:
+                    ultimo_informe = ahora
+                    fps_codificacion = frames_nuevos / max(ahora - inicio, 1e-6)
+                    print(f"  {indice + 1}/{total_frames} frames ({fps_codificacion:.1f} fps)")
+                    if informe_progreso:
+                        informe_progreso(indice + 1, total_frames, fps_codificacion)
+        # Anotar el segmento solo cuando su archivo está completo y renombrado
+        manifiesto['segmentos'][str(indice_segmento)] = nombre
+        _guardar_manifiesto(ruta_manifiesto, manifiesto)
+
+    # Unir los segmentos sin recodificar y añadir el audio
+    lista = carpeta_segmentos / 'segmentos.txt'
+    with open(lista, 'w', encoding='utf-8') as f:
+        for indice_segmento in range(num_segmentos):
+            f.write(f"file '{manifiesto['segmentos'][str(indice_segmento)]}'\n")
+
+    audio_temporal = None
+    if archivo_audio is None and clip.audio is not None:
+        archivo_audio = audio_temporal = escribir_audio_temporal(clip.audio, carpeta=carpeta_segmentos)
+    temporal = ruta_salida.with_name(f"{ruta_salida.stem}.part{ruta_salida.suffix}")
+    cmd = [FFMPEG_BINARY, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', str(lista)]
+    if archivo_audio:
+        cmd += ['-i', str(archivo_audio), '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy'] + perfil.audio_args()
+    else:
+        cmd += ['-c', 'copy']
+    cmd += ['-t', f'{clip.duration:.3f}', '-movflags', '+faststart', str(temporal)]
+    try:
+        _ejecutar_ffmpeg(cmd)
+    finally:
+        if audio_temporal and os.path.exists(audio_temporal):
+            os.remove(audio_temporal)
+    os.replace(temporal, ruta_salida)
+
+    # El vídeo final está completo: los segmentos ya no hacen falta
+    for nombre in manifiesto['segmentos'].values():
+        (carpeta_segmentos / nombre).unlink(missing_ok=True)
+    lista.unlink(missing_ok=True)
+    ruta_manifiesto.unlink(missing_ok=True)
+    try:
+        carpeta_segmentos.rmdir()
+    except OSError:
+        pass
+
+    duracion = time.perf_counter() - inicio
+    print(f"Codificación terminada en {duracion:.1f} s ({frames_nuevos} frames nuevos, "
+          f"{len(terminados)} segmentos reutilizados)")
+    return True
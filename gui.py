@@ -16,6 +16,7 @@ from efectos import ZoomEffect, PanUpEffect, PanDownEffect, PanLeftEffect, PanRi
 from transiciones import TransitionEffect
 from overlay_effects import OverlayEffect
 from app import crear_video_desde_imagenes
+from vista_previa import PreviewRenderer, TAMANO_PREVIEW
 
 # Importar el gestor de procesamiento por lotes para TTS
 from batch_tts import BatchTTSManager
@@ -28,13 +29,8 @@ except ImportError:
 
 # Importar funciones para subtítulos
 from subtitles import generate_srt_with_whisper, WHISPER_AVAILABLE
-
-# Importar Whisper si está disponible
-if WHISPER_AVAILABLE:
-    try:
-        from faster_whisper import WhisperModel
-    except ImportError:
-        print("ADVERTENCIA: No se pudo importar WhisperModel a pesar de que WHISPER_AVAILABLE es True")
+from transcripcion import TranscriptionService, BEAM_SIZE, BEST_OF
+from sprites_subtitulos import estilo_subtitulos_video
 
 class VideoCreatorApp:
     def __init__(self, root):
@@ -59,25 +55,27 @@ class VideoCreatorApp:
         self.whisper_compute_type = tk.StringVar(value="int8")  # Optimizado para CPU
         self.whisper_language = tk.StringVar(value="es")  # Idioma para transcripción
         self.whisper_word_timestamps = tk.BooleanVar(value=True)  # Usar timestamps por palabra
+        self.whisper_beam_size = tk.IntVar(value=BEAM_SIZE)  # 1 = decodificación voraz (más rápida)
+        self.whisper_best_of = tk.IntVar(value=BEST_OF)
+        self.whisper_vad = tk.BooleanVar(value=True)  # Saltar silencios con el VAD
+        self.whisper_cpu_threads = tk.IntVar(value=0)  # Hilos por transcripción (0 = automático)
         
-        # Cargar el modelo Whisper si está disponible
+        # Cargar el modelo Whisper si está disponible. El servicio de transcripción es el
+        # mismo para la cola de lotes, que transcribe varios proyectos a la vez
         if WHISPER_AVAILABLE:
-            try:
-                print(f"INFO GUI: Cargando modelo Whisper '{self.whisper_model_size.get()}' para {self.whisper_device.get()}...")
-                self.whisper_model = WhisperModel(
-                    self.whisper_model_size.get(),
-                    device=self.whisper_device.get(),
-                    compute_type=self.whisper_compute_type.get()
-                )
+            print(f"INFO GUI: Cargando modelo Whisper '{self.whisper_model_size.get()}' para {self.whisper_device.get()}...")
+            self.whisper_model = self.crear_servicio_transcripcion().cargar_modelo()
+            if self.whisper_model is not None:
                 print("INFO GUI: Modelo Whisper cargado exitosamente.")
-            except Exception as e_load_model:
-                print(f"ERROR GUI: No se pudo cargar el modelo Whisper: {e_load_model}")
+            else:
                 messagebox.showwarning(
                     "Advertencia: Modelo Whisper",
                     f"No se pudo cargar el modelo Whisper '{self.whisper_model_size.get()}'. \n"
-                    f"La generación automática de subtítulos no estará disponible.\n"
-                    f"Error: {e_load_model}"
+                    f"La generación automática de subtítulos no estará disponible."
                 )
+            for variable in (self.whisper_language, self.whisper_word_timestamps, self.whisper_beam_size,
+                             self.whisper_best_of, self.whisper_vad):
+                variable.trace_add('write', lambda *_: self.sincronizar_transcripcion())
         else:
             print("INFO GUI: faster-whisper no está disponible. No se cargará el modelo Whisper.")
         
@@ -141,6 +139,8 @@ class VideoCreatorApp:
         self.archivo_salida = tk.StringVar(value="video_salida.mp4")
         self.duracion_img = tk.DoubleVar(value=5.0)
         self.fps = tk.IntVar(value=24)
+        self.modo_borrador = tk.BooleanVar(value=False)  # Vista previa rápida a baja resolución
+        self.ajustar_a_voz = tk.BooleanVar(value=True)  # Repartir la duración de la voz entre las imágenes
         self.aplicar_efectos = tk.BooleanVar(value=True)
         self.tipo_efecto = tk.StringVar(value="in")
         self.modo_efecto = tk.StringVar(value="2")
@@ -331,6 +331,17 @@ class VideoCreatorApp:
         spin_fps = ttk.Spinbox(frame_duracion, from_=15, to=60, increment=1, textvariable=self.fps, width=5)
         spin_fps.grid(row=1, column=1, padx=5, pady=5, sticky="w")
         
+        # Modo borrador
+        chk_borrador = ttk.Checkbutton(frame_duracion, text="Modo borrador (vista previa rápida a media resolución)",
+                                       variable=self.modo_borrador)
+        chk_borrador.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+        
+        # Ajustar la duración de las imágenes a la voz en off
+        chk_ajustar_voz = ttk.Checkbutton(frame_duracion,
+                                          text="Ajustar la duración de las imágenes a la voz en off (cortes en las pausas)",
+                                          variable=self.ajustar_a_voz)
+        chk_ajustar_voz.grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+        
         # Lista de imágenes encontradas
         frame_imagenes = ttk.LabelFrame(tab, text="Imágenes Encontradas")
         frame_imagenes.pack(fill="both", expand=True, padx=10, pady=10)
@@ -850,11 +861,33 @@ class VideoCreatorApp:
         btn_siguiente = ttk.Button(frame_controles, text="Siguiente", command=self.mostrar_imagen_siguiente)
         btn_siguiente.pack(side="left", padx=5)
         
+        # Previsualizar la línea de tiempo real (efectos, transiciones y overlays)
+        self.preview_efectos = tk.BooleanVar(value=True)
+        chk_preview_efectos = ttk.Checkbutton(frame_controles, text="Previsualizar efectos",
+                                              variable=self.preview_efectos,
+                                              command=self.actualizar_preview)
+        chk_preview_efectos.pack(side="left", padx=10)
+        
+        # Deslizador de tiempo para recorrer el video
+        self.tiempo_preview = tk.DoubleVar(value=0.0)
+        self.scale_tiempo_preview = ttk.Scale(frame_controles, from_=0.0, to=1.0, orient="horizontal",
+                                              variable=self.tiempo_preview,
+                                              command=lambda valor: self.actualizar_preview())
+        self.scale_tiempo_preview.pack(side="left", fill="x", expand=True, padx=5)
+        
+        self.lbl_tiempo_preview = ttk.Label(frame_controles, text="0.0 s", width=14)
+        self.lbl_tiempo_preview.pack(side="left", padx=5)
+        
         # Variable para almacenar el índice de la imagen actual
         self.indice_imagen_actual = 0
         
         # Variable para almacenar la imagen actual (para evitar que sea eliminada por el recolector de basura)
         self.imagen_actual = None
+        
+        # Renderizador en segundo plano con caché LRU de frames y miniaturas
+        self.preview_renderer = PreviewRenderer(
+            tamano=TAMANO_PREVIEW,
+            on_frame=lambda t, imagen, duracion: self.root.after(0, self.mostrar_frame_preview, t, imagen, duracion))
     
     def configurar_tab_settings(self, tab):
         """Configura la pestaña de ajustes de efectos"""
@@ -1200,53 +1233,103 @@ class VideoCreatorApp:
         if not self.imagenes or self.indice_imagen_actual < 0 or self.indice_imagen_actual >= len(self.imagenes):
             return
         
+        # Con la vista previa de efectos activa, saltar al inicio de la imagen en la línea de tiempo
+        if self.preview_efectos.get():
+            solape = self.settings_transition_duration.get() if self.aplicar_transicion.get() else 0.0
+            paso = max(0.1, self.duracion_img.get() - solape)
+            self.tiempo_preview.set(self.indice_imagen_actual * paso)
+            self.actualizar_preview()
+            return
+        
         # Obtener la ruta de la imagen actual
         ruta_imagen = self.imagenes[self.indice_imagen_actual]
         
         try:
-            # Cargar la imagen con PIL
-            img = Image.open(ruta_imagen)
-            
-            # Redimensionar la imagen para que quepa en el canvas
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-            
-            # Asegurarse de que el canvas tenga un tamaño válido
-            if canvas_width <= 1 or canvas_height <= 1:
-                canvas_width = 640
-                canvas_height = 360
-            
-            # Calcular la relación de aspecto
-            img_width, img_height = img.size
-            ratio = min(canvas_width / img_width, canvas_height / img_height)
-            
-            # Calcular el nuevo tamaño
-            new_width = int(img_width * ratio)
-            new_height = int(img_height * ratio)
-            
-            # Redimensionar la imagen
-            img = img.resize((new_width, new_height), Image.LANCZOS)
-            
-            # Convertir la imagen a formato Tkinter
-            self.imagen_actual = ImageTk.PhotoImage(img)
-            
-            # Limpiar el canvas
-            self.canvas.delete("all")
-            
-            # Calcular la posición para centrar la imagen
-            x = (canvas_width - new_width) // 2
-            y = (canvas_height - new_height) // 2
-            
-            # Mostrar la imagen en el canvas
-            self.canvas.create_image(x, y, anchor="nw", image=self.imagen_actual)
-            
-            # Mostrar el nombre de la imagen
+            # Miniatura decodificada a escala reducida y guardada en caché
+            img = self.preview_renderer.thumbnail(ruta_imagen)
             nombre_imagen = os.path.basename(ruta_imagen)
-            self.canvas.create_text(canvas_width // 2, 20, text=f"Imagen {self.indice_imagen_actual + 1}/{len(self.imagenes)}: {nombre_imagen}", fill="white")
+            self.dibujar_en_canvas(img, f"Imagen {self.indice_imagen_actual + 1}/{len(self.imagenes)}: {nombre_imagen}")
         
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo cargar la imagen: {str(e)}")
     
+    def dibujar_en_canvas(self, img, texto):
+        """Muestra una imagen PIL centrada en el canvas de vista previa."""
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        
+        # Asegurarse de que el canvas tenga un tamaño válido
+        if canvas_width <= 1 or canvas_height <= 1:
+            canvas_width, canvas_height = TAMANO_PREVIEW
+        
+        # Convertir la imagen a formato Tkinter
+        self.imagen_actual = ImageTk.PhotoImage(img)
+        
+        # Limpiar el canvas y centrar la imagen
+        self.canvas.delete("all")
+        x = (canvas_width - img.width) // 2
+        y = (canvas_height - img.height) // 2
+        self.canvas.create_image(x, y, anchor="nw", image=self.imagen_actual)
+        self.canvas.create_text(canvas_width // 2, 20, text=texto, fill="white")
+    
+    def obtener_parametros_preview(self):
+        """Parámetros de la línea de tiempo según la configuración actual de la GUI."""
+        overlays = self.obtener_overlays_seleccionados()
+        return {
+            'duracion_img': self.duracion_img.get(),
+            'aplicar_efectos': self.aplicar_efectos.get(),
+            'secuencia_efectos': self.obtener_secuencia_efectos(),
+            'aplicar_transicion': self.aplicar_transicion.get(),
+            'tipo_transicion': self.settings_transition_type.get(),
+            'duracion_transicion': self.settings_transition_duration.get(),
+            'aplicar_fade_in': self.aplicar_fade_in.get(),
+            'duracion_fade_in': self.duracion_fade_in.get(),
+            'aplicar_fade_out': self.aplicar_fade_out.get(),
+            'duracion_fade_out': self.duracion_fade_out.get(),
+            'aplicar_overlay': bool(overlays),
+            'archivos_overlay': overlays,
+            'opacidad_overlay': self.settings_overlay_opacity.get(),
+            'settings': {
+                'zoom_ratio': self.settings_zoom_ratio.get(),
+                'zoom_quality': self.settings_zoom_quality.get(),
+                'pan_scale_factor': self.settings_pan_scale_factor.get(),
+                'pan_easing': self.settings_pan_easing.get(),
+                'pan_quality': self.settings_pan_quality.get(),
+                'kb_zoom_ratio': self.settings_kb_zoom_ratio.get(),
+                'kb_scale_factor': self.settings_kb_scale_factor.get(),
+                'kb_quality': self.settings_kb_quality.get(),
+                'kb_direction': self.settings_kb_direction.get()
+            }
+        }
+    
+    def actualizar_preview(self):
+        """Pide al renderizador el frame del instante seleccionado en el deslizador."""
+        if not self.imagenes:
+            return
+        if not self.preview_efectos.get():
+            self.mostrar_imagen_actual()
+            return
+        try:
+            parametros = self.obtener_parametros_preview()
+        except (tk.TclError, ValueError):
+            # Un campo a medio escribir: esperar al siguiente cambio
+            return
+        # Misma semilla que el render final (nombre de la carpeta del proyecto)
+        semilla = Path(self.imagenes[0]).parent.parent.name
+        self.preview_renderer.configure(self.imagenes, parametros, semilla=semilla)
+        self.lbl_tiempo_preview.config(text="Renderizando...")
+        self.preview_renderer.request_frame(self.tiempo_preview.get())
+    
+    def mostrar_frame_preview(self, t, imagen, duracion):
+        """Muestra un frame renderizado (se llama en el hilo de la GUI)."""
+        if duracion:
+            self.scale_tiempo_preview.config(to=duracion)
+        if imagen is None:
+            self.lbl_tiempo_preview.config(text="Sin vista previa")
+            return
+        self.lbl_tiempo_preview.config(text=f"{t:.1f} / {duracion:.1f} s")
+        self.dibujar_en_canvas(imagen, f"{t:.1f} s")
+    
     def mostrar_imagen_anterior(self):
         if self.imagenes:
             self.indice_imagen_actual = (self.indice_imagen_actual - 1) % len(self.imagenes)
@@ -1338,7 +1421,8 @@ class VideoCreatorApp:
                 aplicar_fade_in=self.aplicar_fade_in.get(),
                 duracion_fade_in=self.duracion_fade_in.get(),
                 aplicar_fade_out=self.aplicar_fade_out.get(),
-                duracion_fade_out=self.duracion_fade_out.get()
+                duracion_fade_out=self.duracion_fade_out.get(),
+                modo_borrador=self.modo_borrador.get()
             )
 
             # Actualizar el estado al finalizar
@@ -1701,7 +1785,11 @@ class VideoCreatorApp:
                     'tamano_fuente_subtitulos': 24,  # Valores por defecto, podrían ser configurables
                     'color_fuente_subtitulos': 'white',
                     'color_borde_subtitulos': 'black',
-                    'grosor_borde_subtitulos': 1,
+                    'grosor_borde_subtitulos': self.settings_subtitles_stroke_width.get(),
+                    'modo_borrador': self.modo_borrador.get(),
+                    'ajustar_a_voz': self.ajustar_a_voz.get(),
+                    # Los trabajos largos de la cola se reanudan tras un cierre o un reinicio
+                    'reanudable': True,
                     'progress_callback': self.update_progress_bar
                 },
                 daemon=True
@@ -1841,6 +1929,47 @@ class VideoCreatorApp:
         else:
             return []
     
+    def crear_servicio_transcripcion(self):
+        """
+        Crea el servicio de transcripción con la configuración de Whisper de la GUI y lo
+        asigna a la cola de lotes (el anterior termina lo que tenga encolado).
+        """
+        anterior = self.batch_tts_manager.transcripcion
+        if anterior is not None:
+            anterior.cerrar(esperar=False)
+        servicio = TranscriptionService(
+            self.whisper_model_size.get(),
+            device=self.whisper_device.get(),
+            compute_type=self.whisper_compute_type.get(),
+            language=self.whisper_language.get(),
+            beam_size=self.whisper_beam_size.get(),
+            best_of=self.whisper_best_of.get(),
+            vad_filter=self.whisper_vad.get(),
+            cpu_threads=self.whisper_cpu_threads.get() or None,
+            word_timestamps=self.whisper_word_timestamps.get(),
+            # Las palabras se agrupan con el borde con el que la cola quema los subtítulos
+            estilo_subtitulos=estilo_subtitulos_video(stroke_width=self.settings_subtitles_stroke_width.get())
+        )
+        self.batch_tts_manager.transcripcion = servicio
+        return servicio
+    
+    def sincronizar_transcripcion(self):
+        """Aplica al servicio las opciones que no requieren recargar el modelo."""
+        servicio = self.batch_tts_manager.transcripcion
+        if servicio is None:
+            return
+        try:
+            servicio.language = self.whisper_language.get()
+            servicio.word_timestamps = self.whisper_word_timestamps.get()
+            servicio.beam_size = max(1, self.whisper_beam_size.get())
+            servicio.best_of = max(1, self.whisper_best_of.get())
+            servicio.vad_filter = self.whisper_vad.get()
+            servicio.estilo_subtitulos = estilo_subtitulos_video(
+                stroke_width=self.settings_subtitles_stroke_width.get())
+        except tk.TclError:
+            # Spinbox vacío o con texto a medio escribir
+            pass
+    
     def configurar_tab_subtitles(self, tab):
         """Configura la pestaña de subtítulos."""
         # Frame principal con padding
@@ -1924,33 +2053,43 @@ class VideoCreatorApp:
                                   foreground="#f39c12")
         lbl_device_info.pack(side="left", padx=10)
         
+        # Hilos de CPU por transcripción (el número de transcripciones simultáneas se
+        # ajusta a los núcleos de la máquina)
+        frame_threads = ttk.Frame(frame_model)
+        frame_threads.pack(fill="x", padx=10, pady=5)
+        
+        lbl_threads = ttk.Label(frame_threads, text="Hilos por archivo:", width=20)
+        lbl_threads.pack(side="left")
+        
+        threads_spin = ttk.Spinbox(frame_threads, from_=0, to=os.cpu_count() or 1,
+                                   textvariable=self.whisper_cpu_threads, width=5)
+        threads_spin.pack(side="left", padx=5)
+        
+        lbl_threads_info = ttk.Label(frame_threads, 
+                                   text="0 = automático (varios archivos a la vez en la cola)", 
+                                   foreground="#3498db")
+        lbl_threads_info.pack(side="left", padx=10)
+        
         # Botón para recargar el modelo
         def reload_whisper_model():
-            try:
-                # Verificar si ya hay un modelo cargado
-                if hasattr(self, 'whisper_model') and self.whisper_model is not None:
-                    # Liberar recursos del modelo anterior
-                    del self.whisper_model
-                    import gc
-                    gc.collect()
-                
-                # Cargar el nuevo modelo
-                print(f"Cargando modelo Whisper '{self.whisper_model_size.get()}' para {self.whisper_device.get()}...")
-                from faster_whisper import WhisperModel
-                self.whisper_model = WhisperModel(
-                    self.whisper_model_size.get(),
-                    device=self.whisper_device.get(),
-                    compute_type=self.whisper_compute_type.get()
-                )
+            # Liberar recursos del modelo anterior
+            self.whisper_model = None
+            import gc
+            gc.collect()
+            
+            # Cargar el nuevo modelo
+            print(f"Cargando modelo Whisper '{self.whisper_model_size.get()}' para {self.whisper_device.get()}...")
+            self.whisper_model = self.crear_servicio_transcripcion().cargar_modelo()
+            if self.whisper_model is not None:
                 messagebox.showinfo(
                     "Modelo Whisper",
-                    f"Modelo Whisper '{self.whisper_model_size.get()}' cargado exitosamente."
+                    f"Modelo Whisper '{self.whisper_model_size.get()}' cargado exitosamente.\n"
+                    f"{self.batch_tts_manager.transcripcion}"
                 )
-            except Exception as e:
-                print(f"Error al cargar el modelo Whisper: {e}")
+            else:
                 messagebox.showerror(
                     "Error",
-                    f"No se pudo cargar el modelo Whisper: {e}"
+                    f"No se pudo cargar el modelo Whisper '{self.whisper_model_size.get()}'."
                 )
         
         btn_reload = ttk.Button(frame_model, text="Recargar Modelo Whisper", 
@@ -1985,6 +2124,31 @@ class VideoCreatorApp:
                                    variable=self.whisper_word_timestamps)
         word_check.pack(padx=5, pady=5)
         
+        # Decodificación: haces de búsqueda y candidatos
+        frame_beam = ttk.Frame(frame_options)
+        frame_beam.pack(fill="x", padx=10, pady=5)
+        
+        lbl_beam = ttk.Label(frame_beam, text="Beam size / best of:", width=20)
+        lbl_beam.pack(side="left")
+        
+        beam_spin = ttk.Spinbox(frame_beam, from_=1, to=10, textvariable=self.whisper_beam_size, width=5)
+        beam_spin.pack(side="left", padx=5)
+        best_of_spin = ttk.Spinbox(frame_beam, from_=1, to=10, textvariable=self.whisper_best_of, width=5)
+        best_of_spin.pack(side="left", padx=5)
+        
+        lbl_beam_info = ttk.Label(frame_beam, 
+                                text="1 = más rápido, 5 = más preciso", 
+                                foreground="#3498db")
+        lbl_beam_info.pack(side="left", padx=10)
+        
+        # Filtro de voz (VAD)
+        frame_vad = ttk.Frame(frame_options)
+        frame_vad.pack(fill="x", padx=10, pady=5)
+        
+        vad_check = ttk.Checkbutton(frame_vad, text="Saltar silencios (VAD, transcripción más rápida)", 
+                                  variable=self.whisper_vad)
+        vad_check.pack(padx=5, pady=5)
+        
         # Nota informativa
         lbl_note = ttk.Label(main_frame, 
                            text="Nota: Los subtítulos se generarán automáticamente a partir del audio usando Whisper si está disponible.", 
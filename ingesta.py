@@ -0,0 +1,143 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+# Resolución de salida por defecto (ancho, alto)
+RESOLUCION_SALIDA = (1920, 1080)
+# Versión del formato de la caché; cambiarla invalida las imágenes normalizadas anteriores
+VERSION_CACHE = 1
+CALIDAD_JPEG_CACHE = 95
+# Extensiones admitidas (se comparan en minúsculas)
+FORMATOS_IMAGEN = ('.jpg', '.jpeg', '.png', '.bmp')
+# Número de orden al final del nombre: 'imagen_12.jpg' -> 12
+_PATRON_NUMERO = re.compile(r'_(\d+)\.')
+
+
+def extraer_numero(archivo):
+    """Devuelve el número de orden del nombre del archivo, o 0 si no tiene."""
+    match = _PATRON_NUMERO.search(os.path.basename(archivo))
+    return int(match.group(1)) if match else 0
+
+
+def escanear_imagenes(carpeta):
+    """
+    Lista las imágenes de una carpeta con un único recorrido del directorio,
+    ordenadas por el número que aparece al final del nombre.
+    """
+    with os.scandir(carpeta) as entradas:
+        archivos = [entrada.path for entrada in entradas
+                    if entrada.is_file() and os.path.splitext(entrada.name)[1].lower() in FORMATOS_IMAGEN]
+    archivos.sort(key=lambda archivo: (extraer_numero(archivo), os.path.basename(archivo)))
+    return archivos
+
+
+def cargar_imagen(archivo, tamano=None):
+    """
+    Decodifica una imagen completa, aplica la orientación EXIF y la convierte a RGB.
+
+    Args:
+        archivo: Ruta de la imagen.
+        tamano: Tamaño final aproximado. Si se indica, los JPEG se decodifican a escala
+                reducida (sin bajar de ese tamaño), lo que acelera mucho las fotos grandes.
+
+    Raises:
+        OSError, ValueError: Si el archivo está dañado o no es una imagen válida.
+    """
+    with Image.open(archivo) as img:
+        if tamano and img.format == 'JPEG':
+            # Pedir un cuadrado del lado mayor cubre la imagen tanto si EXIF la rota como si no
+            lado = max(tamano)
+            img.draft('RGB', (lado, lado))
+        # load() fuerza la decodificación completa: aquí aparecen los archivos truncados
+        img.load()
+        orientada = ImageOps.exif_transpose(img)
+        return orientada.convert('RGB')
+
+
+def _ruta_cache(archivo, tamano, cache_dir):
+    """Nombre en caché derivado de la ruta, fecha de modificación, tamaño y destino."""
+    st = os.stat(archivo)
+    clave = f"{os.path.abspath(archivo)}|{st.st_mtime_ns}|{st.st_size}|{tamano[0]}x{tamano[1]}|v{VERSION_CACHE}"
+    nombre = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+    return Path(cache_dir) / f"{nombre}.jpg"
+
+
+def normalizar_imagen(archivo, tamano, cache_dir):
+    """
+    Redimensiona y encuadra (letterbox) una imagen al tamaño indicado y la guarda en caché.
+
+    Args:
+        archivo: Ruta de la imagen original.
+        tamano: Tamaño final (ancho, alto).
+        cache_dir: Carpeta de la caché en disco.
+
+    Returns:
+        Ruta de la imagen normalizada.
+    """
+    destino = _ruta_cache(archivo, tamano, cache_dir)
+    if destino.is_file():
+        return str(destino)
+
+    img = cargar_imagen(archivo, tamano)
+    encuadrada = ImageOps.pad(img, tamano, method=Image.Resampling.LANCZOS, color=(0, 0, 0))
+    img.close()
+
+    # Escribir en un temporal y renombrar para no dejar ficheros a medias en la caché
+    temporal = destino.with_suffix(f".{os.getpid()}.tmp")
+    encuadrada.save(temporal, format='JPEG', quality=CALIDAD_JPEG_CACHE, subsampling=0)
+    encuadrada.close()
+    os.replace(temporal, destino)
+    return str(destino)
+
+
+def normalizar_imagenes(archivos, tamano_salida=RESOLUCION_SALIDA, cache_dir=None, max_workers=None):
+    """
+    Normaliza todas las imágenes una sola vez, en paralelo, antes de aplicar efectos.
+    La decodificación, la orientación EXIF y la validación se hacen en el mismo paso,
+    así los archivos dañados se detectan antes de empezar a renderizar.
+
+    Cada imagen se ajusta exactamente a la resolución de salida: los efectos amplían el
+    frame completo y recortan `base_size`, así que trabajar a la resolución de salida
+    (y no a la nativa de la foto, ni con holgura) es lo que abarata cada frame, y el clip
+    no necesita otro redimensionado por frame. Los resultados se guardan en disco y se reutilizan
+    mientras la imagen original y el tamaño de destino no cambien.
+
+    Args:
+        archivos: Lista de rutas de imágenes.
+        tamano_salida: Resolución de salida (ancho, alto).
+        cache_dir: Carpeta de la caché. Por defecto '.cache/ingesta' junto a las imágenes.
+        max_workers: Número de hilos (por defecto, el número de CPUs).
+
+    Returns:
+        Tupla (normalizadas, errores): la lista de rutas normalizadas en el mismo orden
+        que `archivos` (None para las que fallaron) y una lista de (archivo, mensaje)
+        con las imágenes dañadas o ilegibles.
+    """
+    if not archivos:
+        return [], []
+    if cache_dir is None:
+        cache_dir = Path(archivos[0]).parent / '.cache' / 'ingesta'
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    def _procesar(indice):
+        archivo = archivos[indice]
+        try:
+            return normalizar_imagen(archivo, tamano_salida, cache_dir), None
+        except Exception as e:
+            return None, (archivo, str(e))
+
+    # PIL libera el GIL al decodificar y redimensionar, así que los hilos escalan bien
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        resultados = list(executor.map(_procesar, range(len(archivos))))
+
+    normalizadas = [ruta for ruta, _ in resultados]
+    errores = [error for _, error in resultados if error]
+    for archivo, mensaje in errores:
+        print(f"ERROR: Imagen dañada o ilegible: {os.path.basename(archivo)} ({mensaje})")
+    print(f"Ingesta: {len(archivos) - len(errores)}/{len(archivos)} imágenes normalizadas a "
+          f"{tamano_salida[0]}x{tamano_salida[1]} (caché: {cache_dir})")
+    return normalizadas, errores
@@ -0,0 +1,524 @@
+import json
+import os
+import subprocess
+import threading
+import time
+import wave
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+# Formato de trabajo de la mezcla: PCM float32 estéreo a 44.1 kHz
+FRECUENCIA_MUESTREO = 44100
+CANALES = 2
+# Muestras por bloque al aplicar las ganancias (~8 MB de búfer auxiliar en estéreo)
+BLOQUE_MEZCLA = 1 << 20
+# Duración del fundido cruzado en cada empalme del bucle de música, en segundos
+CROSSFADE_BUCLE = 1.0
+# Camas de música que se guardan en memoria (cada una ocupa ~21 MB por minuto)
+MAX_CAMAS_CACHE = 4
+
+# Medida de sonoridad (ITU-R BS.1770 / EBU R128): sub-bloques de 100 ms que se agrupan
+# en bloques de 400 ms con solape del 75 %, y puertas absoluta y relativa
+SUBBLOQUE_LOUDNESS = 0.1
+SUBBLOQUES_POR_BLOQUE = 4
+PUERTA_ABSOLUTA_LUFS = -70.0
+PUERTA_RELATIVA_LU = -10.0
+# Sub-bloques que se transforman a la vez (un minuto): acota la memoria en audios largos
+SUBBLOQUES_POR_TANDA = 600
+
+# Detección de pausas en la voz en off: ventanas de energía de 20 ms; las pausas más
+# cortas que PAUSA_MINIMA no separan frases y las regiones más cortas que VOZ_MINIMA
+# se descartan como ruido
+VENTANA_SILENCIOS = 0.02
+PAUSA_MINIMA = 0.3
+VOZ_MINIMA = 0.1
+UMBRAL_SILENCIO_DB = -50.0
+# Frecuencia de muestreo a la que se decodifica la voz solo para analizarla
+FPS_ANALISIS = 16000
+VERSION_ANALISIS = 1
+
+_cache_camas = OrderedDict()
+_cache_camas_lock = threading.Lock()
+
+
+def decodificar_audio(archivo, fps=FRECUENCIA_MUESTREO, canales=CANALES):
+    """
+    Decodifica un archivo de audio completo a PCM con una sola llamada a ffmpeg.
+
+    Args:
+        archivo: Ruta del archivo de audio (mp3, wav, m4a...).
+        fps: Frecuencia de muestreo de salida.
+        canales: Número de canales de salida.
+
+    Returns:
+        Array float32 de forma (muestras, canales) con valores en [-1, 1].
+
+    Raises:
+        IOError: Si ffmpeg no puede decodificar el archivo.
+    """
+    cmd = [FFMPEG_BINARY, '-v', 'error', '-i', str(archivo), '-vn',
+           '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', str(canales), '-ar', str(fps), '-']
+    resultado = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if resultado.returncode != 0:
+        raise IOError(f"No se pudo decodificar {os.path.basename(str(archivo))}: "
+                      f"{resultado.stderr.decode('utf-8', errors='replace').strip()}")
+    # frombuffer y reshape no copian: el array comparte memoria con la salida de ffmpeg
+    return np.frombuffer(resultado.stdout, dtype=np.float32).reshape(-1, canales)
+
+
+def envolvente(num_muestras, fps=FRECUENCIA_MUESTREO, ganancia=1.0, fade_in=0.0, fade_out=0.0,
+               inicio=0, fin=None):
+    """
+    Curva de ganancia por muestra: ganancia constante con rampas lineales de entrada y
+    salida (las mismas que AudioFadeIn y AudioFadeOut de MoviePy).
+
+    Args:
+        num_muestras: Longitud total de la pista.
+        inicio, fin: Tramo [inicio, fin) de la curva que se calcula (por defecto, toda).
+
+    Returns:
+        Array float32 de longitud `fin - inicio`.
+    """
+    fin = num_muestras if fin is None else fin
+    indices = np.arange(inicio, fin, dtype=np.float32)
+    curva = np.full(fin - inicio, ganancia, dtype=np.float32)
+    n_in = min(num_muestras, int(round(fade_in * fps)))
+    if n_in > 0:
+        curva *= np.minimum(indices / n_in, 1.0)
+    n_out = min(num_muestras, int(round(fade_out * fps)))
+    if n_out > 0:
+        curva *= np.minimum((num_muestras - indices) / n_out, 1.0)
+    return curva
+
+
+def construir_cama_musical(archivo, duracion, crossfade=CROSSFADE_BUCLE, fps=FRECUENCIA_MUESTREO):
+    """
+    Construye la música de fondo para toda la duración del vídeo decodificando la pista
+    una sola vez. Si es más corta que el vídeo se repite, y cada empalme se suaviza con
+    un fundido cruzado de potencia constante en lugar de un corte seco.
+
+    El resultado se guarda en memoria por (pista, duración), así el borrador, el render
+    final y los proyectos de la cola que comparten música no vuelven a decodificarla.
+
+    Args:
+        archivo: Ruta del archivo de música.
+        duracion: Duración de la cama en segundos.
+        crossfade: Duración del fundido cruzado en cada empalme, en segundos.
+        fps: Frecuencia de muestreo.
+
+    Returns:
+        Array float32 (muestras, canales) de solo lectura.
+    """
+    st = os.stat(archivo)
+    clave = (os.path.abspath(archivo), st.st_mtime_ns, st.st_size, round(duracion, 3), crossfade, fps)
+    with _cache_camas_lock:
+        if clave in _cache_camas:
+            _cache_camas.move_to_end(clave)
+            print(f"Cama musical en caché: {os.path.basename(archivo)} ({duracion:.1f} s)")
+            return _cache_camas[clave]
+
+    pista = decodificar_audio(archivo, fps)
+    total = int(round(duracion * fps))
+    longitud = len(pista)
+    if longitud == 0:
+        raise IOError(f"La pista {os.path.basename(archivo)} no contiene audio")
+
+    if longitud >= total:
+        cama = pista[:total]
+    else:
+        # El fundido no puede ocupar más de un cuarto de la pista
+        n_cf = min(int(round(crossfade * fps)), longitud // 4)
+        paso = longitud - n_cf
+        # Curvas de potencia constante: la energía no cae en mitad del empalme
+        fase = (np.arange(n_cf, dtype=np.float32) + 0.5) / max(n_cf, 1) * np.float32(np.pi / 2)
+        empalme = pista[paso:] * np.cos(fase)[:, None] + pista[:n_cf] * np.sin(fase)[:, None]
+        # A partir del primer empalme la señal es periódica (periodo = paso): un periodo es
+        # el empalme seguido del resto de la pista, y basta con repetirlo
+        periodo = np.concatenate([empalme, pista[n_cf:paso]])
+        repeticiones = -(-(total - paso) // paso)
+        cama = np.concatenate([pista[:paso], np.tile(periodo, (repeticiones, 1))])[:total]
+        print(f"Música repetida {repeticiones + 1} veces con fundidos de {n_cf / fps:.2f} s")
+
+    cama.flags.writeable = False
+    with _cache_camas_lock:
+        _cache_camas[clave] = cama
+        while len(_cache_camas) > MAX_CAMAS_CACHE:
+            _cache_camas.popitem(last=False)
+    return cama
+
+
+def _respuesta_biquad(b, a, frecuencias, fps):
+    """|H(f)|² de un filtro biquad evaluado en las frecuencias indicadas."""
+    z = np.exp(-1j * 2 * np.pi * frecuencias / fps)
+    numerador = b[0] + b[1] * z + b[2] * z ** 2
+    denominador = a[0] + a[1] * z + a[2] * z ** 2
+    return np.abs(numerador / denominador) ** 2
+
+
+def respuesta_k(frecuencias, fps=FRECUENCIA_MUESTREO):
+    """
+    Respuesta en potencia |H(f)|² de la ponderación K de BS.1770 (filtro de estantería
+    de +4 dB a 1.5 kHz seguido del paso alto RLB a 38 Hz), para cualquier frecuencia
+    de muestreo.
+    """
+    # Estantería alta: G = 4 dB, Q = 1/sqrt(2), fc = 1500 Hz
+    ganancia = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / fps
+    alfa = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    raiz = 2 * np.sqrt(ganancia) * alfa
+    b = [ganancia * ((ganancia + 1) + (ganancia - 1) * np.cos(w0) + raiz),
+         -2 * ganancia * ((ganancia - 1) + (ganancia + 1) * np.cos(w0)),
+         ganancia * ((ganancia + 1) + (ganancia - 1) * np.cos(w0) - raiz)]
+    a = [(ganancia + 1) - (ganancia - 1) * np.cos(w0) + raiz,
+         2 * ((ganancia - 1) - (ganancia + 1) * np.cos(w0)),
+         (ganancia + 1) - (ganancia - 1) * np.cos(w0) - raiz]
+    estanteria = _respuesta_biquad(b, a, frecuencias, fps)
+
+    # Paso alto RLB: Q = 0.5, fc = 38 Hz
+    w0 = 2 * np.pi * 38.0 / fps
+    alfa = np.sin(w0) / (2 * 0.5)
+    b = [(1 + np.cos(w0)) / 2, -(1 + np.cos(w0)), (1 + np.cos(w0)) / 2]
+    a = [1 + alfa, -2 * np.cos(w0), 1 - alfa]
+    return estanteria * _respuesta_biquad(b, a, frecuencias, fps)
+
+
+def medir_loudness(muestras, fps=FRECUENCIA_MUESTREO):
+    """
+    Mide la sonoridad integrada (LUFS) de un audio ya decodificado, según BS.1770-4.
+
+    La ponderación K se aplica en frecuencia: la energía de cada sub-bloque de 100 ms
+    es la suma de su espectro por |H(f)|² (teorema de Parseval), lo que evita filtrar
+    muestra a muestra. Los sub-bloques se procesan por tandas de un minuto, así que la
+    medida es una sola pasada sobre el PCM en memoria con consumo acotado.
+
+    Args:
+        muestras: Array float32 (muestras, canales).
+        fps: Frecuencia de muestreo.
+
+    Returns:
+        Sonoridad integrada en LUFS, o -inf si el audio es silencio.
+    """
+    n_sub = int(round(SUBBLOQUE_LOUDNESS * fps))
+    num_sub = len(muestras) // n_sub
+    if num_sub < SUBBLOQUES_POR_BLOQUE:
+        return float('-inf')
+
+    peso = respuesta_k(np.fft.rfftfreq(n_sub, 1.0 / fps), fps)
+    # Parseval para rfft: los bins intermedios cuentan dos veces (frecuencias negativas)
+    peso[1:(n_sub + 1) // 2] *= 2
+    energia_sub = np.empty(num_sub)
+    for inicio in range(0, num_sub, SUBBLOQUES_POR_TANDA):
+        fin = min(inicio + SUBBLOQUES_POR_TANDA, num_sub)
+        tanda = muestras[inicio * n_sub:fin * n_sub].reshape(fin - inicio, n_sub, -1)
+        espectro = np.fft.rfft(tanda, axis=1)
+        potencia = espectro.real ** 2 + espectro.imag ** 2
+        # Suma sobre canales (pesos G = 1 para L y R) y frecuencias ponderadas
+        energia_sub[inicio:fin] = np.einsum('bfc,f->b', potencia, peso) / (n_sub * n_sub)
+
+    # Bloques de 400 ms con paso de 100 ms: media de 4 sub-bloques consecutivos
+    acumulada = np.concatenate([[0.0], np.cumsum(energia_sub)])
+    energia = (acumulada[SUBBLOQUES_POR_BLOQUE:] - acumulada[:-SUBBLOQUES_POR_BLOQUE]) / SUBBLOQUES_POR_BLOQUE
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(energia)
+
+    # Puerta absoluta (-70 LUFS) y relativa (10 LU por debajo de la media de lo que pasa)
+    validos = energia[loudness > PUERTA_ABSOLUTA_LUFS]
+    if len(validos) == 0:
+        return float('-inf')
+    umbral_relativo = -0.691 + 10 * np.log10(validos.mean()) + PUERTA_RELATIVA_LU
+    validos = energia[(loudness > PUERTA_ABSOLUTA_LUFS) & (loudness > umbral_relativo)]
+    return float(-0.691 + 10 * np.log10(validos.mean()))
+
+
+def ganancia_para_loudness(loudness_actual, objetivo_lufs):
+    """Ganancia lineal que lleva un audio de `loudness_actual` a `objetivo_lufs`."""
+    if not np.isfinite(loudness_actual):
+        return 1.0
+    return float(10 ** ((objetivo_lufs - loudness_actual) / 20))
+
+
+def normalizar_mezcla(mezcla, objetivo_lufs, fps=FRECUENCIA_MUESTREO, pico_maximo_db=-1.0):
+    """
+    Ajusta la ganancia de la mezcla final (en el sitio) para alcanzar la sonoridad
+    objetivo, sin que el pico supere `pico_maximo_db` dBFS.
+
+    Returns:
+        Tupla (loudness_antes, loudness_despues) en LUFS.
+    """
+    antes = medir_loudness(mezcla, fps)
+    ganancia = ganancia_para_loudness(antes, objetivo_lufs)
+    pico = float(np.abs(mezcla).max()) if len(mezcla) else 0.0
+    pico_maximo = 10 ** (pico_maximo_db / 20)
+    if pico * ganancia > pico_maximo:
+        ganancia = pico_maximo / pico
+        print(f"ADVERTENCIA: el pico limita la ganancia; la mezcla queda por debajo de {objetivo_lufs} LUFS")
+    mezcla *= np.float32(ganancia)
+    despues = antes + 20 * np.log10(ganancia) if np.isfinite(antes) else antes
+    print(f"Sonoridad de la mezcla: {antes:.1f} LUFS -> {despues:.1f} LUFS (objetivo {objetivo_lufs} LUFS)")
+    return antes, despues
+
+
+def rms_por_ventanas(muestras, hop):
+    """
+    Nivel RMS (dBFS) de ventanas consecutivas de `hop` muestras.
+
+    einsum calcula la suma de cuadrados de cada fila sin temporales (en float32: con
+    ventanas de ~1000 muestras el error relativo es del orden de 1e-6).
+
+    Returns:
+        Array float64 con un valor por ventana completa.
+    """
+    num_ventanas = len(muestras) // hop
+    bloques = muestras[:num_ventanas * hop].reshape(num_ventanas, -1)
+    energia = np.einsum('ij,ij->i', bloques, bloques).astype(np.float64) / max(bloques.shape[1], 1)
+    return 10.0 * np.log10(energia + 1e-12)
+
+
+def detectar_regiones_voz(voz, fps=FRECUENCIA_MUESTREO, ventana=VENTANA_SILENCIOS, umbral_db=None,
+                          pausa_minima=PAUSA_MINIMA, duracion_minima=VOZ_MINIMA):
+    """
+    Segmenta la voz en off en regiones habladas separadas por pausas.
+
+    La energía se calcula por ventanas en un solo paso vectorizado; las ventanas por
+    encima del umbral son voz, las pausas más cortas que `pausa_minima` (respiraciones,
+    oclusivas) se cierran y las regiones más cortas que `duracion_minima` (chasquidos)
+    se descartan. Todo opera sobre los bordes de las regiones, sin bucles por ventana.
+
+    Args:
+        voz: Array float32 (muestras, canales) o (muestras,).
+        fps: Frecuencia de muestreo de `voz`.
+        ventana: Duración de cada ventana de energía en segundos.
+        umbral_db: Nivel (dBFS) a partir del cual hay voz. Por defecto se adapta a la
+                   grabación: 30 dB por debajo de las partes más fuertes, sin bajar de
+                   UMBRAL_SILENCIO_DB.
+        pausa_minima: Pausas más cortas (en segundos) no separan regiones.
+        duracion_minima: Regiones más cortas (en segundos) se descartan.
+
+    Returns:
+        Lista de pares [inicio, fin] en segundos, ordenados.
+    """
+    hop = max(1, int(round(ventana * fps)))
+    rms_db = rms_por_ventanas(voz, hop)
+    if len(rms_db) == 0:
+        return []
+    if umbral_db is None:
+        umbral_db = max(UMBRAL_SILENCIO_DB, float(np.percentile(rms_db, 95)) - 30.0)
+    activa = rms_db > umbral_db
+
+    # Bordes de las zonas activas: +1 donde empieza la voz, -1 donde termina
+    bordes = np.diff(np.concatenate([[0], activa.astype(np.int8), [0]]))
+    inicios = np.flatnonzero(bordes == 1)
+    fines = np.flatnonzero(bordes == -1)
+    if len(inicios) == 0:
+        return []
+
+    # Cerrar las pausas cortas: se conserva un inicio solo si la pausa anterior es larga
+    pausas = inicios[1:] - fines[:-1]
+    separa = pausas >= int(round(pausa_minima / ventana))
+    inicios = inicios[np.concatenate([[True], separa])]
+    fines = fines[np.concatenate([separa, [True]])]
+
+    largas = (fines - inicios) >= int(round(duracion_minima / ventana))
+    segundos = hop / fps
+    return [[round(float(a) * segundos, 3), round(float(b) * segundos, 3)]
+            for a, b in zip(inicios[largas], fines[largas])]
+
+
+def regiones_voz_en_cache(archivo_voz, cache_dir, voz=None, fps=FRECUENCIA_MUESTREO):
+    """
+    Devuelve las regiones habladas de la voz en off, analizándola solo la primera vez.
+
+    El resultado se guarda en un JSON compacto dentro de `cache_dir`, identificado por la
+    ruta, la fecha de modificación y el tamaño del archivo. Si no se pasa el PCM ya
+    decodificado, se decodifica a mono y FPS_ANALISIS: para detectar pausas basta, y en
+    narraciones de una hora es mucho más rápido que decodificar a 44.1 kHz estéreo.
+
+    Args:
+        archivo_voz: Ruta del archivo de voz.
+        cache_dir: Carpeta de la caché (p. ej. <proyecto>/.cache/analisis).
+        voz: PCM ya decodificado de `archivo_voz`, si se tiene.
+        fps: Frecuencia de muestreo de `voz`.
+
+    Returns:
+        Lista de pares [inicio, fin] en segundos.
+    """
+    st = os.stat(archivo_voz)
+    clave = f"{os.path.abspath(archivo_voz)}|{st.st_mtime_ns}|{st.st_size}|v{VERSION_ANALISIS}"
+    ruta_cache = Path(cache_dir) / f"{Path(archivo_voz).stem}_regiones.json"
+    if ruta_cache.is_file():
+        try:
+            with open(ruta_cache, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get('clave') == clave:
+                print(f"Regiones de voz en caché: {len(datos['regiones'])} ({ruta_cache.name})")
+                return datos['regiones']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Caché de regiones de voz ilegible, se vuelve a analizar: {e}")
+
+    inicio = time.perf_counter()
+    if voz is None:
+        voz, fps = decodificar_audio(archivo_voz, FPS_ANALISIS, 1), FPS_ANALISIS
+    regiones = detectar_regiones_voz(voz, fps)
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    with open(ruta_cache, 'w', encoding='utf-8') as f:
+        json.dump({'clave': clave, 'regiones': regiones}, f, separators=(',', ':'))
+    print(f"Voz segmentada en {len(regiones)} regiones habladas "
+          f"({len(voz) / fps:.0f} s analizados en {time.perf_counter() - inicio:.2f} s)")
+    return regiones
+
+
+def curva_ducking(voz, fps=FRECUENCIA_MUESTREO, ventana=0.02, umbral_db=-45.0, reduccion_db=-12.0,
+                  anticipacion=0.15, retencion=0.5, suavizado=0.25):
+    """
+    Calcula la curva de ganancia que atenúa la música mientras suena la voz.
+
+    La envolvente de la voz es el RMS por ventanas, calculado con un único producto
+    vectorizado sobre el PCM decodificado. Las ventanas por encima del umbral marcan
+    voz; la zona marcada se amplía hacia atrás (anticipación) y hacia delante
+    (retención, para no subir la música en cada pausa corta) y la curva resultante se
+    suaviza con una media móvil. Todo son sumas acumuladas: sin bucles por muestra.
+
+    Args:
+        voz: Array float32 (muestras, canales) de la voz.
+        fps: Frecuencia de muestreo.
+        ventana: Duración de cada ventana de RMS en segundos.
+        umbral_db: Nivel RMS (dBFS) a partir del cual se considera que hay voz.
+        reduccion_db: Atenuación de la música bajo la voz, en dB (negativa).
+        anticipacion: Segundos que la música empieza a bajar antes de la voz.
+        retencion: Segundos que la música sigue baja después de la voz.
+        suavizado: Duración de las rampas de bajada y subida, en segundos.
+
+    Returns:
+        Tupla (tiempos, ganancias): instantes en segundos (centro de cada ventana) y
+        ganancia lineal de la música en cada uno, para interpolar por muestra.
+    """
+    hop = max(1, int(round(ventana * fps)))
+    rms_db = rms_por_ventanas(voz, hop)
+    num_ventanas = len(rms_db)
+    if num_ventanas == 0:
+        return np.array([0.0]), np.array([1.0], dtype=np.float32)
+    activa = (rms_db > umbral_db).astype(np.int32)
+
+    # Ampliar cada zona de voz: una ventana está "bajo voz" si hay voz entre
+    # i - retención e i + anticipación (diferencia de sumas acumuladas)
+    atras = int(round(retencion / ventana))
+    delante = int(round(anticipacion / ventana))
+    acumulada = np.concatenate([[0], np.cumsum(activa)])
+    indices = np.arange(num_ventanas)
+    hasta = np.minimum(indices + delante + 1, num_ventanas)
+    desde = np.maximum(indices - atras, 0)
+    bajo_voz = (acumulada[hasta] - acumulada[desde]) > 0
+
+    ganancia_voz = 10.0 ** (reduccion_db / 20.0)
+    objetivo = np.where(bajo_voz, ganancia_voz, 1.0)
+
+    # Rampas suaves: media móvil centrada sobre el objetivo
+    ancho = max(1, int(round(suavizado / ventana)))
+    if ancho > 1:
+        relleno = np.concatenate([np.full(ancho // 2, objetivo[0]), objetivo,
+                                  np.full(ancho - ancho // 2 - 1, objetivo[-1])])
+        acumulada = np.concatenate([[0.0], np.cumsum(relleno)])
+        objetivo = (acumulada[ancho:] - acumulada[:-ancho]) / ancho
+
+    tiempos = (indices + 0.5) * hop / fps
+    # Después de la última frase la música vuelve a su nivel (np.interp mantendría el último valor)
+    tiempos = np.append(tiempos, len(voz) / fps + retencion + suavizado)
+    objetivo = np.append(objetivo, 1.0)
+    print(f"Ducking: voz en el {bajo_voz.mean() * 100:.0f}% del audio, música a {reduccion_db:.0f} dB bajo la voz")
+    return tiempos, objetivo.astype(np.float32)
+
+
+class Pista:
+    """
+    Una entrada de la mezcla: muestras decodificadas más su curva de ganancia.
+    """
+    def __init__(self, nombre, muestras, ganancia=1.0, fade_in=0.0, fade_out=0.0, inicio=0.0,
+                 ganancia_variable=None):
+        """
+        Args:
+            nombre: Nombre de la pista (para los mensajes).
+            muestras: Array float32 (muestras, canales) a FRECUENCIA_MUESTREO.
+            ganancia: Factor de volumen constante.
+            fade_in: Duración del fade in en segundos.
+            fade_out: Duración del fade out en segundos (al final de la pista recortada).
+            inicio: Instante de la mezcla en el que empieza la pista, en segundos.
+            ganancia_variable: Tupla opcional (tiempos, ganancias) con una ganancia que
+                               varía en el tiempo (p. ej. la de curva_ducking), en
+                               segundos desde el inicio de la mezcla.
+        """
+        self.nombre = nombre
+        self.muestras = muestras
+        self.ganancia = ganancia
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        self.inicio = inicio
+        self.ganancia_variable = ganancia_variable
+
+
+def mezclar(pistas, duracion, fps=FRECUENCIA_MUESTREO, canales=CANALES, recortar=True):
+    """
+    Mezcla las pistas en un único búfer de la duración indicada.
+
+    Cada pista se recorta a la duración del vídeo, se multiplica por su envolvente
+    (calculada como vector, por bloques) y se suma al búfer en una sola pasada.
+    El resultado es determinista: las mismas entradas producen los mismos bits.
+
+    Args:
+        pistas: Lista de Pista.
+        duracion: Duración de la mezcla en segundos.
+        fps: Frecuencia de muestreo.
+        canales: Número de canales.
+        recortar: Limitar el resultado a [-1, 1]. Desactivarlo permite normalizar la
+                  sonoridad antes de recortar.
+
+    Returns:
+        Array float32 (muestras, canales), limitado a [-1, 1] si `recortar`.
+    """
+    total = int(round(duracion * fps))
+    mezcla = np.zeros((total, canales), dtype=np.float32)
+    auxiliar = np.empty((BLOQUE_MEZCLA, canales), dtype=np.float32)
+    for pista in pistas:
+        desplazamiento = int(round(pista.inicio * fps))
+        if desplazamiento >= total:
+            continue
+        n = min(len(pista.muestras), total - desplazamiento)
+        if n <= 0:
+            continue
+        tramo = mezcla[desplazamiento:desplazamiento + n]
+        # tramo += muestras * curva por bloques sobre un búfer reutilizado: sin arrays
+        # intermedios del tamaño de la pista y sin modificar las muestras de entrada
+        for i in range(0, n, BLOQUE_MEZCLA):
+            j = min(i + BLOQUE_MEZCLA, n)
+            curva = envolvente(n, fps, pista.ganancia, pista.fade_in, pista.fade_out, i, j)
+            if pista.ganancia_variable is not None:
+                tiempos, ganancias = pista.ganancia_variable
+                instantes = (np.arange(i, j) + desplazamiento) / fps
+                curva *= np.interp(instantes, tiempos, ganancias).astype(np.float32)
+            parcial = np.multiply(pista.muestras[i:j], curva[:, None], out=auxiliar[:j - i])
+            tramo[i:j] += parcial
+    if recortar:
+        np.clip(mezcla, -1.0, 1.0, out=mezcla)
+    return mezcla
+
+
+def escribir_wav(ruta, muestras, fps=FRECUENCIA_MUESTREO):
+    """
+    Escribe un búfer float32 como WAV PCM de 16 bits (sin dither, reproducible).
+
+    Returns:
+        Ruta del archivo escrito.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    pcm = np.round(muestras * 32767.0).astype('<i2')
+    temporal = ruta.with_name(f"{ruta.stem}.part{ruta.suffix}")
+    with wave.open(str(temporal), 'wb') as wav:
+        wav.setnchannels(muestras.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(fps)
+        wav.writeframes(pcm.tobytes())
+    os.replace(temporal, ruta)
+    return str(ruta)
@@ -0,0 +1,132 @@
+from pathlib import Path
+
+import numpy as np
+import srt
+
+# Fracción de la duración media de una imagen que un corte puede desplazarse para
+# caer en una pausa de la narración
+TOLERANCIA_AJUSTE = 0.4
+# Ninguna imagen dura menos que esto (en segundos), aunque haya pausas muy seguidas
+DURACION_MINIMA = 1.5
+
+
+def limites_desde_srt(archivo_srt):
+    """
+    Devuelve los instantes de corte candidatos de un SRT: el punto medio de la pausa
+    entre cada subtítulo y el siguiente (o el final del subtítulo si se solapan).
+
+    Returns:
+        Lista ordenada de instantes en segundos (vacía si el archivo no existe).
+    """
+    ruta = Path(archivo_srt)
+    if not ruta.is_file() or ruta.stat().st_size == 0:
+        return []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        subtitulos = sorted(srt.parse(f.read()), key=lambda sub: sub.start)
+    limites = []
+    for actual, siguiente in zip(subtitulos, subtitulos[1:]):
+        fin = actual.end.total_seconds()
+        inicio = siguiente.start.total_seconds()
+        limites.append((fin + inicio) / 2 if inicio > fin else fin)
+    return limites
+
+
+def limites_desde_regiones(regiones):
+    """
+    Devuelve los instantes de corte candidatos a partir de las regiones habladas de la
+    voz (mezclador_audio.detectar_regiones_voz): el punto medio de cada pausa.
+
+    Returns:
+        Lista ordenada de instantes en segundos.
+    """
+    return [(fin + inicio) / 2 for (_, fin), (inicio, _) in zip(regiones, regiones[1:])]
+
+
+def planificar_cortes(num_imagenes, duracion_total, limites=None, tolerancia=TOLERANCIA_AJUSTE,
+                      duracion_minima=DURACION_MINIMA):
+    """
+    Calcula los instantes de cambio de imagen para cubrir `duracion_total` con
+    `num_imagenes` imágenes. Los cortes parten de un reparto uniforme y se desplazan
+    al límite candidato más cercano (pausas de la narración, fin de subtítulos) si
+    queda dentro de la tolerancia.
+
+    Args:
+        num_imagenes: Número de imágenes.
+        duracion_total: Duración que deben cubrir, en segundos (p. ej. la de la voz).
+        limites: Lista opcional de instantes candidatos para los cortes.
+        tolerancia: Desplazamiento máximo de un corte, como fracción de la duración media.
+        duracion_minima: Duración mínima de cada imagen.
+
+    Returns:
+        Array con los `num_imagenes - 1` instantes de corte, crecientes.
+    """
+    if num_imagenes <= 1:
+        return np.array([])
+    media = duracion_total / num_imagenes
+    duracion_minima = min(duracion_minima, media * 0.5)
+    cortes = media * np.arange(1, num_imagenes)
+
+    if limites is not None and len(limites) > 0:
+        limites = np.sort(np.asarray(limites, dtype=float))
+        # Límite más cercano a cada corte: el anterior o el siguiente en el array ordenado
+        posiciones = np.clip(np.searchsorted(limites, cortes), 1, len(limites) - 1) if len(limites) > 1 \
+            else np.zeros(len(cortes), dtype=int)
+        anteriores = limites[np.maximum(posiciones - 1, 0)]
+        siguientes = limites[posiciones]
+        cercanos = np.where(np.abs(anteriores - cortes) <= np.abs(siguientes - cortes), anteriores, siguientes)
+        ajustar = np.abs(cercanos - cortes) <= tolerancia * media
+        cortes = np.where(ajustar, cercanos, cortes)
+        print(f"Planificador: {int(ajustar.sum())}/{len(cortes)} cortes ajustados a pausas de la narración")
+
+    # Garantizar orden y duración mínima (dos cortes pueden haber caído en la misma pausa)
+    cortes = np.maximum(cortes, duracion_minima * np.arange(1, num_imagenes))
+    cortes = np.maximum.accumulate(cortes + 0.0)
+    for i in range(1, len(cortes)):
+        if cortes[i] - cortes[i - 1] < duracion_minima:
+            cortes[i] = cortes[i - 1] + duracion_minima
+    limite_final = duracion_total - duracion_minima * np.arange(num_imagenes - 1, 0, -1)
+    return np.minimum(cortes, limite_final)
+
+
+def duraciones_desde_cortes(cortes, duracion_total, duracion_transicion=0.0):
+    """
+    Convierte instantes de corte en la duración de cada clip. Con transiciones de
+    disolución los clips se solapan: cada clip se alarga media transición por cada
+    lado con vecino, así el fundido queda centrado en el corte y el vídeo dura
+    exactamente `duracion_total`.
+
+    Returns:
+        Lista de duraciones en segundos, una por imagen.
+    """
+    bordes = np.concatenate([[0.0], np.asarray(cortes, dtype=float), [duracion_total]])
+    tramos = np.diff(bordes)
+    if len(tramos) > 1 and duracion_transicion > 0:
+        tramos = tramos + duracion_transicion
+        tramos[0] -= duracion_transicion / 2
+        tramos[-1] -= duracion_transicion / 2
+    return [float(d) for d in tramos]
+
+
+def planificar_duraciones(num_imagenes, duracion_total, limites=None, duracion_transicion=0.0,
+                          duracion_minima=DURACION_MINIMA):
+    """
+    Reparte `duracion_total` entre las imágenes para que el vídeo cubra exactamente la
+    narración, con los cambios de imagen en las pausas cuando es posible.
+
+    Args:
+        num_imagenes: Número de imágenes.
+        duracion_total: Duración de la narración en segundos.
+        limites: Instantes candidatos para los cortes (pausas del SRT y/o de la voz).
+        duracion_transicion: Duración de las transiciones de disolución (0 si no hay).
+        duracion_minima: Duración mínima de cada imagen.
+
+    Returns:
+        Lista de duraciones en segundos, una por imagen.
+    """
+    # La transición necesita que cada clip dure más que ella
+    duracion_minima = max(duracion_minima, duracion_transicion * 1.5)
+    cortes = planificar_cortes(num_imagenes, duracion_total, limites, duracion_minima=duracion_minima)
+    duraciones = duraciones_desde_cortes(cortes, duracion_total, duracion_transicion)
+    print(f"Planificador: {num_imagenes} imágenes para {duracion_total:.1f} s "
+          f"(entre {min(duraciones):.1f} y {max(duraciones):.1f} s por imagen)")
+    return duraciones
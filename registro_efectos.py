@@ -0,0 +1,337 @@
+import random
+from collections import OrderedDict
+
+from efectos import (ZoomEffect, PanUpEffect, PanDownEffect, PanLeftEffect, PanRightEffect,
+                     KenBurnsEffect, FlipEffect, VignetteZoomEffect, RotateEffect)
+
+# Instancias de efectos que se conservan para compartirlas entre clips. La duración forma
+# parte de la clave y con duraciones por imagen casi cada clip es una clave nueva, así
+# que la caché se limita y se descartan las menos usadas
+MAX_INSTANCIAS_CACHE = 128
+
+
+class EffectParam:
+    """
+    Describe un parámetro configurable de un efecto y cómo validarlo.
+    """
+    def __init__(self, tipo, default, minimo=None, maximo=None, opciones=None, settings_key=None):
+        """
+        Args:
+            tipo: Tipo del parámetro (float, int, bool o str).
+            default: Valor por defecto si no aparece en los ajustes.
+            minimo: Valor mínimo permitido (solo numéricos).
+            maximo: Valor máximo permitido (solo numéricos).
+            opciones: Lista de valores permitidos (solo str).
+            settings_key: Clave del diccionario `settings` de la que se lee el valor.
+        """
+        self.tipo = tipo
+        self.default = default
+        self.minimo = minimo
+        self.maximo = maximo
+        self.opciones = opciones
+        self.settings_key = settings_key
+
+    def validar(self, nombre, valor):
+        """Convierte el valor al tipo declarado y comprueba rangos y opciones."""
+        try:
+            if self.tipo is bool and isinstance(valor, str):
+                valor = valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+            else:
+                valor = self.tipo(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parámetro '{nombre}': no se puede convertir {valor!r} a {self.tipo.__name__}")
+
+        if self.minimo is not None and valor < self.minimo:
+            raise ValueError(f"Parámetro '{nombre}': {valor} es menor que el mínimo {self.minimo}")
+        if self.maximo is not None and valor > self.maximo:
+            raise ValueError(f"Parámetro '{nombre}': {valor} es mayor que el máximo {self.maximo}")
+        if self.opciones is not None and valor not in self.opciones:
+            raise ValueError(f"Parámetro '{nombre}': {valor!r} no está en {self.opciones}")
+        return valor
+
+
+class EffectSpec:
+    """
+    Especificación de un efecto registrado: fábrica, esquema de parámetros y metadatos.
+
+    Los metadatos permiten a renderizadores, planificadores y cachés decidir por clip:
+      - temporal: 'static' si el resultado no depende de t, 'dynamic' si varía.
+      - kind: 'geometric' si mueve píxeles (zoom, paneo, rotación), 'pointwise' si solo
+        modifica su valor.
+      - cost: coste aproximado por frame ('low', 'medium', 'high').
+    """
+    def __init__(self, nombre, fabrica, parametros=None, fijos=None, resolver=None,
+                 temporal='dynamic', kind='geometric', cost='medium', usa_duracion=True,
+                 descripcion=''):
+        """
+        Args:
+            nombre: Nombre del efecto tal y como aparece en `secuencia_efectos`.
+            fabrica: Clase (o callable) que construye el efecto.
+            parametros: Diccionario nombre -> EffectParam con los parámetros configurables.
+            fijos: Argumentos constantes que siempre se pasan a la fábrica.
+            resolver: Función opcional (kwargs, rng) -> kwargs que traduce parámetros de alto
+                      nivel (p. ej. 'direction' de Ken Burns) a argumentos de la fábrica.
+            temporal: 'static' o 'dynamic'.
+            kind: 'geometric' o 'pointwise'.
+            cost: 'low', 'medium' o 'high'.
+            usa_duracion: Si la fábrica necesita `clip_duration`.
+            descripcion: Texto descriptivo para interfaces.
+        """
+        self.nombre = nombre
+        self.fabrica = fabrica
+        self.parametros = parametros or {}
+        self.fijos = fijos or {}
+        self.resolver = resolver
+        self.temporal = temporal
+        self.kind = kind
+        self.cost = cost
+        self.usa_duracion = usa_duracion
+        self.descripcion = descripcion
+
+    @property
+    def is_static(self):
+        return self.temporal == 'static'
+
+    def validar_parametros(self, settings=None, overrides=None):
+        """
+        Lee y valida los parámetros del efecto desde `settings` (y `overrides`).
+
+        Returns:
+            Diccionario nombre -> valor validado.
+        """
+        settings = settings or {}
+        overrides = overrides or {}
+        valores = {}
+        for nombre, param in self.parametros.items():
+            if nombre in overrides:
+                valor = overrides[nombre]
+            elif param.settings_key and param.settings_key in settings:
+                valor = settings[param.settings_key]
+            else:
+                valor = param.default
+            valores[nombre] = param.validar(nombre, valor)
+        return valores
+
+    def metadata(self):
+        """Devuelve los metadatos del efecto como diccionario."""
+        return {
+            'nombre': self.nombre,
+            'temporal': self.temporal,
+            'kind': self.kind,
+            'cost': self.cost,
+            'usa_duracion': self.usa_duracion,
+            'descripcion': self.descripcion,
+        }
+
+
+class BoundEffect:
+    """
+    Efecto con sus parámetros ya leídos de `settings` y validados.
+    Se crea una vez por nombre de efecto y se reutiliza para todas las imágenes.
+    """
+    def __init__(self, registry, spec, parametros):
+        self.registry = registry
+        self.spec = spec
+        self.parametros = parametros
+
+    def create(self, clip_duration=None, rng=None):
+        """Devuelve la instancia del efecto para un clip (compartida si es idéntica)."""
+        return self.registry._instanciar(self.spec, self.parametros, clip_duration, rng)
+
+
+class EffectRegistry:
+    """
+    Registro que mapea nombres de efecto a fábricas con esquema de parámetros validado.
+    Las instancias con argumentos idénticos se cachean (LRU de MAX_INSTANCIAS_CACHE) y
+    se comparten entre clips.
+    """
+    def __init__(self, max_instancias=MAX_INSTANCIAS_CACHE):
+        self._specs = {}
+        self._instancias = OrderedDict()
+        self.max_instancias = max_instancias
+
+    def register(self, spec):
+        """Registra (o reemplaza) una especificación de efecto."""
+        self._specs[spec.nombre.lower()] = spec
+        return spec
+
+    def get_spec(self, nombre):
+        """Devuelve la especificación de un efecto o None si no está registrado."""
+        if not nombre:
+            return None
+        return self._specs.get(nombre.strip().lower())
+
+    def available_effects(self):
+        """Lista de nombres de efectos registrados, en orden de registro."""
+        return list(self._specs.keys())
+
+    def metadata(self, nombre):
+        """Metadatos del efecto (static/dynamic, geometric/pointwise, coste) o None."""
+        spec = self.get_spec(nombre)
+        return spec.metadata() if spec else None
+
+    def bind(self, nombre, settings=None, overrides=None):
+        """
+        Valida los parámetros de un efecto una sola vez.
+
+        Raises:
+            KeyError: Si el efecto no está registrado.
+            ValueError: Si algún parámetro no cumple el esquema.
+        """
+        spec = self.get_spec(nombre)
+        if spec is None:
+            raise KeyError(f"Tipo de efecto desconocido: {nombre}")
+        return BoundEffect(self, spec, spec.validar_parametros(settings, overrides))
+
+    def bind_sequence(self, nombres, settings=None, overrides=None):
+        """
+        Valida todos los efectos distintos de una secuencia.
+
+        Returns:
+            Diccionario nombre (en minúsculas) -> BoundEffect, o None si el efecto
+            es desconocido o sus parámetros no son válidos (se informa por consola).
+        """
+        enlazados = {}
+        for nombre in nombres or []:
+            clave = nombre.strip().lower()
+            if clave in enlazados:
+                continue
+            try:
+                enlazados[clave] = self.bind(clave, settings, overrides)
+            except KeyError:
+                print(f"Tipo de efecto desconocido: {nombre}")
+                enlazados[clave] = None
+            except ValueError as e:
+                print(f"Ajustes inválidos para el efecto '{nombre}': {e}")
+                enlazados[clave] = None
+        return enlazados
+
+    def create(self, nombre, settings=None, clip_duration=None, rng=None, overrides=None):
+        """Atajo para bind(...).create(...)."""
+        return self.bind(nombre, settings, overrides).create(clip_duration, rng)
+
+    def clear_cache(self):
+        """Libera las instancias cacheadas."""
+        self._instancias.clear()
+
+    def _instanciar(self, spec, parametros, clip_duration, rng):
+        kwargs = dict(spec.fijos)
+        kwargs.update(parametros)
+        if spec.resolver:
+            kwargs = spec.resolver(kwargs, rng or random)
+        if spec.usa_duracion:
+            if clip_duration is None or clip_duration <= 0:
+                raise ValueError(f"El efecto '{spec.nombre}' requiere una clip_duration válida > 0.")
+            kwargs['clip_duration'] = clip_duration
+
+        clave = (spec.nombre, tuple(sorted(kwargs.items())))
+        instancia = self._instancias.get(clave)
+        if instancia is None:
+            instancia = spec.fabrica(**kwargs)
+            self._instancias[clave] = instancia
+            while len(self._instancias) > self.max_instancias:
+                self._instancias.popitem(last=False)
+        else:
+            self._instancias.move_to_end(clave)
+        return instancia
+
+
+# --- Esquemas compartidos ---
+
+# 'draft' (NEAREST) lo usa el modo borrador; la GUI solo ofrece low/medium/high
+CALIDADES = ['draft', 'low', 'medium', 'high']
+
+def _params_zoom():
+    return {
+        'ratio': EffectParam(float, 0.5, minimo=0.0, maximo=5.0, settings_key='zoom_ratio'),
+        'quality': EffectParam(str, 'high', opciones=CALIDADES, settings_key='zoom_quality'),
+    }
+
+def _params_pan():
+    return {
+        'scale_factor': EffectParam(float, 1.2, minimo=1.0, maximo=3.0, settings_key='pan_scale_factor'),
+        'easing': EffectParam(bool, True, settings_key='pan_easing'),
+        'quality': EffectParam(str, 'high', opciones=CALIDADES, settings_key='pan_quality'),
+    }
+
+def _params_kenburns(con_direccion=False):
+    params = {
+        'zoom_ratio': EffectParam(float, 0.3, minimo=0.0, maximo=5.0, settings_key='kb_zoom_ratio'),
+        'scale_factor': EffectParam(float, 1.3, minimo=1.0, maximo=3.0, settings_key='kb_scale_factor'),
+        'quality': EffectParam(str, 'high', opciones=CALIDADES, settings_key='kb_quality'),
+    }
+    if con_direccion:
+        params['direction'] = EffectParam(str, 'random', settings_key='kb_direction',
+                                          opciones=['random', 'in', 'out', 'left', 'right', 'up', 'down'])
+    return params
+
+def _resolver_kenburns(kwargs, rng):
+    """
+    Traduce el ajuste 'kb_direction' a direcciones de zoom y paneo. 'in' y 'out' son
+    solo zoom: el encuadre se queda centrado ('center' no es un paneo de KenBurnsEffect).
+    """
+    kwargs = dict(kwargs)
+    direction = kwargs.pop('direction', 'random')
+    if direction == 'random':
+        kwargs['zoom_direction'] = rng.choice(['in', 'out'])
+        kwargs['pan_direction'] = rng.choice(['up', 'down', 'left', 'right'])
+    elif direction in ('in', 'out'):
+        kwargs['zoom_direction'] = direction
+        kwargs['pan_direction'] = 'center'
+    else:
+        kwargs['zoom_direction'] = 'in'  # Por defecto
+        kwargs['pan_direction'] = direction
+    return kwargs
+
+def _crear_registro_por_defecto():
+    registro = EffectRegistry()
+
+    registro.register(EffectSpec('in', ZoomEffect, _params_zoom(), fijos={'zoom_in': True},
+                                 cost='high', descripcion='Zoom In (acercamiento)'))
+    registro.register(EffectSpec('out', ZoomEffect, _params_zoom(), fijos={'zoom_in': False},
+                                 cost='high', descripcion='Zoom Out (alejamiento)'))
+
+    for nombre, clase, texto in [('panup', PanUpEffect, 'Pan Up (hacia arriba)'),
+                                 ('pandown', PanDownEffect, 'Pan Down (hacia abajo)'),
+                                 ('panleft', PanLeftEffect, 'Pan Left (hacia la izquierda)'),
+                                 ('panright', PanRightEffect, 'Pan Right (hacia la derecha)')]:
+        registro.register(EffectSpec(nombre, clase, _params_pan(), fijos={'speed': 0.25},
+                                     cost='high', descripcion=texto))
+
+    registro.register(EffectSpec('kenburns', KenBurnsEffect, _params_kenburns(con_direccion=True),
+                                 resolver=_resolver_kenburns, cost='high',
+                                 descripcion='Ken Burns (clásico)'))
+    for nombre, zoom_dir, pan_dir in [('kenburns1', 'in', 'left'),
+                                      ('kenburns2', 'out', 'right'),
+                                      ('kenburns3', 'out', 'down')]:
+        registro.register(EffectSpec(nombre, KenBurnsEffect, _params_kenburns(),
+                                     fijos={'zoom_direction': zoom_dir, 'pan_direction': pan_dir},
+                                     cost='high', descripcion=f"Ken Burns ({zoom_dir} + {pan_dir})"))
+
+    registro.register(EffectSpec('flip_horizontal', FlipEffect, fijos={'direction': 'horizontal'},
+                                 temporal='static', cost='low', usa_duracion=False,
+                                 descripcion='Voltear Horizontal'))
+    registro.register(EffectSpec('flip_vertical', FlipEffect, fijos={'direction': 'vertical'},
+                                 temporal='static', cost='low', usa_duracion=False,
+                                 descripcion='Voltear Vertical'))
+
+    vignette_fijos = {'zoom_ratio': 0.05, 'vignette_strength': 0.7,
+                      'vignette_radius': 0.8, 'vignette_fade_duration': 2.0}
+    registro.register(EffectSpec('vignette_zoom_in', VignetteZoomEffect,
+                                 fijos=dict(vignette_fijos, zoom_in=True), cost='high',
+                                 descripcion='Viñeta Zoom In'))
+    registro.register(EffectSpec('vignette_zoom_out', VignetteZoomEffect,
+                                 fijos=dict(vignette_fijos, zoom_in=False), cost='high',
+                                 descripcion='Viñeta Zoom Out'))
+
+    registro.register(EffectSpec('rotate_clockwise', RotateEffect,
+                                 fijos={'speed': 30, 'direction': 'clockwise'},
+                                 descripcion='Rotación Horaria'))
+    registro.register(EffectSpec('rotate_counter_clockwise', RotateEffect,
+                                 fijos={'speed': 30, 'direction': 'counter-clockwise'},
+                                 descripcion='Rotación Antihoraria'))
+    return registro
+
+
+# Registro global usado por app.py y la GUI
+EFFECT_REGISTRY = _crear_registro_por_defecto()
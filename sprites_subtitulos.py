@@ -0,0 +1,563 @@
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from moviepy.tools import compute_position
+
+# Fuente incluida en el proyecto y fuentes del sistema que se prueban si no existe
+FUENTE_PROYECTO = Path(__file__).resolve().parent / 'fonts' / 'Roboto-Regular.ttf'
+FUENTES_SISTEMA = [
+    '/System/Library/Fonts/Helvetica.ttc',
+    '/Library/Fonts/Arial.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+]
+# Separación entre líneas de un mismo subtítulo, como fracción del tamaño de fuente
+INTERLINEADO = 0.15
+# Tamaño de los subtítulos en un vídeo de 1080 píxeles de alto (se escala con la salida)
+TAMANO_FUENTE_1080P = 80
+# Grosor del borde de los subtítulos en un vídeo de 1080 píxeles de alto
+GROSOR_BORDE_1080P = 6
+# Ancho máximo de línea como fracción del ancho del vídeo
+FRACCION_ANCHO_LINEA = 0.9
+# Líneas de cada subtítulo al agrupar palabras por su ancho
+MAX_LINEAS_SUBTITULO = 2
+# Distancia mínima entre el borde inferior del vídeo y los subtítulos, como fracción del alto
+MARGEN_INFERIOR = 0.05
+# Sprites que se guardan en memoria (un subtítulo de dos líneas a 1080p ocupa ~0.5 MB)
+MAX_SPRITES_CACHE = 1024
+# Sprites con la mezcla ya preparada (uint16) en la capa de subtítulos: solo hacen falta
+# los que están en pantalla y los siguientes
+MAX_SPRITES_PREPARADOS = 8
+
+_cache_sprites = OrderedDict()
+_cache_sprites_lock = threading.Lock()
+
+
+def buscar_fuente(preferida=None):
+    """
+    Devuelve la primera fuente que existe: la indicada, la del proyecto o una del sistema.
+
+    Returns:
+        Ruta de la fuente, o None si no se encontró ninguna (se usará la de Pillow).
+    """
+    for candidata in [preferida, FUENTE_PROYECTO, *FUENTES_SISTEMA]:
+        if candidata and os.path.isfile(candidata):
+            if preferida and str(candidata) != str(preferida):
+                print(f"Fuente {preferida} no encontrada, usando {candidata}")
+            return str(candidata)
+    print("ADVERTENCIA: No se encontró ninguna fuente TrueType, usando la fuente por defecto de Pillow")
+    return None
+
+
+@lru_cache(maxsize=32)
+def cargar_fuente(ruta, tamano):
+    """Carga una fuente una sola vez por (ruta, tamaño)."""
+    if ruta is None:
+        return ImageFont.load_default(tamano)
+    return ImageFont.truetype(ruta, tamano)
+
+
+class SubtitleStyle:
+    """
+    Estilo de los subtítulos: fuente, tamaño, colores, borde y ancho máximo de línea.
+    """
+    def __init__(self, font=None, font_size=80, color='white', stroke_color='black', stroke_width=3,
+                 max_width=None, align='center'):
+        """
+        Args:
+            font: Ruta de la fuente (si no existe se busca una de respaldo).
+            font_size: Tamaño de la fuente en píxeles.
+            color: Color del texto (nombre o '#rrggbb').
+            stroke_color: Color del borde.
+            stroke_width: Grosor del borde en píxeles.
+            max_width: Ancho máximo de línea en píxeles; None para no partir líneas.
+            align: Alineación de las líneas ('center', 'left' o 'right').
+        """
+        self.font = buscar_fuente(font)
+        self.font_size = int(font_size)
+        self.color = color
+        self.stroke_color = stroke_color
+        self.stroke_width = int(stroke_width)
+        self.max_width = int(max_width) if max_width else None
+        self.align = align
+
+    @property
+    def clave(self):
+        """Tupla que identifica el estilo en la caché de sprites."""
+        return (self.font, self.font_size, self.color, self.stroke_color, self.stroke_width,
+                self.max_width, self.align)
+
+    def fuente(self):
+        return cargar_fuente(self.font, self.font_size)
+
+    def __repr__(self):
+        return (f"SubtitleStyle({os.path.basename(self.font or 'default')!r}, {self.font_size}px, "
+                f"{self.color!r}/{self.stroke_color!r} x{self.stroke_width}, max_width={self.max_width})")
+
+
+def estilo_subtitulos_video(tamano_video=(1920, 1080), font=None, color='white', stroke_color='black',
+                            stroke_width=GROSOR_BORDE_1080P):
+    """
+    Estilo con el que se queman los subtítulos en un vídeo de `tamano_video` (ancho,
+    alto): fuente de TAMANO_FUENTE_1080P y borde de `stroke_width` (a 1080p) escalados
+    con el alto, y líneas de FRACCION_ANCHO_LINEA del ancho. Al generar el SRT con el
+    mismo estilo, cada subtítulo cabe en la imagen tal como se escribió.
+    """
+    escala = tamano_video[1] / 1080
+    return SubtitleStyle(font, max(8, int(TAMANO_FUENTE_1080P * escala)), color, stroke_color,
+                         max(1, int(stroke_width * escala)),
+                         max_width=int(tamano_video[0] * FRACCION_ANCHO_LINEA))
+
+
+class _GlyphCache:
+    """
+    Glifos de una fuente (ruta, tamaño y grosor de borde) rasterizados una sola vez:
+    máscaras de relleno y de borde con su desplazamiento respecto al origen del
+    carácter, más el avance y el interletraje de cada par. Pillow vuelve a pasar cada
+    carácter por FreeType en cada llamada a `text`; con la caché, un subtítulo se
+    compone copiando máscaras ya rasterizadas.
+    """
+    def __init__(self, fuente, stroke_width):
+        self.fuente = fuente
+        self.stroke_width = stroke_width
+        self._glifos = {}
+        self._avances = {}
+        self._pares = {}
+        self._anchos = {}
+        self._lock = threading.Lock()
+
+    def glifo(self, caracter):
+        """Devuelve ((relleno, dx, dy), (borde, dx, dy) o None) del carácter."""
+        with self._lock:
+            glifo = self._glifos.get(caracter)
+        if glifo is None:
+            glifo = (self._rasterizar(caracter, 0),
+                     self._rasterizar(caracter, self.stroke_width) if self.stroke_width > 0 else None)
+            with self._lock:
+                self._glifos[caracter] = glifo
+        return glifo
+
+    def _rasterizar(self, caracter, stroke_width):
+        x0, y0, x1, y1 = self.fuente.getbbox(caracter, stroke_width=stroke_width)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        mascara = Image.new('L', (x1 - x0, y1 - y0), 0)
+        ImageDraw.Draw(mascara).text((-x0, -y0), caracter, fill=255, font=self.fuente,
+                                     stroke_width=stroke_width, stroke_fill=255)
+        return np.asarray(mascara), x0, y0
+
+    def posiciones(self, linea):
+        """Posición horizontal de cada carácter de la línea (avance más interletraje)."""
+        posiciones = []
+        x = 0.0
+        anterior = None
+        for caracter in linea:
+            if anterior is not None:
+                x += self._interletraje(anterior, caracter)
+            posiciones.append(x)
+            x += self._avance(caracter)
+            anterior = caracter
+        return posiciones, x
+
+    def ancho_palabra(self, palabra):
+        """Ancho de una palabra en píxeles; cada palabra se mide una sola vez."""
+        ancho = self._anchos.get(palabra)
+        if ancho is None:
+            ancho = self._anchos[palabra] = self.posiciones(palabra)[1]
+        return ancho
+
+    def separacion(self, anterior, siguiente):
+        """Ancho del espacio entre dos palabras, con el interletraje de los caracteres que lo rodean."""
+        return self._interletraje(anterior[-1], ' ') + self._avance(' ') + self._interletraje(' ', siguiente[0])
+
+    def _avance(self, caracter):
+        avance = self._avances.get(caracter)
+        if avance is None:
+            avance = self._avances[caracter] = self.fuente.getlength(caracter)
+        return avance
+
+    def _interletraje(self, a, b):
+        par = a + b
+        ajuste = self._pares.get(par)
+        if ajuste is None:
+            ajuste = self._pares[par] = self.fuente.getlength(par) - self._avance(a) - self._avance(b)
+        return ajuste
+
+
+@lru_cache(maxsize=32)
+def _cache_glifos(ruta, tamano, stroke_width):
+    return _GlyphCache(cargar_fuente(ruta, tamano), stroke_width)
+
+
+def _medir(glifos, palabras):
+    """Inicio y fin en píxeles de cada palabra si todas fueran en una sola línea."""
+    inicios = []
+    finales = []
+    x = 0.0
+    for i, palabra in enumerate(palabras):
+        if i:
+            x = finales[-1] + glifos.separacion(palabras[i - 1], palabra)
+        inicios.append(x)
+        finales.append(x + glifos.ancho_palabra(palabra))
+    return inicios, finales
+
+
+def _cortes_voraces(inicios, finales, ancho_maximo):
+    """Reparto voraz (el de menos líneas): índice de la primera palabra de cada línea y el total."""
+    cortes = [0]
+    for i in range(1, len(inicios)):
+        if finales[i] - inicios[cortes[-1]] > ancho_maximo:
+            cortes.append(i)
+    return cortes + [len(inicios)]
+
+
+def _cortes_equilibrados(inicios, finales, ancho_maximo):
+    """
+    Con el número de líneas del reparto voraz, el reparto que minimiza la suma de los
+    cuadrados del espacio libre de cada línea (programación dinámica): líneas de ancho
+    parecido en lugar de una llena y otra con una palabra suelta.
+    """
+    voraces = _cortes_voraces(inicios, finales, ancho_maximo)
+    num_lineas = len(voraces) - 1
+    if num_lineas < 2:
+        return voraces
+    n = len(inicios)
+    infinito = float('inf')
+    # coste[j][i]: mejor reparto de las i primeras palabras en j líneas
+    coste = [[infinito] * (n + 1) for _ in range(num_lineas + 1)]
+    origen = [[0] * (n + 1) for _ in range(num_lineas + 1)]
+    coste[0][0] = 0.0
+    for j in range(1, num_lineas + 1):
+        for i in range(j, n - num_lineas + j + 1):
+            # Última línea: palabras a..i-1, alargándola hacia atrás mientras quepa
+            for a in range(i - 1, j - 2, -1):
+                ancho = finales[i - 1] - inicios[a]
+                if ancho > ancho_maximo and a < i - 1:
+                    break
+                total = coste[j - 1][a] + (ancho_maximo - min(ancho, ancho_maximo)) ** 2
+                if total < coste[j][i]:
+                    coste[j][i] = total
+                    origen[j][i] = a
+    cortes = [n]
+    for j in range(num_lineas, 0, -1):
+        cortes.append(origen[j][cortes[-1]])
+    return cortes[::-1]
+
+
+def _ancho_util(estilo):
+    """Ancho disponible para el texto: el borde añade `stroke_width` a cada lado del sprite."""
+    return max(1, estilo.max_width - 2 * estilo.stroke_width)
+
+
+def partir_lineas(texto, estilo):
+    """
+    Parte el texto en líneas que no superan `estilo.max_width` píxeles (con el borde),
+    medidas con las métricas de la caché de glifos. Usa el mínimo de líneas y, con ese
+    número, el reparto más equilibrado. Los saltos de línea del texto original se respetan.
+
+    Returns:
+        Lista de líneas.
+    """
+    if not estilo.max_width:
+        return texto.split('\n')
+    glifos = _cache_glifos(estilo.font, estilo.font_size, estilo.stroke_width)
+    lineas = []
+    for parrafo in texto.split('\n'):
+        palabras = parrafo.split()
+        if not palabras:
+            lineas.append('')
+            continue
+        cortes = _cortes_equilibrados(*_medir(glifos, palabras), _ancho_util(estilo))
+        lineas += [" ".join(palabras[a:b]) for a, b in zip(cortes, cortes[1:])]
+    return lineas
+
+
+def cabe_en_lineas(texto, estilo, max_lineas=MAX_LINEAS_SUBTITULO):
+    """
+    Indica si el texto cabe en `max_lineas` líneas del estilo. Sirve para agrupar
+    palabras en subtítulos por su ancho real en lugar de por número de caracteres.
+    """
+    if not estilo.max_width:
+        return texto.count('\n') < max_lineas
+    glifos = _cache_glifos(estilo.font, estilo.font_size, estilo.stroke_width)
+    lineas = 0
+    for parrafo in texto.split('\n'):
+        palabras = parrafo.split()
+        lineas += len(_cortes_voraces(*_medir(glifos, palabras), _ancho_util(estilo))) - 1 if palabras else 1
+        if lineas > max_lineas:
+            return False
+    return True
+
+
+def alto_linea(estilo):
+    """Distancia entre las líneas de un subtítulo en píxeles (la de ImageDraw.multiline_text)."""
+    fuente = estilo.fuente()
+    return (fuente.getbbox('A', stroke_width=estilo.stroke_width)[3] + estilo.stroke_width
+            + int(round(estilo.font_size * INTERLINEADO)))
+
+
+@lru_cache(maxsize=32)
+def _tabla_colores(color, color_borde):
+    """Color RGBA (empaquetado en uint32) para cada cobertura 0-255 del relleno sobre el borde."""
+    relleno = np.array(ImageColor.getrgb(color)[:3], dtype=np.float32)
+    borde = np.array(ImageColor.getrgb(color_borde)[:3], dtype=np.float32)
+    tabla = np.zeros((256, 4), dtype=np.uint8)
+    tabla[:, :3] = np.rint(borde + (relleno - borde) * (np.arange(256, dtype=np.float32)[:, None] / 255.0))
+    return tabla.view(np.uint32).ravel()
+
+
+def _componer(texto, estilo):
+    """
+    Dibuja un subtítulo en un sprite RGBA recortado a su contenido, componiendo los
+    glifos de la caché (borde debajo, relleno encima) con NumPy.
+
+    Returns:
+        Tupla (sprite, x0, y0, palabras): el sprite de solo lectura, la posición de su
+        esquina en la maqueta del texto y el origen (x, y) de cada palabra en ella.
+    """
+    glifos = _cache_glifos(estilo.font, estilo.font_size, estilo.stroke_width)
+    lineas = partir_lineas(texto.strip(), estilo)
+    interlinea = alto_linea(estilo)
+
+    # Colocar cada glifo: (máscara de relleno, máscara de borde, x, y)
+    colocados = []
+    palabras = []
+    medidas = [glifos.posiciones(linea) for linea in lineas]
+    ancho_texto = max(ancho for _, ancho in medidas)
+    for n, (linea, (posiciones, ancho)) in enumerate(zip(lineas, medidas)):
+        # Desplazamiento entero: las palabras sueltas (karaoke) caen en los mismos píxeles
+        desplazamiento = int(round({'center': (ancho_texto - ancho) / 2,
+                                    'right': ancho_texto - ancho}.get(estilo.align, 0)))
+        anterior = ' '
+        for caracter, x in zip(linea, posiciones):
+            x = int(round(x)) + desplazamiento
+            if anterior.isspace() and not caracter.isspace():
+                palabras.append((x, n * interlinea))
+            anterior = caracter
+            relleno, borde = glifos.glifo(caracter)
+            if relleno is not None or borde is not None:
+                colocados.append((relleno, borde, x, n * interlinea))
+    if not colocados:
+        sprite = np.zeros((1, 1, 4), dtype=np.uint8)
+        sprite.flags.writeable = False
+        return sprite, 0, 0, palabras
+
+    # Caja del texto completo
+    cajas = [(x + dx, y + dy, x + dx + m.shape[1], y + dy + m.shape[0])
+             for relleno, borde, x, y in colocados for m, dx, dy in [borde or relleno]]
+    x0 = min(c[0] for c in cajas)
+    y0 = min(c[1] for c in cajas)
+    x1 = max(c[2] for c in cajas)
+    y1 = max(c[3] for c in cajas)
+
+    alfa_relleno = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    alfa_borde = np.zeros_like(alfa_relleno) if estilo.stroke_width > 0 else alfa_relleno
+    for relleno, borde, x, y in colocados:
+        for mascara, destino in ((borde, alfa_borde), (relleno, alfa_relleno)):
+            if mascara is not None:
+                m, dx, dy = mascara
+                xi, yi = x + dx - x0, y + dy - y0
+                zona = destino[yi:yi + m.shape[0], xi:xi + m.shape[1]]
+                np.maximum(zona, m, out=zona)
+
+    # Relleno sobre borde: el color se interpola por la cobertura del relleno (tabla de
+    # 256 colores RGBA empaquetados en uint32, un solo acceso por píxel) y la opacidad
+    # es la unión de ambas máscaras
+    sprite = _tabla_colores(estilo.color, estilo.stroke_color)[alfa_relleno]
+    sprite = sprite.view(np.uint8).reshape(y1 - y0, x1 - x0, 4)
+    np.maximum(alfa_borde, alfa_relleno, out=sprite[..., 3])
+    sprite.flags.writeable = False
+    return sprite, x0, y0, palabras
+
+
+def rasterizar_texto(texto, estilo):
+    """
+    Dibuja un subtítulo en un sprite RGBA recortado a su contenido.
+
+    Args:
+        texto: Texto del subtítulo.
+        estilo: SubtitleStyle.
+
+    Returns:
+        Array uint8 (alto, ancho, 4) de solo lectura.
+    """
+    return _componer(texto, estilo)[0]
+
+
+def _obtener_compuesto(texto, estilo):
+    """_componer con caché LRU por texto, fuente, tamaño, colores, borde y ancho."""
+    clave = (texto, estilo.clave)
+    with _cache_sprites_lock:
+        compuesto = _cache_sprites.get(clave)
+        if compuesto is not None:
+            _cache_sprites.move_to_end(clave)
+            return compuesto
+    compuesto = _componer(texto, estilo)
+    with _cache_sprites_lock:
+        _cache_sprites[clave] = compuesto
+        while len(_cache_sprites) > MAX_SPRITES_CACHE:
+            _cache_sprites.popitem(last=False)
+    return compuesto
+
+
+def obtener_sprite(texto, estilo):
+    """
+    Devuelve el sprite de un subtítulo, rasterizándolo solo la primera vez que aparece
+    con ese estilo (caché LRU por texto, fuente, tamaño, colores, borde y ancho).
+    """
+    return _obtener_compuesto(texto, estilo)[0]
+
+
+def sprites_karaoke(texto, estilo, estilo_resaltado):
+    """
+    Sprites para resaltar palabra a palabra un subtítulo: el de la línea completa y
+    uno por palabra con el color de resaltado, colocado exactamente sobre la misma
+    palabra de la línea. Todos salen de la caché de sprites, así una palabra que se
+    repite en el video se rasteriza una sola vez.
+
+    Args:
+        texto: Texto del subtítulo.
+        estilo: SubtitleStyle de la línea.
+        estilo_resaltado: SubtitleStyle de la palabra que se está diciendo (mismo
+            tamaño y fuente, otro color).
+
+    Returns:
+        Tupla (sprite de la línea, [(sprite de la palabra, dx, dy), ...]) con el
+        desplazamiento de cada palabra respecto a la esquina del sprite de la línea.
+    """
+    sprite, x0, y0, origenes = _obtener_compuesto(texto, estilo)
+    palabras = []
+    for palabra, (x, y) in zip(texto.split(), origenes):
+        sprite_palabra, px0, py0, _ = _obtener_compuesto(palabra, estilo_resaltado)
+        palabras.append((sprite_palabra, x + px0 - x0, y + py0 - y0))
+    return sprite, palabras
+
+
+def rasterizar_subtitulos(textos, estilo):
+    """
+    Rasteriza de una vez todos los subtítulos de un vídeo. Los textos repetidos
+    (estribillos, "[Música]"...) comparten un único sprite.
+
+    Args:
+        textos: Iterable con el texto de cada subtítulo.
+        estilo: SubtitleStyle.
+
+    Returns:
+        Diccionario texto -> sprite RGBA.
+    """
+    inicio = time.perf_counter()
+    textos = list(textos)
+    sprites = {texto: obtener_sprite(texto, estilo) for texto in dict.fromkeys(textos)}
+    print(f"Subtítulos rasterizados: {len(textos)} entradas, {len(sprites)} distintas "
+          f"en {time.perf_counter() - inicio:.2f} s ({estilo})")
+    return sprites
+
+
+class SubtitleTrack:
+    """
+    Capa única de subtítulos que se aplica con `clip.transform(track.apply)`.
+
+    En lugar de una capa de CompositeVideoClip por subtítulo (que comprueba el rango de
+    tiempo de todas las capas en cada frame y compone el frame entero), los instantes
+    de inicio y fin de todos los subtítulos se ordenan una vez en un índice de
+    intervalos elementales: el subtítulo activo en t se encuentra con una búsqueda
+    binaria (O(log n)) y solo se mezcla la caja de su sprite.
+    """
+    def __init__(self, cues, tamano_video, position=('center', 'bottom'), position_relative=False,
+                 margen_inferior=MARGEN_INFERIOR):
+        """
+        Args:
+            cues: Lista de (inicio, fin, sprite RGBA) en segundos. Un cue puede llevar un
+                cuarto elemento (sprite_base, dx, dy) para dibujarse desplazado respecto a
+                donde se coloca sprite_base (las palabras resaltadas del karaoke); se
+                dibuja después de los cues anteriores de la lista.
+            tamano_video: Tamaño (ancho, alto) de los frames.
+            position: Posición de los subtítulos, con la misma sintaxis que with_position.
+            position_relative: Interpretar los números de `position` como fracciones del video.
+            margen_inferior: Distancia mínima entre el borde inferior del bloque de texto y
+                el del vídeo, como fracción del alto: un subtítulo de varias líneas sube en
+                lugar de salirse del frame.
+        """
+        self.tamano_video = (int(tamano_video[0]), int(tamano_video[1]))
+        self._preparados = OrderedDict()
+
+        # Barrido por los bordes: cada intervalo elemental guarda los subtítulos activos
+        # (normalmente uno; varios si el SRT tiene subtítulos solapados)
+        eventos = sorted({t for inicio, fin, *_ in cues if fin > inicio for t in (inicio, fin)})
+        self._limites = eventos
+        activos = [[] for _ in eventos]
+        y_maximo = self.tamano_video[1] - int(round(self.tamano_video[1] * margen_inferior))
+        for inicio, fin, sprite, *ancla in cues:
+            if fin <= inicio:
+                continue
+            base, dx, dy = ancla[0] if ancla else (sprite, 0, 0)
+            alto, ancho = base.shape[:2]
+            x, y = compute_position((ancho, alto), self.tamano_video, position, position_relative)
+            # El límite se aplica a la caja de sprite_base para que las palabras del
+            # karaoke sigan alineadas con su línea
+            y = min(y, y_maximo - alto)
+            x, y = x + dx, y + dy
+            desde = bisect.bisect_left(eventos, inicio)
+            hasta = bisect.bisect_left(eventos, fin)
+            for i in range(desde, hasta):
+                activos[i].append((sprite, int(x), int(y)))
+        self._activos = [tuple(a) for a in activos]
+        print(f"Capa de subtítulos: {len(cues)} subtítulos en {max(0, len(eventos) - 1)} intervalos")
+
+    def activos(self, t):
+        """Sprites visibles en el instante t, como tuplas (sprite, x, y)."""
+        i = bisect.bisect_right(self._limites, t) - 1
+        if 0 <= i < len(self._activos):
+            return self._activos[i]
+        return ()
+
+    def apply(self, get_frame, t):
+        frame = get_frame(t)
+        activos = self.activos(t)
+        if not activos:
+            return frame
+        # El frame de un ImageClip es el mismo array en todos los instantes: se copia
+        # antes de escribir los subtítulos encima
+        frame = np.array(frame, dtype=np.uint8)
+        for sprite, x, y in activos:
+            self._mezclar(frame, sprite, x, y)
+        return frame
+
+    def _mezclar(self, frame, sprite, x, y):
+        """Mezcla el sprite sobre el frame en (x, y), solo dentro de su caja."""
+        alto, ancho = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite.shape[1], ancho), min(y + sprite.shape[0], alto)
+        if x1 <= x0 or y1 <= y0:
+            return
+        premultiplicado, inverso = self._preparar(sprite)
+        recorte = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        zona = frame[y0:y1, x0:x1, :3]
+        # Aritmética entera: zona * (255 - a) + color * a cabe en uint16
+        mezcla = zona.astype(np.uint16)
+        mezcla *= inverso[recorte]
+        mezcla += premultiplicado[recorte]
+        mezcla += 127
+        mezcla //= 255
+        zona[...] = mezcla
+
+    def _preparar(self, sprite):
+        """Color premultiplicado y alfa inverso del sprite (caché de los últimos usados)."""
+        clave = id(sprite)
+        preparado = self._preparados.get(clave)
+        if preparado is None or preparado[0] is not sprite:
+            alfa = sprite[..., 3:4].astype(np.uint16)
+            preparado = (sprite, sprite[..., :3] * alfa, 255 - alfa)
+            self._preparados[clave] = preparado
+            while len(self._preparados) > MAX_SPRITES_PREPARADOS:
+                self._preparados.popitem(last=False)
+        else:
+            self._preparados.move_to_end(clave)
+        return preparado[1], preparado[2]
@@ -1,5 +1,6 @@
 from tkinter.font import Font
-from moviepy import VideoFileClip, TextClip, CompositeVideoClip
+from moviepy import VideoFileClip, ImageClip
+import json
 import os
 import re
 import srt
@@ -7,6 +8,10 @@ from datetime import timedelta
 from pathlib import Path
 from typing import List, Tuple, Optional
 
+from cache_transcripcion import transcribir_en_cache
+from sprites_subtitulos import (MAX_LINEAS_SUBTITULO, SubtitleStyle, SubtitleTrack, cabe_en_lineas,
+                                obtener_sprite, partir_lineas, rasterizar_subtitulos, sprites_karaoke)
+
 # Importar faster-whisper condicionalmente
 try:
     from faster_whisper import WhisperModel
@@ -17,6 +22,9 @@ except ImportError:
     print("Para instalar: pip install faster-whisper srt")
     WhisperModel = None
 
+# Versión del formato del archivo de tiempos por palabra
+VERSION_PALABRAS = 1
+
 class SubtitleEffect:
     """
     Clase para aplicar subtítulos a videos.
@@ -49,8 +57,8 @@ class SubtitleEffect:
         stroke_width: int = 3,
         position: Tuple[str, str] = ('center', 'bottom'),
         video_width: int = 1280,
-        
-    ) -> TextClip:
+        position_relative: bool = False,
+    ) -> Optional[ImageClip]:
         """
         Crea un clip de subtítulo con el texto y estilo especificados.
         
@@ -64,31 +72,21 @@ class SubtitleEffect:
             stroke_color: Color del borde
             stroke_width: Grosor del borde
             position: Posición del subtítulo
-            video_width: Ancho del video para calcular el tamaño del TextClip
+            video_width: Ancho del video (las líneas ocupan como máximo el 90%)
+            position_relative: Interpretar los números de `position` como fracciones del video
         """
         try:
-            # Crear TextClip con parámetros específicos
-            subtitle_clip = TextClip(
-                text,
-                font=font,
-                fontsize=font_size,
-                color=font_color,
-                stroke_color=stroke_color,
-                stroke_width=stroke_width,
-                method='caption',
-                size=(video_width * 0.9, None),  # Ancho 90% del video
-                align='center'
-            )
-            
-            # Establecer duración y posición
-            subtitle_clip = subtitle_clip.set_duration(end_time - start_time)
-            subtitle_clip = subtitle_clip.set_start(start_time)
-            subtitle_clip = subtitle_clip.set_position(position)
-            
-            return subtitle_clip
+            # El texto se rasteriza con Pillow una sola vez por texto y estilo (caché de sprites)
+            estilo = SubtitleStyle(font, font_size, font_color, stroke_color, stroke_width,
+                                   max_width=int(video_width * 0.9))
+            sprite = obtener_sprite(text, estilo)
+            return (ImageClip(sprite, transparent=True)
+                    .with_duration(end_time - start_time)
+                    .with_start(start_time)
+                    .with_position(position, relative=position_relative))
             
         except Exception as e:
-            print(f"Error al crear TextClip: {e}")
+            print(f"Error al crear el clip de subtítulo: {e}")
             import traceback
             traceback.print_exc()
             return None
@@ -102,10 +100,13 @@ class SubtitleEffect:
         font_color: str = 'white',
         stroke_color: str = 'black',
         stroke_width: int = 1,
-        position: Tuple[str, str] = ('center', 'bottom')
+        position: Tuple[str, str] = ('center', 'bottom'),
+        position_relative: bool = False
     ) -> VideoFileClip:
         """
-        Aplica subtítulos a un video usando TextClips.
+        Aplica subtítulos a un video. Cada texto distinto se rasteriza una sola vez con
+        Pillow (los subtítulos repetidos reutilizan el mismo sprite) y todos se dibujan
+        desde una única capa (SubtitleTrack).
         
         Args:
             video_clip: Clip de video base
@@ -116,6 +117,7 @@ class SubtitleEffect:
             stroke_color: Color del borde
             stroke_width: Grosor del borde
             position: Posición del subtítulo
+            position_relative: Interpretar los números de `position` como fracciones del video
             
         Returns:
             VideoFileClip con los subtítulos aplicados
@@ -127,7 +129,12 @@ class SubtitleEffect:
         video_duration = video_clip.duration
         video_width = video_clip.w
         
-        subtitle_clips = []
+        # Rasterizar de una vez los textos distintos
+        estilo = SubtitleStyle(font, font_size, font_color, stroke_color, stroke_width,
+                               max_width=int(video_width * 0.9))
+        rasterizar_subtitulos((sub.content for sub in subtitles), estilo)
+        
+        cues = []
         for sub in subtitles:
             start = sub.start.total_seconds()
             end = sub.end.total_seconds()
@@ -137,26 +144,98 @@ class SubtitleEffect:
             end = min(end, video_duration)
             if end <= start: continue
             
-            # Crear y añadir el clip de subtítulo
-            clip = SubtitleEffect.create_subtitle_clip(
-                sub.content,
-                start,
-                end,
-                font,
-                font_size,
-                font_color,
-                stroke_color,
-                stroke_width,
-                position,
-                video_width
-            )
-            
-            if clip:
-                subtitle_clips.append(clip)
+            cues.append((start, end, obtener_sprite(sub.content, estilo)))
 
-        # Componer si hay clips de subtítulo
-        if subtitle_clips:
-            return CompositeVideoClip([video_clip] + subtitle_clips, size=video_clip.size)
+        # Una sola capa con índice de intervalos en lugar de una capa compuesta por subtítulo
+        if cues:
+            track = SubtitleTrack(cues, video_clip.size, position, position_relative)
+            return video_clip.transform(track.apply)
+        else:
+            return video_clip
+
+    @staticmethod
+    def apply_karaoke(
+        video_clip: VideoFileClip,
+        subtitles: List[srt.Subtitle],
+        palabras: List[Tuple[float, float, List[Tuple[str, float, float]]]],
+        font: str = '/System/Library/Fonts/Helvetica.ttc',
+        font_size: int = 24,
+        font_color: str = 'white',
+        highlight_color: str = 'yellow',
+        stroke_color: str = 'black',
+        stroke_width: int = 1,
+        position: Tuple[str, str] = ('center', 'bottom'),
+        position_relative: bool = False
+    ) -> VideoFileClip:
+        """
+        Aplica subtítulos resaltando cada palabra mientras se pronuncia (estilo shorts).
+        La línea y cada palabra resaltada son sprites de la caché, así que el resaltado
+        solo añade la mezcla de un sprite pequeño por frame en la misma capa.
+
+        Los subtítulos sin tiempos por palabra (p. ej. editados a mano después de
+        generarlos) se dibujan sin resaltado.
+
+        Args:
+            video_clip: Clip de video base
+            subtitles: Lista de objetos srt.Subtitle
+            palabras: Tiempos por palabra, como los devuelve cargar_palabras
+            font: Ruta a la fuente a usar
+            font_size: Tamaño de la fuente
+            font_color: Color del texto
+            highlight_color: Color de la palabra que se está diciendo
+            stroke_color: Color del borde
+            stroke_width: Grosor del borde
+            position: Posición del subtítulo
+            position_relative: Interpretar los números de `position` como fracciones del video
+
+        Returns:
+            VideoFileClip con los subtítulos aplicados
+        """
+        if not hasattr(video_clip, 'duration') or not video_clip.duration:
+            print("ERROR: Clip de vídeo base no tiene duración válida.")
+            return video_clip
+
+        video_duration = video_clip.duration
+        estilo = SubtitleStyle(font, font_size, font_color, stroke_color, stroke_width,
+                               max_width=int(video_clip.w * 0.9))
+        estilo_resaltado = SubtitleStyle(font, font_size, highlight_color, stroke_color, stroke_width,
+                                         max_width=int(video_clip.w * 0.9))
+
+        # Tiempos por palabra de cada texto; si un texto se repite se usa la línea más cercana
+        por_texto = {}
+        for inicio, fin, lista in palabras:
+            por_texto.setdefault(tuple(p for p, _, _ in lista), []).append((inicio, lista))
+
+        cues = []
+        resaltados = 0
+        for sub in subtitles:
+            start = sub.start.total_seconds()
+            end = sub.end.total_seconds()
+            if start >= video_duration: continue
+            end = min(end, video_duration)
+            if end <= start: continue
+
+            candidatas = por_texto.get(tuple(sub.content.split()))
+            if not candidatas:
+                cues.append((start, end, obtener_sprite(sub.content, estilo)))
+                continue
+            _, lista = min(candidatas, key=lambda c: abs(c[0] - start))
+            sprite, sprites_palabras = sprites_karaoke(sub.content, estilo, estilo_resaltado)
+            cues.append((start, end, sprite))
+            # Cada palabra queda resaltada hasta que empieza la siguiente (sin parpadeos
+            # en las pausas cortas); la última, hasta el final del subtítulo
+            for n, ((_, inicio_palabra, _), (sprite_palabra, dx, dy)) in enumerate(zip(lista, sprites_palabras)):
+                fin_palabra = lista[n + 1][1] if n + 1 < len(lista) else end
+                inicio_palabra = max(inicio_palabra, start)
+                fin_palabra = min(fin_palabra, end)
+                if fin_palabra > inicio_palabra:
+                    cues.append((inicio_palabra, fin_palabra, sprite_palabra, (sprite, dx, dy)))
+            resaltados += 1
+
+        print(f"Karaoke: {resaltados}/{len(subtitles)} subtítulos con resaltado por palabra")
+        if cues:
+            track = SubtitleTrack(cues, video_clip.size, position, position_relative)
+            return video_clip.transform(track.apply)
         else:
             return video_clip
 
@@ -199,6 +278,7 @@ class SubtitleEffect:
                 return False
 
             srt_subs = []
+            lineas_palabras = []
             subtitle_index = 1
             current_line_words = []
             line_start_time = all_words[0].start
@@ -221,6 +301,8 @@ class SubtitleEffect:
                         content=current_line_text
                     )
                     srt_subs.append(sub)
+                    lineas_palabras.append((line_start_time, line_end_time,
+                                            [(w.word.strip(), w.start, w.end) for w in current_line_words]))
                     subtitle_index += 1
                     current_line_words = []
                     if not is_last_word:
@@ -240,6 +322,7 @@ class SubtitleEffect:
                 print(f"ERROR: Archivo SRT no se creó o está vacío: {output_srt_path}")
                 return False
 
+            guardar_palabras(output_srt_path, lineas_palabras)
             print(f"Archivo SRT generado con {len(srt_subs)} entradas en: {output_srt_path}")
             return True
 
@@ -264,6 +347,63 @@ def format_srt_time(total_seconds):
     return timedelta(seconds=total_seconds)
 
 
+def ruta_palabras(archivo_srt):
+    """Archivo con los tiempos por palabra que acompaña a un SRT (subs.srt -> subs.palabras.json)."""
+    return Path(archivo_srt).with_suffix('.palabras.json')
+
+
+def guardar_palabras(archivo_srt, lineas):
+    """
+    Guarda junto al SRT los tiempos de cada palabra que Whisper ya calculó, para poder
+    resaltar las palabras (karaoke) sin volver a transcribir.
+
+    Args:
+        archivo_srt: Ruta del SRT al que acompañan.
+        lineas: Lista de (inicio, fin, [(palabra, inicio, fin), ...]), una por subtítulo.
+
+    Returns:
+        Ruta del archivo escrito, o None si no se pudo escribir.
+    """
+    datos = {
+        'version': VERSION_PALABRAS,
+        'lineas': [[round(inicio, 3), round(fin, 3),
+                    [[palabra, round(ini, 3), round(fn, 3)] for palabra, ini, fn in palabras if palabra]]
+                   for inicio, fin, palabras in lineas],
+    }
+    ruta = ruta_palabras(archivo_srt)
+    try:
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, separators=(',', ':'))
+    except OSError as e:
+        print(f"No se pudieron guardar los tiempos por palabra: {e}")
+        return None
+    print(f"Tiempos por palabra guardados en: {ruta.name}")
+    return ruta
+
+
+def cargar_palabras(archivo_srt):
+    """
+    Lee los tiempos por palabra de un SRT (ver guardar_palabras).
+
+    Returns:
+        Lista de (inicio, fin, [(palabra, inicio, fin), ...]), o None si el SRT no
+        tiene archivo de palabras o no se puede leer.
+    """
+    ruta = ruta_palabras(archivo_srt)
+    if not ruta.is_file():
+        return None
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        if datos.get('version') != VERSION_PALABRAS:
+            print(f"Tiempos por palabra con versión distinta en {ruta.name}, se ignoran")
+            return None
+        return [(inicio, fin, [tuple(p) for p in palabras]) for inicio, fin, palabras in datos['lineas']]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"No se pudieron leer los tiempos por palabra de {ruta.name}: {e}")
+        return None
+
+
 def generate_srt_with_whisper(
     whisper_model,  # Recibe el modelo cargado
     audio_path: str,
@@ -271,11 +411,25 @@ def generate_srt_with_whisper(
     max_chars_per_line: int = 42,  # Límite de caracteres común
     max_words_per_line: int = 10,  # Límite de palabras
     language: str = "es",  # Idioma para transcripción
-    word_timestamps: bool = True  # Usar timestamps por palabra
+    word_timestamps: bool = True,  # Usar timestamps por palabra
+    opciones_transcripcion: Optional[dict] = None,  # beam_size, best_of, vad_filter... (ver transcripcion.py)
+    nombre_modelo: Optional[str] = None,  # Modelo cargado ('base', 'small'...): activa la caché
+    cache_dir: Optional[str] = None,  # Caché de transcripciones (por defecto, .cache/transcripcion)
+    estilo: Optional[SubtitleStyle] = None,  # Estilo del render: agrupa por ancho en lugar de caracteres
+    max_lineas: int = MAX_LINEAS_SUBTITULO  # Líneas por subtítulo al agrupar por ancho
 ) -> bool:
     """
     Genera SRT usando faster-whisper con timestamps por palabra,
     e intenta agrupar palabras en líneas de subtítulo.
+
+    Con `nombre_modelo`, la transcripción se guarda en caché por contenido del audio,
+    modelo e idioma/opciones: volver a generar el SRT (p. ej. con otro
+    max_chars_per_line) solo reagrupa las palabras.
+
+    Con `estilo` (sprites_subtitulos.estilo_subtitulos_video), las palabras se agrupan
+    por su ancho en píxeles con las métricas de la fuente del render: cada subtítulo
+    ocupa como mucho `max_lineas` líneas (y max_words_per_line palabras por línea) y se
+    escribe ya partido en líneas equilibradas, así que el render no vuelve a partirlo.
     """
     if not WHISPER_AVAILABLE:
         print("ERROR SRT: faster-whisper no está disponible.")
@@ -305,6 +459,7 @@ def generate_srt_with_whisper(
         
         # Configurar parámetros de transcripción
         transcribe_options = {
+            **(opciones_transcripcion or {}),
             "word_timestamps": word_timestamps,
         }
         
@@ -317,10 +472,12 @@ def generate_srt_with_whisper(
         
         # Transcribir obteniendo segmentos y palabras
         print(" - Iniciando transcripción con faster-whisper...")
-        segments, info = whisper_model.transcribe(audio_path, **transcribe_options)
+        segments, info = transcribir_en_cache(whisper_model, audio_path, transcribe_options,
+                                              nombre_modelo=nombre_modelo, cache_dir=cache_dir)
         print(f" - Transcripción completada. Idioma detectado: {info.language} (Prob: {info.language_probability:.2f})")
 
         srt_subs = []
+        lineas_palabras = []  # Tiempos de cada palabra de cada línea (para el karaoke)
         subtitle_index = 1
         all_words = []
         # Recopilar todas las palabras con sus tiempos
@@ -341,17 +498,25 @@ def generate_srt_with_whisper(
             line_end_time = word_info.end  # Tiempo final de la palabra actual
 
             # Comprobar si debemos cortar la línea aquí
-            # Condición 1: Límite de caracteres
+            # Condición 1: Límite de caracteres (o de ancho en píxeles, con estilo)
             # Condición 2: Límite de palabras
             # Condición 3: Si es la última palabra de todas
             cut_line = False
-            if len(line_text) >= max_chars_per_line: cut_line = True
-            if len(current_line) >= max_words_per_line: cut_line = True
+            if estilo is not None:
+                # Por ancho: cortar si la siguiente palabra ya no cabe en max_lineas líneas
+                if len(current_line) >= max_words_per_line * max_lineas: cut_line = True
+                if i < len(all_words) - 1 and not cabe_en_lineas(
+                        f"{line_text} {all_words[i + 1].word.strip()}", estilo, max_lineas): cut_line = True
+            else:
+                if len(line_text) >= max_chars_per_line: cut_line = True
+                if len(current_line) >= max_words_per_line: cut_line = True
             if i == len(all_words) - 1: cut_line = True
 
             if cut_line:
                 # Crear el subtítulo SRT para la línea actual
                 sub_content = " ".join(w.word.strip() for w in current_line)
+                if estilo is not None:
+                    sub_content = "\n".join(partir_lineas(sub_content, estilo))
 
                 sub = srt.Subtitle(
                     index=subtitle_index,
@@ -360,6 +525,8 @@ def generate_srt_with_whisper(
                     content=sub_content
                 )
                 srt_subs.append(sub)
+                lineas_palabras.append((line_start_time, line_end_time,
+                                        [(w.word.strip(), w.start, w.end) for w in current_line]))
                 subtitle_index += 1
 
                 # Resetear para la siguiente línea
@@ -400,6 +567,7 @@ def generate_srt_with_whisper(
             
         print(f"Archivo SRT generado exitosamente con {len(srt_subs)} entradas en: {output_srt_path}")
         print(f"Tamaño del archivo: {output_file.stat().st_size} bytes")
+        guardar_palabras(output_srt_path, lineas_palabras)
         return True
 
     except Exception as e:
@@ -0,0 +1,198 @@
+import os
+import re
+from pathlib import Path
+
+from PIL import ImageColor
+
+from sprites_subtitulos import MARGEN_INFERIOR, alto_linea, partir_lineas
+
+
+def color_ass(color, alfa=0):
+    """Convierte un color ('orange', '#rrggbb'...) al formato &HAABBGGRR de ASS."""
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H{alfa:02X}{b:02X}{g:02X}{r:02X}"
+
+
+def tiempo_ass(segundos):
+    """Formatea segundos como H:MM:SS.cc (centésimas, como exige ASS)."""
+    centesimas = int(round(max(0.0, segundos) * 100))
+    horas, centesimas = divmod(centesimas, 360000)
+    minutos, centesimas = divmod(centesimas, 6000)
+    return f"{horas}:{minutos:02d}:{centesimas // 100:02d}.{centesimas % 100:02d}"
+
+
+def _escapar_texto(texto):
+    """Evita que llaves y barras del texto se interpreten como etiquetas de ASS."""
+    return texto.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}')
+
+
+def _anclaje(position, position_relative, tamano_video, margen=0):
+    """
+    Traduce una posición de MoviePy (la de la esquina superior izquierda del texto,
+    o 'left'/'center'/'right' y 'top'/'center'/'bottom') a una alineación \\an de ASS
+    y el punto de anclaje equivalente. 'bottom' ancla el borde inferior del bloque
+    `margen` píxeles por encima del borde del vídeo, así los subtítulos de varias
+    líneas crecen hacia arriba.
+    """
+    if isinstance(position, str):
+        position = {'center': ('center', 'center'), 'left': ('left', 'center'), 'right': ('right', 'center'),
+                    'top': ('center', 'top'), 'bottom': ('center', 'bottom')}[position]
+    ancho, alto = tamano_video
+    px, py = position
+    columnas = {'left': (1, 0), 'center': (2, ancho / 2), 'right': (3, ancho)}
+    filas = {'bottom': (0, alto - margen), 'center': (3, alto / 2), 'top': (6, 0)}
+    if isinstance(px, str):
+        columna, x = columnas[px]
+    else:
+        columna, x = 1, px * ancho if position_relative else px
+    if isinstance(py, str):
+        fila, y = filas[py]
+    else:
+        fila, y = 6, py * alto if position_relative else py
+    return columna + fila, int(round(x)), int(round(y))
+
+
+def escribir_ass(subtitulos, ruta_ass, estilo, tamano_video, duracion=None,
+                 position=('center', 'bottom'), position_relative=False, margen_inferior=MARGEN_INFERIOR):
+    """
+    Convierte subtítulos SRT en un archivo ASS con el estilo de los subtítulos de
+    Python, para quemarlos con el filtro `ass` de ffmpeg (libass) durante la
+    codificación en lugar de componerlos frame a frame.
+
+    Las líneas se parten con el mismo ancho máximo que los sprites y la posición se
+    traduce a una alineación y un \\pos equivalentes, así ambos caminos se ven igual.
+    Un subtítulo anclado por arriba que se saldría por debajo del margen inferior se
+    ancla por abajo (\\an1-\\an3) en el margen.
+
+    Args:
+        subtitulos: Lista de objetos srt.Subtitle.
+        ruta_ass: Ruta del archivo ASS que se escribe.
+        estilo: SubtitleStyle (fuente, tamaño, colores, borde y ancho máximo).
+        tamano_video: Tamaño (ancho, alto) del video; es también la resolución del script.
+        duracion: Duración del video; los subtítulos posteriores se descartan.
+        position: Posición de los subtítulos, con la misma sintaxis que with_position.
+        position_relative: Interpretar los números de `position` como fracciones del video.
+        margen_inferior: Distancia mínima entre los subtítulos y el borde inferior, como
+                         fracción del alto del video.
+
+    Returns:
+        Ruta del archivo ASS escrito.
+    """
+    ancho, alto = int(tamano_video[0]), int(tamano_video[1])
+    fuente = estilo.fuente()
+    familia = fuente.getname()[0] if estilo.font else 'Arial'
+    # El tamaño de ASS es la altura de línea (ascendente + descendente), no el em de Pillow
+    tamano_ass = sum(fuente.getmetrics())
+    margen = int(round(alto * margen_inferior))
+    alineacion, x, y = _anclaje(position, position_relative, (ancho, alto), margen)
+    interlinea = alto_linea(estilo)
+
+    lineas = [
+        '[Script Info]',
+        'ScriptType: v4.00+',
+        f'PlayResX: {ancho}',
+        f'PlayResY: {alto}',
+        'WrapStyle: 2',
+        'ScaledBorderAndShadow: yes',
+        '',
+        '[V4+ Styles]',
+        'Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, '
+        'Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, '
+        'Alignment, MarginL, MarginR, MarginV, Encoding',
+        f'Style: Default,{familia},{tamano_ass},{color_ass(estilo.color)},{color_ass(estilo.color)},'
+        f'{color_ass(estilo.stroke_color)},&H00000000,0,0,0,0,100,100,0,0,1,{estilo.stroke_width},0,'
+        f'{alineacion},0,0,0,1',
+        '',
+        '[Events]',
+        'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+    ]
+    escritos = 0
+    for sub in subtitulos:
+        inicio = sub.start.total_seconds()
+        fin = sub.end.total_seconds()
+        if duracion is not None:
+            if inicio >= duracion:
+                continue
+            fin = min(fin, duracion)
+        if fin <= inicio:
+            continue
+        partes = partir_lineas(sub.content.strip(), estilo)
+        texto = '\\N'.join(_escapar_texto(linea) for linea in partes)
+        if alineacion >= 7 and y + len(partes) * interlinea > alto - margen:
+            # El bloque crece hacia abajo desde y y se saldría: anclarlo por abajo en el margen
+            anclaje = f"{{\\an{alineacion - 6}\\pos({x},{alto - margen})}}"
+        else:
+            anclaje = f"{{\\pos({x},{y})}}"
+        lineas.append(f"Dialogue: 0,{tiempo_ass(inicio)},{tiempo_ass(fin)},Default,,0,0,0,,{anclaje}{texto}")
+        escritos += 1
+
+    ruta_ass = Path(ruta_ass)
+    ruta_ass.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta_ass, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lineas) + '\n')
+    print(f"Subtítulos ASS: {escritos} entradas en {ruta_ass.name} ({familia} {tamano_ass}, \\an{alineacion})")
+    return ruta_ass
+
+
+def _escapar_opcion(valor):
+    """Escapa un valor para una opción de filtro dentro de -filter_complex (dos niveles)."""
+    valor = re.sub(r"([\\':])", r"\\\1", str(valor).replace(os.sep, '/'))
+    return re.sub(r"([\\'\[\],;])", r"\\\1", valor)
+
+
+def filtro_ass(ruta_ass, carpeta_fuentes=None):
+    """
+    Filtro de ffmpeg que dibuja el archivo ASS sobre el video.
+
+    Args:
+        ruta_ass: Archivo ASS (p. ej. el de escribir_ass).
+        carpeta_fuentes: Carpeta con la fuente del estilo, si no está instalada en el sistema.
+
+    Returns:
+        Cadena del filtro para FFmpegWriter(filtro_video=...).
+    """
+    filtro = f"ass=filename={_escapar_opcion(ruta_ass)}"
+    if carpeta_fuentes:
+        filtro += f":fontsdir={_escapar_opcion(carpeta_fuentes)}"
+    return filtro
+
+
+def tiempo_vtt(segundos):
+    """Formatea segundos como HH:MM:SS.mmm (WebVTT)."""
+    milisegundos = int(round(max(0.0, segundos) * 1000))
+    horas, milisegundos = divmod(milisegundos, 3600000)
+    minutos, milisegundos = divmod(milisegundos, 60000)
+    return f"{horas:02d}:{minutos:02d}:{milisegundos // 1000:02d}.{milisegundos % 1000:03d}"
+
+
+def escribir_vtt(subtitulos, ruta_vtt, duracion=None):
+    """
+    Convierte subtítulos SRT en un archivo WebVTT (pistas de texto de navegadores y
+    reproductores web).
+
+    Args:
+        subtitulos: Lista de objetos srt.Subtitle.
+        ruta_vtt: Ruta del archivo que se escribe.
+        duracion: Duración del video; los subtítulos posteriores se descartan.
+
+    Returns:
+        Ruta del archivo escrito.
+    """
+    bloques = ['WEBVTT', '']
+    for sub in subtitulos:
+        inicio = sub.start.total_seconds()
+        fin = sub.end.total_seconds()
+        if duracion is not None:
+            if inicio >= duracion:
+                continue
+            fin = min(fin, duracion)
+        if fin <= inicio:
+            continue
+        # '-->' no puede aparecer en el texto de un cue
+        texto = sub.content.strip().replace('-->', '->')
+        bloques += [f"{tiempo_vtt(inicio)} --> {tiempo_vtt(fin)}", texto, '']
+    ruta_vtt = Path(ruta_vtt)
+    ruta_vtt.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta_vtt, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(bloques))
+    return ruta_vtt
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# test_alineacion.py: alineación del guion con los tiempos de una transcripción
+
+import pytest
+
+from alineacion import agrupar_en_lineas, alinear_con_transcripcion, normalizar_palabra, palabras_guion
+
+
+def test_normalizar_palabra():
+    assert normalizar_palabra("¿Qué?") == "que"
+    assert normalizar_palabra("Inés,") == "ines"
+    assert normalizar_palabra("—") == ""
+
+
+def test_palabras_guion_descarta_signos_sueltos():
+    assert palabras_guion("Hola — mundo.\n\n¿Qué tal?") == ["Hola", "mundo.", "¿Qué", "tal?"]
+
+
+def test_alinear_palabras_iguales_toman_los_tiempos_de_whisper():
+    guion = ["Hola,", "mundo."]
+    transcritas = [("hola", 0.0, 0.4), ("Mundo", 0.5, 0.9)]
+
+    palabras, coincidencia = alinear_con_transcripcion(guion, transcritas)
+
+    # El texto es el del guion, con su puntuación
+    assert palabras == [("Hola,", 0.0, 0.4), ("mundo.", 0.5, 0.9)]
+    assert coincidencia == 1.0
+
+
+def test_alinear_palabras_sustituidas_se_reparten_su_tramo():
+    guion = ["En", "1985", "llegó."]
+    transcritas = [("en", 0.0, 0.2), ("mil", 0.3, 0.5), ("novecientos", 0.5, 1.0), ("ochenta", 1.0, 1.4),
+                   ("y", 1.4, 1.5), ("cinco", 1.5, 1.8), ("llegó", 1.9, 2.3)]
+
+    palabras, coincidencia = alinear_con_transcripcion(guion, transcritas)
+
+    assert palabras == [("En", 0.0, 0.2), ("1985", 0.3, 1.8), ("llegó.", 1.9, 2.3)]
+    assert coincidencia == pytest.approx(2 / 3)
+
+
+def test_alinear_palabras_que_faltan_ocupan_la_pausa_entre_sus_vecinas():
+    guion = ["uno", "dos", "tres", "cuatro"]
+    transcritas = [("uno", 0.0, 1.0), ("cuatro", 2.0, 2.5)]
+
+    palabras, coincidencia = alinear_con_transcripcion(guion, transcritas)
+
+    assert palabras[0] == ("uno", 0.0, 1.0)
+    assert palabras[-1] == ("cuatro", 2.0, 2.5)
+    # El hueco [1.0, 2.0] se reparte en proporción a la longitud de cada palabra
+    (_, inicio_dos, fin_dos), (_, inicio_tres, fin_tres) = palabras[1:3]
+    assert inicio_dos == pytest.approx(1.0)
+    assert fin_dos == pytest.approx(inicio_tres)
+    assert fin_tres == pytest.approx(2.0)
+    assert fin_dos - inicio_dos < fin_tres - inicio_tres
+    assert coincidencia == 0.5
+
+
+def test_alinear_sin_transcripcion():
+    palabras, coincidencia = alinear_con_transcripcion(["hola"], [])
+    assert palabras == [("hola", 0.0, 0.0)]
+    assert coincidencia == 0.0
+
+
+def test_agrupar_en_lineas_por_ancho_del_render():
+    from sprites_subtitulos import estilo_subtitulos_video, obtener_sprite, partir_lineas
+
+    estilo = estilo_subtitulos_video((1280, 720))
+    texto = ("La catedral de Santa Inés se construyó durante casi dos siglos. "
+             "Sus muros extraordinariamente gruesos resistieron varios terremotos sin apenas daños")
+    palabras = [(p, i * 0.3, i * 0.3 + 0.25) for i, p in enumerate(texto.split())]
+
+    lineas = agrupar_en_lineas(palabras, estilo=estilo)
+
+    assert [p for _, _, linea in lineas for p in linea] == palabras
+    for inicio, fin, linea in lineas:
+        subtitulo = " ".join(p for p, _, _ in linea)
+        assert len(partir_lineas(subtitulo, estilo)) <= 2
+        # El sprite, con el borde, cabe en el ancho de línea del render
+        assert obtener_sprite(subtitulo, estilo).shape[1] <= estilo.max_width
+        assert (inicio, fin) == (linea[0][1], linea[-1][2])
+    # El fin de frase corta el subtítulo aunque quepan más palabras
+    assert any(linea[-1][0] == "siglos." for _, _, linea in lineas)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# test_cache_transcripcion.py: clave y formato de la caché de transcripciones, con un modelo simulado
+
+import shutil
+
+from cache_transcripcion import (InfoTranscripcion, Palabra, Segmento, cargar_transcripcion,
+                                 clave_transcripcion, guardar_transcripcion, hash_audio, transcribir_en_cache)
+
+OPCIONES = {'language': 'es', 'beam_size': 1, 'vad_filter': True, 'word_timestamps': True}
+
+SEGMENTOS = [
+    Segmento(0.0, 1.2, " Hola mundo.", [Palabra(" Hola", 0.0, 0.5, 0.98), Palabra(" mundo.", 0.6, 1.2, 0.91)]),
+    Segmento(1.5, 2.0, " Adiós.", [Palabra(" Adiós.", 1.5, 2.0, None)]),
+]
+
+
+class FakeModel:
+    """Modelo con el `transcribe` de faster-whisper: devuelve un generador de segmentos."""
+    def __init__(self):
+        self.llamadas = 0
+
+    def transcribe(self, audio, **opciones):
+        self.llamadas += 1
+        return (s for s in SEGMENTOS), InfoTranscripcion('es', 0.97)
+
+
+def test_clave_transcripcion():
+    clave = clave_transcripcion("abc", "base", OPCIONES)
+    # El orden de las opciones no importa; el modelo, las opciones y el idioma sí
+    assert clave == clave_transcripcion("abc", "base", dict(reversed(list(OPCIONES.items()))))
+    assert clave != clave_transcripcion("abd", "base", OPCIONES)
+    assert clave != clave_transcripcion("abc", "small", OPCIONES)
+    assert clave != clave_transcripcion("abc", "base", {**OPCIONES, 'beam_size': 5})
+    assert clave != clave_transcripcion("abc", "base", {**OPCIONES, 'language': 'en'})
+
+
+def test_hash_audio_depende_del_contenido(tmp_path):
+    a = tmp_path / "a.wav"
+    a.write_bytes(b"audio")
+    b = tmp_path / "b.wav"
+    b.write_bytes(b"audio")
+    c = tmp_path / "c.wav"
+    c.write_bytes(b"otro audio")
+    assert hash_audio(a) == hash_audio(b) != hash_audio(c)
+
+
+def test_guardar_y_cargar_transcripcion(tmp_path):
+    ruta = tmp_path / "cache" / "clave.jsonl"
+    guardar_transcripcion(ruta, SEGMENTOS, InfoTranscripcion('es', 0.97), {'audio': 'voz.wav'})
+
+    segmentos, info = cargar_transcripcion(ruta)
+
+    assert info == InfoTranscripcion('es', 0.97)
+    assert segmentos[0] == SEGMENTOS[0]
+    # La probabilidad que falta se guarda como 0
+    assert segmentos[1].words == [Palabra(" Adiós.", 1.5, 2.0, 0.0)]
+    assert list(ruta.parent.iterdir()) == [ruta]
+
+
+def test_cargar_transcripcion_ilegible_o_inexistente(tmp_path):
+    assert cargar_transcripcion(tmp_path / "no_existe.jsonl") is None
+    ruta = tmp_path / "rota.jsonl"
+    ruta.write_text('{"version": 1, "idioma": "es", "probabilidad": 1.0}\n[0.0, 1.0\n', encoding='utf-8')
+    assert cargar_transcripcion(ruta) is None
+    ruta.write_text('{"version": 0}\n', encoding='utf-8')
+    assert cargar_transcripcion(ruta) is None
+
+
+def test_transcribir_en_cache(tmp_path):
+    audio = tmp_path / "voz.wav"
+    audio.write_bytes(b"audio")
+    modelo = FakeModel()
+    cache_dir = tmp_path / "cache"
+
+    primera = transcribir_en_cache(modelo, audio, OPCIONES, 'base', cache_dir)
+    # Una copia del mismo audio reutiliza la transcripción
+    copia = tmp_path / "copia.wav"
+    shutil.copyfile(audio, copia)
+    segunda = transcribir_en_cache(modelo, copia, OPCIONES, 'base', cache_dir)
+
+    assert modelo.llamadas == 1
+    assert [seg.text for seg in segunda[0]] == [seg.text for seg in primera[0]]
+    assert segunda[1] == primera[1]
+    assert primera[0][0].words[0] == Palabra(" Hola", 0.0, 0.5, 0.98)
+
+    # Otras opciones u otro modelo vuelven a transcribir
+    transcribir_en_cache(modelo, audio, {**OPCIONES, 'language': 'en'}, 'base', cache_dir)
+    transcribir_en_cache(modelo, audio, OPCIONES, 'small', cache_dir)
+    assert modelo.llamadas == 3
+
+
+def test_transcribir_sin_nombre_de_modelo_no_usa_la_cache(tmp_path):
+    audio = tmp_path / "voz.wav"
+    audio.write_bytes(b"audio")
+    modelo = FakeModel()
+
+    transcribir_en_cache(modelo, audio, OPCIONES)
+    transcribir_en_cache(modelo, audio, OPCIONES)
+
+    assert modelo.llamadas == 2
+    assert not (tmp_path / ".cache").exists()
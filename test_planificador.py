@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# test_planificador.py: reparto de la narración entre las imágenes
+
+import pytest
+
+from planificador import (duraciones_desde_cortes, limites_desde_regiones, limites_desde_srt,
+                          planificar_cortes, planificar_duraciones)
+
+
+def test_planificar_cortes_sin_limites_es_uniforme():
+    assert list(planificar_cortes(4, 20.0)) == pytest.approx([5.0, 10.0, 15.0])
+    assert len(planificar_cortes(1, 20.0)) == 0
+
+
+def test_planificar_cortes_se_ajusta_a_la_pausa_mas_cercana():
+    # 5.9 queda dentro de la tolerancia (0.4 * 5 s); 13.0 no
+    cortes = planificar_cortes(4, 20.0, limites=[13.0, 5.9, 15.5])
+    assert list(cortes) == pytest.approx([5.9, 10.0, 15.5])
+
+
+def test_planificar_cortes_mantiene_la_duracion_minima():
+    # Todos los cortes caerían en la misma pausa
+    cortes = planificar_cortes(4, 20.0, limites=[9.0], tolerancia=2.0, duracion_minima=2.0)
+    assert all(b - a >= 2.0 - 1e-9 for a, b in zip(cortes, cortes[1:]))
+    assert cortes[-1] <= 18.0
+
+
+def test_limites_desde_regiones():
+    assert limites_desde_regiones([(0.0, 2.0), (3.0, 5.0), (5.5, 8.0)]) == [2.5, 5.25]
+
+
+def test_limites_desde_srt(tmp_path):
+    archivo = tmp_path / "voz.srt"
+    archivo.write_text("1\n00:00:00,000 --> 00:00:02,000\nHola\n\n"
+                       "2\n00:00:03,000 --> 00:00:04,000\nmundo\n", encoding='utf-8')
+    assert limites_desde_srt(archivo) == [2.5]
+    assert limites_desde_srt(tmp_path / "no_existe.srt") == []
+
+
+def test_duraciones_cubren_la_narracion_con_transiciones():
+    duraciones = duraciones_desde_cortes([5.0, 10.0], 15.0, duracion_transicion=1.0)
+    assert duraciones == pytest.approx([5.5, 6.0, 5.5])
+    # Los clips se solapan una transición en cada corte
+    assert sum(duraciones) - 2 * 1.0 == pytest.approx(15.0)
+
+
+def test_planificar_duraciones():
+    duraciones = planificar_duraciones(3, 12.0, limites=[4.5])
+    assert duraciones == pytest.approx([4.5, 3.5, 4.0])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# test_sprites_subtitulos.py: reparto en líneas por ancho y colocación de la capa de subtítulos
+
+from sprites_subtitulos import (MARGEN_INFERIOR, SubtitleTrack, _cortes_equilibrados, _cortes_voraces,
+                                cabe_en_lineas, estilo_subtitulos_video, obtener_sprite, partir_lineas)
+
+TEXTO_LARGO = "Los muros de la catedral resistieron varios terremotos sin apenas daños"
+
+
+def test_cortes_voraces_y_equilibrados():
+    # Cuatro palabras de 10 px separadas por 1 px, en líneas de 32 px
+    inicios = [0, 11, 22, 33]
+    finales = [10, 21, 32, 43]
+
+    assert _cortes_voraces(inicios, finales, 32) == [0, 3, 4]
+    # Mismo número de líneas, pero dos y dos en lugar de tres y una
+    assert _cortes_equilibrados(inicios, finales, 32) == [0, 2, 4]
+    assert _cortes_equilibrados(inicios, finales, 50) == [0, 4]
+
+
+def test_partir_lineas_cabe_con_el_borde():
+    for grosor in (1, 6, 12):
+        estilo = estilo_subtitulos_video((1920, 1080), stroke_width=grosor)
+        lineas = partir_lineas(TEXTO_LARGO, estilo)
+
+        assert " ".join(lineas) == TEXTO_LARGO
+        assert len(lineas) == 2
+        assert obtener_sprite(TEXTO_LARGO, estilo).shape[1] <= estilo.max_width
+
+
+def test_partir_lineas_respeta_los_saltos_del_texto():
+    estilo = estilo_subtitulos_video((1920, 1080))
+    assert partir_lineas("Hola\nmundo", estilo) == ["Hola", "mundo"]
+
+
+def test_cabe_en_lineas():
+    estilo = estilo_subtitulos_video((1920, 1080))
+    assert cabe_en_lineas(TEXTO_LARGO, estilo, 2)
+    assert not cabe_en_lineas(TEXTO_LARGO, estilo, 1)
+    assert not cabe_en_lineas(f"{TEXTO_LARGO} {TEXTO_LARGO}", estilo, 2)
+
+
+def test_subtitulo_de_dos_lineas_queda_sobre_el_margen_inferior():
+    estilo = estilo_subtitulos_video((1920, 1080))
+    sprite = obtener_sprite(TEXTO_LARGO, estilo)
+    limite = 1080 - round(1080 * MARGEN_INFERIOR)
+
+    for position in [('center', 'bottom'), ('center', 0.9)]:
+        track = SubtitleTrack([(0.0, 2.0, sprite)], (1920, 1080), position, position_relative=True)
+        (_, x, y), = track.activos(1.0)
+        assert y >= 0 and y + sprite.shape[0] <= limite
+        assert x == (1920 - sprite.shape[1]) // 2
+    assert track.activos(2.5) == ()
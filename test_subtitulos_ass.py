@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# test_subtitulos_ass.py: formato de tiempos, escapado del filtro y anclaje de los subtítulos ASS
+
+from datetime import timedelta
+
+import srt
+
+from sprites_subtitulos import MARGEN_INFERIOR, estilo_subtitulos_video
+from subtitulos_ass import _escapar_opcion, color_ass, escribir_ass, filtro_ass, tiempo_ass, tiempo_vtt
+
+
+def test_tiempo_ass():
+    assert tiempo_ass(0) == "0:00:00.00"
+    assert tiempo_ass(61.234) == "0:01:01.23"
+    # El redondeo a centésimas puede pasar al minuto siguiente
+    assert tiempo_ass(59.996) == "0:01:00.00"
+    assert tiempo_ass(3723.5) == "1:02:03.50"
+    assert tiempo_ass(-1) == "0:00:00.00"
+
+
+def test_tiempo_vtt():
+    assert tiempo_vtt(3723.5) == "01:02:03.500"
+
+
+def test_color_ass():
+    # ASS guarda los colores como &HAABBGGRR
+    assert color_ass('red') == "&H000000FF"
+    assert color_ass('#0080ff', alfa=255) == "&HFFFF8000"
+
+
+def test_escapar_opcion():
+    assert _escapar_opcion("/tmp/subs.ass") == "/tmp/subs.ass"
+    # Primer nivel (opción del filtro): \ ' :  -  segundo nivel (filtergraph): \ ' [ ] , ;
+    assert _escapar_opcion("/tmp/a:b/it's [1].ass") == r"/tmp/a\\:b/it\\\'s \[1\].ass"
+
+
+def test_filtro_ass():
+    assert filtro_ass("/tmp/subs.ass") == "ass=filename=/tmp/subs.ass"
+    assert filtro_ass("/tmp/subs.ass", "/tmp/fonts") == "ass=filename=/tmp/subs.ass:fontsdir=/tmp/fonts"
+
+
+def test_escribir_ass_ancla_por_abajo_los_subtitulos_largos(tmp_path):
+    estilo = estilo_subtitulos_video((1920, 1080))
+    subtitulos = [
+        srt.Subtitle(1, timedelta(seconds=0), timedelta(seconds=2), "Hola {mundo}"),
+        srt.Subtitle(2, timedelta(seconds=2), timedelta(seconds=4),
+                     "Los muros de la catedral resistieron varios terremotos sin apenas daños"),
+        srt.Subtitle(3, timedelta(seconds=9), timedelta(seconds=10), "Fuera del vídeo"),
+    ]
+    limite = 1080 - round(1080 * MARGEN_INFERIOR)
+
+    ruta = escribir_ass(subtitulos, tmp_path / "subs.ass", estilo, (1920, 1080), duracion=5,
+                        position=('center', 0.8), position_relative=True)
+
+    dialogos = [l for l in ruta.read_text(encoding='utf-8').splitlines() if l.startswith('Dialogue:')]
+    assert len(dialogos) == 2
+    # Una línea cabe bajo y = 0.8 del alto; dos líneas se anclan por abajo en el margen
+    assert dialogos[0].endswith("{\\pos(960,864)}Hola \\{mundo\\}")
+    assert f"{{\\an2\\pos(960,{limite})}}" in dialogos[1]
+    assert "\\N" in dialogos[1]
+
+    ruta = escribir_ass(subtitulos[1:2], tmp_path / "abajo.ass", estilo, (1920, 1080))
+    contenido = ruta.read_text(encoding='utf-8')
+    assert f"{{\\pos(960,{limite})}}" in contenido
+    assert ",2,0,0,0,1" in contenido  # Alineación \an2 en el estilo
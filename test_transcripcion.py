@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# test_transcripcion.py: modelo con el que el servicio alinea los guiones conocidos
+
+from types import SimpleNamespace
+
+import pytest
+import srt
+
+import transcripcion
+from transcripcion import TranscriptionService, tamano_modelo
+
+GUION = "Hola mundo. Adiós."
+
+
+class FakeWhisperModel:
+    """WhisperModel simulado: registra qué modelos se cargan y cuántas veces transcribe cada uno."""
+    cargados = []
+    llamadas = []
+
+    def __init__(self, nombre, **kwargs):
+        self.nombre = nombre
+        FakeWhisperModel.cargados.append(nombre)
+
+    def transcribe(self, audio, **opciones):
+        FakeWhisperModel.llamadas.append((self.nombre, opciones['beam_size']))
+        palabras = [SimpleNamespace(word=" Hola", start=0.0, end=0.4, probability=0.9),
+                    SimpleNamespace(word=" mundo.", start=0.5, end=0.9, probability=0.9),
+                    SimpleNamespace(word=" Adiós.", start=1.5, end=2.0, probability=0.9)]
+        segmentos = [SimpleNamespace(start=0.0, end=2.0, text=GUION, words=palabras)]
+        return iter(segmentos), SimpleNamespace(language='es', language_probability=0.99)
+
+
+@pytest.fixture
+def proyecto(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcripcion, 'WHISPER_AVAILABLE', True)
+    monkeypatch.setattr(transcripcion, 'WhisperModel', FakeWhisperModel)
+    FakeWhisperModel.cargados = []
+    FakeWhisperModel.llamadas = []
+    (tmp_path / "voz.mp3").write_bytes(b"audio")
+    (tmp_path / "guion.txt").write_text(GUION, encoding='utf-8')
+    return tmp_path
+
+
+def test_tamano_modelo():
+    assert tamano_modelo('tiny.en') < tamano_modelo('base') < tamano_modelo('medium') < tamano_modelo('large-v3')
+    assert tamano_modelo('/modelos/propio') == tamano_modelo('large-v3') + 1
+
+
+def test_alinear_guion_usa_el_modelo_pequeno(proyecto):
+    servicio = TranscriptionService('large-v3', num_workers=1, cpu_threads=1, cache_dir=proyecto / "cache")
+
+    assert servicio.alinear_guion(proyecto / "voz.mp3", proyecto / "voz.srt", proyecto / "guion.txt")
+
+    assert FakeWhisperModel.cargados == ['base']
+    assert FakeWhisperModel.llamadas == [('base', 1)]
+    with open(proyecto / "voz.srt", encoding='utf-8') as f:
+        assert [s.content for s in srt.parse(f.read())] == ["Hola mundo.", "Adiós."]
+
+    # La transcripción completa usa el modelo grande y no reutiliza la caché de la alineación
+    assert servicio.transcribir_palabras(proyecto / "voz.mp3")
+    assert FakeWhisperModel.cargados == ['base', 'large-v3']
+    assert FakeWhisperModel.llamadas == [('base', 1), ('large-v3', 5)]
+
+
+def test_alinear_guion_reutiliza_un_modelo_que_ya_es_pequeno(proyecto):
+    servicio = TranscriptionService('tiny', num_workers=1, cpu_threads=1, cache_dir=proyecto / "cache")
+
+    assert servicio.alinear_guion(proyecto / "voz.mp3", proyecto / "voz.srt", proyecto / "guion.txt")
+    servicio.transcribir_palabras(proyecto / "voz.mp3")
+
+    assert FakeWhisperModel.cargados == ['tiny']
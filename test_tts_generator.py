@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# test_tts_generator.py: concatenación de chunks y SRT desde los límites de palabra del TTS,
+# con un backend simulado (sin red ni edge-tts)
+
+import asyncio
+import io
+
+import srt
+from pydub import AudioSegment
+
+import tts_generator
+from subtitles import cargar_palabras
+
+
+def audio_wav(duracion_ms):
+    """Audio WAV de silencio de la duración indicada, en bytes."""
+    salida = io.BytesIO()
+    AudioSegment.silent(duration=duracion_ms, frame_rate=16000).export(salida, format='wav')
+    return salida.getvalue()
+
+
+class FakeBackend:
+    """Backend con el método `synthesize` de EdgeTTSBackend: 0.25 s por palabra."""
+    def __init__(self):
+        self.textos = []
+
+    async def synthesize(self, text, voice):
+        self.textos.append(text)
+        palabras = [p.strip('.,;:¡!¿?') for p in text.split()]
+        limites = [(palabra, i * 0.25, 0.2) for i, palabra in enumerate(palabras)]
+        return audio_wav(len(palabras) * 250), limites
+
+
+def test_concatenate_audio_offsets(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_generator, 'OUTPUT_FORMAT', 'wav')
+    archivos = []
+    for i, duracion in enumerate([500, 1200, None, 300]):
+        ruta = tmp_path / f"chunk_{i}.wav"
+        ruta.write_bytes(audio_wav(duracion) if duracion else b'no es audio')
+        archivos.append(str(ruta))
+
+    salida = tmp_path / "final.wav"
+    offsets = tts_generator.concatenate_audio(archivos, str(salida))
+
+    # El archivo que no se puede leer no desplaza a los siguientes
+    assert offsets == [0.0, 0.5, None, 1.7]
+    assert len(AudioSegment.from_wav(salida)) == 2000
+
+
+def test_concatenate_audio_sin_archivos(tmp_path):
+    assert tts_generator.concatenate_audio([], str(tmp_path / "final.wav")) is None
+
+
+def test_write_srt_from_boundaries(tmp_path):
+    guion = "Hola, mundo. ¿Qué tal?"
+    palabras = [('Hola', 0.0, 0.4), ('mundo', 0.5, 0.9), ('Qué', 1.5, 1.7), ('tal', 1.8, 2.1)]
+    archivo_srt = tmp_path / "voz.srt"
+
+    assert tts_generator.write_srt_from_boundaries(guion, palabras, str(archivo_srt))
+
+    subtitulos = list(srt.parse(archivo_srt.read_text(encoding='utf-8')))
+    # El texto conserva la puntuación del guion; los tiempos son los del TTS
+    assert " ".join(s.content.replace('\n', ' ') for s in subtitulos) == guion
+    assert subtitulos[0].start.total_seconds() == 0.0
+    assert subtitulos[-1].end.total_seconds() == 2.1
+    lineas = cargar_palabras(archivo_srt)
+    assert [p for _, _, linea in lineas for p in linea] == [
+        ('Hola,', 0.0, 0.4), ('mundo.', 0.5, 0.9), ('¿Qué', 1.5, 1.7), ('tal?', 1.8, 2.1)]
+
+
+def test_write_srt_from_boundaries_sin_limites(tmp_path):
+    archivo_srt = tmp_path / "voz.srt"
+    assert not tts_generator.write_srt_from_boundaries("Hola mundo", [], str(archivo_srt))
+    assert not archivo_srt.exists()
+
+
+def test_create_voiceover_desplaza_cada_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_generator, 'OUTPUT_FORMAT', 'wav')
+    monkeypatch.setattr(tts_generator, 'TEMP_AUDIO_DIR', str(tmp_path / "chunks"))
+    monkeypatch.setattr(tts_generator, 'MAX_CHUNK_CHARS', 20)
+    guion = tmp_path / "guion.txt"
+    guion.write_text("Uno dos tres cuatro.\n\nCinco seis siete.", encoding='utf-8')
+    backend = FakeBackend()
+
+    resultado = asyncio.run(tts_generator.create_voiceover_from_script(
+        str(guion), str(tmp_path / "voz.wav"), output_srt_path=str(tmp_path / "voz.srt"), backend=backend))
+
+    assert resultado == str(tmp_path / "voz.wav")
+    assert backend.textos == ["Uno dos tres cuatro.", "Cinco seis siete."]
+    assert len(AudioSegment.from_wav(resultado)) == 1750
+    palabras = [p for _, _, linea in cargar_palabras(tmp_path / "voz.srt") for p in linea]
+    # Las palabras del segundo chunk empiezan donde termina el audio del primero (1 s)
+    assert [(p, inicio) for p, inicio, _ in palabras] == [
+        ('Uno', 0.0), ('dos', 0.25), ('tres', 0.5), ('cuatro.', 0.75),
+        ('Cinco', 1.0), ('seis', 1.25), ('siete.', 1.5)]
+    assert not (tmp_path / "chunks").exists()
@@ -0,0 +1,304 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from alineacion import generar_srt_desde_guion
+from cache_transcripcion import transcribir_en_cache
+from sprites_subtitulos import estilo_subtitulos_video
+from subtitles import generate_srt_with_whisper, WHISPER_AVAILABLE, WhisperModel
+
+# Opciones de decodificación por defecto (las de faster-whisper para transcribe)
+BEAM_SIZE = 5
+BEST_OF = 5
+# Pausas que el filtro VAD (Silero) deja fuera de la transcripción, en milisegundos
+SILENCIO_MINIMO_VAD_MS = 500
+# Hilos de CTranslate2 por transcripción: por encima de 4 casi no escala, así que con
+# más núcleos es mejor transcribir varios archivos a la vez
+HILOS_POR_TRANSCRIPCION = 4
+# Modelo con el que se alinea un guion conocido: Whisper solo aporta los tiempos de las
+# palabras, y un modelo pequeño los da igual de bien en una fracción del tiempo
+MODELO_ALINEACION = 'base'
+# Modelos de Whisper de menor a mayor (las variantes '.en', '-v3'... van con su tamaño)
+TAMANOS_MODELO = ('tiny', 'base', 'small', 'medium', 'large')
+
+
+def reparto_hilos(num_workers=None, cpu_threads=None):
+    """
+    Reparte los núcleos de la máquina entre transcripciones simultáneas.
+
+    Returns:
+        Tupla (num_workers, cpu_threads): transcripciones en paralelo y hilos de cada una.
+    """
+    nucleos = os.cpu_count() or 1
+    if num_workers is None:
+        num_workers = max(1, nucleos // (cpu_threads or HILOS_POR_TRANSCRIPCION))
+    if cpu_threads is None:
+        cpu_threads = max(1, nucleos // num_workers)
+    return int(num_workers), int(cpu_threads)
+
+
+def tamano_modelo(nombre):
+    """
+    Posición del modelo en TAMANOS_MODELO ('large-v3' -> 4). Los modelos que no se
+    reconocen (rutas locales, 'distil-...') se consideran grandes.
+    """
+    for i, tamano in enumerate(TAMANOS_MODELO):
+        if str(nombre).startswith(tamano):
+            return i
+    return len(TAMANOS_MODELO)
+
+
+class TranscriptionService:
+    """
+    Servicio de transcripción con Whisper para muchos archivos de audio.
+
+    Carga un único modelo de faster-whisper con `num_workers` trabajadores (CTranslate2
+    libera el GIL, así que varias transcripciones avanzan a la vez desde hilos
+    distintos) y reparte los archivos en un pool del mismo tamaño. El filtro VAD
+    descarta los silencios antes de decodificar, y beam_size/best_of se pueden bajar
+    para ganar velocidad.
+    """
+    def __init__(self, model_size='base', device='cpu', compute_type='int8', language='es',
+                 beam_size=BEAM_SIZE, best_of=BEST_OF, vad_filter=True, vad_parameters=None,
+                 cpu_threads=None, num_workers=None, word_timestamps=True, model=None, cache_dir=None,
+                 estilo_subtitulos=None, modelo_alineacion=MODELO_ALINEACION):
+        """
+        Args:
+            model_size: Modelo de Whisper ('tiny', 'base', 'small', 'medium', 'large-v3').
+            device: 'cpu' o 'cuda'.
+            compute_type: Tipo de cálculo de CTranslate2 ('int8' en CPU).
+            language: Idioma por defecto ('auto' para detectarlo).
+            beam_size: Haces de la búsqueda (1 = decodificación voraz, la más rápida).
+            best_of: Candidatos al muestrear con temperatura > 0.
+            vad_filter: Saltar los silencios con el VAD de faster-whisper.
+            vad_parameters: Opciones del VAD (por defecto, pausas de SILENCIO_MINIMO_VAD_MS).
+            cpu_threads: Hilos de cada transcripción (por defecto, núcleos / num_workers).
+            num_workers: Transcripciones simultáneas (por defecto, según los núcleos).
+            word_timestamps: Obtener tiempos por palabra (necesarios para agrupar líneas).
+            model: WhisperModel ya cargado, para reutilizarlo en lugar de cargar otro
+                   (`model_size` debe ser el suyo: identifica las transcripciones en caché).
+            cache_dir: Carpeta de la caché de transcripciones (por defecto,
+                       .cache/transcripcion junto a cada audio).
+            estilo_subtitulos: SubtitleStyle con el que se quemarán los subtítulos; las
+                               palabras se agrupan por su ancho para que cada subtítulo
+                               quepa en pantalla (por defecto, el de un vídeo 1080p).
+            modelo_alineacion: Modelo con el que se alinean los guiones conocidos cuando
+                               `model_size` es más grande; se carga la primera vez que
+                               se alinea un guion.
+        """
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.language = language
+        self.beam_size = int(beam_size)
+        self.best_of = int(best_of)
+        self.vad_filter = vad_filter
+        self.vad_parameters = vad_parameters if vad_parameters is not None else {
+            'min_silence_duration_ms': SILENCIO_MINIMO_VAD_MS}
+        self.word_timestamps = word_timestamps
+        if device == 'cpu':
+            self.num_workers, self.cpu_threads = reparto_hilos(num_workers, cpu_threads)
+        else:
+            # En GPU las transcripciones comparten el dispositivo: más trabajadores no aceleran
+            self.num_workers, self.cpu_threads = int(num_workers or 1), int(cpu_threads or 1)
+        self.cache_dir = cache_dir
+        self.estilo_subtitulos = estilo_subtitulos or estilo_subtitulos_video()
+        self._modelo = model
+        self.modelo_alineacion = modelo_alineacion
+        self._modelo_alineacion = None
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __repr__(self):
+        return (f"TranscriptionService({self.model_size!r}, {self.device}/{self.compute_type}, "
+                f"{self.num_workers}x{self.cpu_threads} hilos, beam_size={self.beam_size}, "
+                f"best_of={self.best_of}, vad={self.vad_filter})")
+
+    def cargar_modelo(self):
+        """
+        Carga el modelo la primera vez que se necesita.
+
+        Returns:
+            El WhisperModel, o None si faster-whisper no está disponible o falló la carga.
+        """
+        with self._lock:
+            if self._modelo is None:
+                self._modelo = self._crear_modelo(self.model_size)
+            return self._modelo
+
+    def nombre_modelo_alineacion(self):
+        """
+        Nombre del modelo con el que se alinean los guiones: `modelo_alineacion`, o el
+        del servicio si no es más grande.
+        """
+        if not self.modelo_alineacion or tamano_modelo(self.model_size) <= tamano_modelo(self.modelo_alineacion):
+            return self.model_size
+        return self.modelo_alineacion
+
+    def cargar_modelo_alineacion(self):
+        """
+        Carga el modelo de alineación la primera vez que se necesita (si es el del
+        servicio, se reutiliza).
+
+        Returns:
+            El WhisperModel, o None si faster-whisper no está disponible o falló la carga.
+        """
+        if self.nombre_modelo_alineacion() == self.model_size:
+            return self.cargar_modelo()
+        with self._lock:
+            if self._modelo_alineacion is None:
+                self._modelo_alineacion = self._crear_modelo(self.modelo_alineacion)
+            return self._modelo_alineacion
+
+    def _crear_modelo(self, nombre):
+        """Carga un WhisperModel con la configuración del servicio (None si no se pudo)."""
+        if not WHISPER_AVAILABLE:
+            return None
+        print(f"Cargando modelo Whisper '{nombre}' ({self})...")
+        try:
+            return WhisperModel(nombre, device=self.device, compute_type=self.compute_type,
+                                cpu_threads=self.cpu_threads, num_workers=self.num_workers)
+        except Exception as e:
+            print(f"ERROR: No se pudo cargar el modelo Whisper: {e}")
+            return None
+
+    def opciones(self):
+        """Opciones de decodificación para WhisperModel.transcribe."""
+        opciones = {'beam_size': self.beam_size, 'best_of': self.best_of, 'vad_filter': self.vad_filter}
+        if self.vad_filter:
+            opciones['vad_parameters'] = dict(self.vad_parameters)
+        return opciones
+
+    def generar_srt(self, archivo_audio, archivo_srt, language=None):
+        """
+        Transcribe un archivo y escribe su SRT (y sus tiempos por palabra).
+
+        Returns:
+            True si el SRT se generó correctamente.
+        """
+        modelo = self.cargar_modelo()
+        if modelo is None:
+            print("ERROR SRT: Modelo Whisper no disponible.")
+            return False
+        inicio = time.perf_counter()
+        exito = generate_srt_with_whisper(modelo, str(archivo_audio), str(archivo_srt),
+                                          language=language or self.language,
+                                          word_timestamps=self.word_timestamps,
+                                          opciones_transcripcion=self.opciones(),
+                                          nombre_modelo=self.model_size, cache_dir=self.cache_dir,
+                                          estilo=self.estilo_subtitulos)
+        print(f"SRT de {Path(archivo_audio).name}: {time.perf_counter() - inicio:.1f} s")
+        return exito
+
+    def transcribir_palabras(self, archivo_audio, language=None, para_alinear=False, **opciones):
+        """
+        Transcribe un archivo y devuelve sus palabras con tiempos.
+
+        Args:
+            archivo_audio: Archivo de audio.
+            language: Idioma (por defecto, el del servicio).
+            para_alinear: Usar el modelo de alineación en lugar del del servicio.
+            **opciones: Opciones de transcribe que sustituyen a las del servicio.
+
+        Returns:
+            Lista de (palabra, inicio, fin), o None si no hay modelo o falló.
+        """
+        if para_alinear:
+            modelo, nombre_modelo = self.cargar_modelo_alineacion(), self.nombre_modelo_alineacion()
+        else:
+            modelo, nombre_modelo = self.cargar_modelo(), self.model_size
+        if modelo is None:
+            print("ERROR SRT: Modelo Whisper no disponible.")
+            return None
+        language = language or self.language
+        opciones = {**self.opciones(), **opciones, 'word_timestamps': True}
+        if language and language.lower() != 'auto':
+            opciones['language'] = language
+        try:
+            # La clave lleva el nombre del modelo: las transcripciones del modelo de
+            # alineación no se mezclan con las completas
+            segmentos, _ = transcribir_en_cache(modelo, archivo_audio, opciones, nombre_modelo=nombre_modelo,
+                                                cache_dir=self.cache_dir)
+            return [(w.word.strip(), w.start, w.end) for segmento in segmentos for w in segmento.words]
+        except Exception as e:
+            print(f"ERROR durante la transcripción de {Path(archivo_audio).name}: {e}")
+            return None
+
+    def alinear_guion(self, archivo_audio, archivo_srt, archivo_guion, language=None, usar_whisper=True):
+        """
+        Genera el SRT de una narración con el texto exacto de su guion. Whisper solo
+        aporta los tiempos, así que basta la decodificación voraz (beam_size=1) de un
+        modelo pequeño (`modelo_alineacion`, salvo que el del servicio ya lo sea); sin
+        Whisper se alinea por la energía de la voz.
+
+        Returns:
+            True si el SRT se generó correctamente.
+        """
+        inicio = time.perf_counter()
+        palabras = None
+        if usar_whisper and self.cargar_modelo_alineacion() is not None:
+            palabras = self.transcribir_palabras(archivo_audio, language, para_alinear=True,
+                                                 beam_size=1, best_of=1)
+        exito = generar_srt_desde_guion(archivo_guion, archivo_audio, archivo_srt, palabras_audio=palabras,
+                                        estilo=self.estilo_subtitulos)
+        print(f"Alineación de {Path(archivo_audio).name}: {time.perf_counter() - inicio:.1f} s")
+        return exito
+
+    def enviar(self, archivo_audio, archivo_srt, language=None, archivo_guion=None):
+        """
+        Encola la transcripción de un archivo en el pool sin esperar a que termine (la
+        cola de lotes sigue generando la voz del siguiente proyecto mientras tanto).
+        Con `archivo_guion`, el SRT se alinea con el texto del guion en lugar de
+        transcribirse.
+
+        Returns:
+            concurrent.futures.Future con el resultado (True si se generó el SRT).
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_workers,
+                                                    thread_name_prefix='whisper')
+            executor = self._executor
+        if archivo_guion and Path(archivo_guion).is_file():
+            return executor.submit(self.alinear_guion, archivo_audio, archivo_srt, archivo_guion, language)
+        return executor.submit(self.generar_srt, archivo_audio, archivo_srt, language)
+
+    def generar_srt_lote(self, trabajos, language=None):
+        """
+        Transcribe varios archivos a la vez.
+
+        Args:
+            trabajos: Lista de (archivo de audio, archivo SRT de salida), o de (audio, SRT,
+                      guion) para alinear con el texto del guion.
+            language: Idioma (por defecto, el del servicio).
+
+        Returns:
+            Lista de booleanos con el resultado de cada trabajo, en el mismo orden.
+        """
+        if not trabajos:
+            return []
+        # Si todos los trabajos tienen guion no hace falta el modelo del servicio
+        if not all(len(trabajo) > 2 for trabajo in trabajos) and self.cargar_modelo() is None:
+            print("ERROR SRT: Modelo Whisper no disponible.")
+            return [False] * len(trabajos)
+        inicio = time.perf_counter()
+        futuros = [self.enviar(audio, srt, language, *guion) for audio, srt, *guion in trabajos]
+        resultados = []
+        for futuro in futuros:
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                print(f"ERROR durante la transcripción: {e}")
+                resultados.append(False)
+        print(f"Transcripción por lotes: {sum(resultados)}/{len(trabajos)} SRT en "
+              f"{time.perf_counter() - inicio:.1f} s ({self})")
+        return resultados
+
+    def cerrar(self, esperar=True):
+        """Detiene el pool de transcripción (por defecto, tras terminar lo encolado)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=esperar)
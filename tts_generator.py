@@ -1,9 +1,13 @@
 import asyncio
-import edge_tts
 import os
 from pathlib import Path
 from pydub import AudioSegment
 
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
+
 # --- Configuración ---
 # Puedes obtener la lista de voces con: edge-tts --list-voices
 # Ejemplo: es-ES-ElviraNeural (España), es-MX-DaliaNeural (México), es-AR-ElenaNeural (Argentina)
@@ -11,6 +15,7 @@ DEFAULT_VOICE = "es-EC-LuisNeural"
 MAX_CHUNK_CHARS = 4000  # Límite de caracteres por chunk (ajusta si es necesario)
 TEMP_AUDIO_DIR = "temp_audio_chunks" # Directorio para archivos temporales
 OUTPUT_FORMAT = "mp3" # Formato de salida final y de los chunks
+TICKS_POR_SEGUNDO = 10_000_000  # edge-tts da los tiempos de las palabras en unidades de 100 ns
 
 # --- Funciones ---
 
@@ -52,23 +57,58 @@ def split_text_into_chunks(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[
     print(f"Texto dividido en {len(chunks)} chunks.")
     return chunks
 
-async def text_chunk_to_speech(text: str, voice: str, output_path: str):
+class EdgeTTSBackend:
+    """
+    Síntesis con edge-tts. Cualquier objeto con el mismo método `synthesize` puede
+    sustituirlo (otro servicio de voz, o uno simulado para pruebas sin red).
     """
-    Convierte un único chunk de texto a audio usando edge-tts.
+    async def synthesize(self, text: str, voice: str):
+        """
+        Sintetiza el texto y recoge los eventos WordBoundary del stream.
+
+        Returns:
+            Tupla (audio MP3 en bytes, [(palabra, inicio, duración), ...]) con los
+            tiempos en segundos desde el inicio del audio.
+        """
+        if edge_tts is None:
+            raise RuntimeError("edge-tts no está instalado (pip install edge-tts)")
+        try:
+            communicate = edge_tts.Communicate(text, voice, boundary="WordBoundary")
+        except TypeError:
+            # edge-tts < 7 emite WordBoundary sin pedirlo
+            communicate = edge_tts.Communicate(text, voice)
+        audio = bytearray()
+        limites = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio += chunk["data"]
+            elif chunk["type"] == "WordBoundary":
+                limites.append((chunk["text"], chunk["offset"] / TICKS_POR_SEGUNDO,
+                                chunk["duration"] / TICKS_POR_SEGUNDO))
+        return bytes(audio), limites
+
+async def text_chunk_to_speech(text: str, voice: str, output_path: str, backend=None):
     """
+    Convierte un único chunk de texto a audio usando edge-tts (o el backend indicado).
+    Devuelve los límites de palabra del chunk, o None si falló.
+    """
+    backend = backend or EdgeTTSBackend()
     try:
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(output_path)
-        print(f"Chunk de audio guardado en: {output_path}")
+        audio, limites = await backend.synthesize(text, voice)
+        with open(output_path, 'wb') as f:
+            f.write(audio)
+        print(f"Chunk de audio guardado en: {output_path} ({len(limites)} palabras con tiempos)")
+        return limites
     except Exception as e:
         print(f"Error generando audio para chunk: {e}")
         # Podrías querer manejar este error de forma más robusta
         # (e.g., reintentar, registrar, devolver un indicador de error)
+        return None
 
-async def generate_speech_for_chunks(chunks: list[str], voice: str, temp_dir: str) -> list[str]:
+async def generate_speech_for_chunks(chunks: list[str], voice: str, temp_dir: str, backend=None) -> list[tuple]:
     """
     Genera archivos de audio para una lista de chunks de texto de forma asíncrona.
-    Devuelve la lista de rutas a los archivos de audio generados.
+    Devuelve una lista de (ruta, límites de palabra) de los archivos generados.
     """
     temp_path = Path(temp_dir)
     temp_path.mkdir(parents=True, exist_ok=True) # Asegura que el directorio exista
@@ -79,27 +119,31 @@ async def generate_speech_for_chunks(chunks: list[str], voice: str, temp_dir: st
         output_file = temp_path / f"chunk_{i+1}.{OUTPUT_FORMAT}"
         chunk_files.append(str(output_file))
         # Crea la tarea asíncrona para generar el audio de este chunk
-        tasks.append(text_chunk_to_speech(chunk, voice, str(output_file)))
+        tasks.append(text_chunk_to_speech(chunk, voice, str(output_file), backend))
 
     # Ejecuta todas las tareas de generación de audio concurrentemente
-    await asyncio.gather(*tasks)
+    limites = await asyncio.gather(*tasks)
 
     # Verifica si realmente se crearon los archivos (importante si text_chunk_to_speech puede fallar)
-    existing_files = [f for f in chunk_files if Path(f).is_file()]
+    existing_files = [(f, l or []) for f, l in zip(chunk_files, limites) if l is not None and Path(f).is_file()]
     print(f"Generados {len(existing_files)} archivos de audio en {temp_dir}.")
     return existing_files # Devuelve solo los archivos que existen
 
 def concatenate_audio(file_list: list[str], output_filename: str):
     """
     Concatena una lista de archivos de audio en uno solo usando pydub.
+    Devuelve el instante (en segundos) en que empieza cada archivo en el audio final
+    (None para los que no se pudieron añadir), o None si falló.
     """
     if not file_list:
         print("No hay archivos de audio para concatenar.")
-        return False
+        return None
 
     combined = AudioSegment.empty()
+    offsets = []
     print("Concatenando archivos de audio...")
     for file_path in file_list:
+        offsets.append(None)
         try:
             # Asume formato MP3 basado en OUTPUT_FORMAT, ajusta si usas otro
             if OUTPUT_FORMAT == "mp3":
@@ -111,6 +155,7 @@ def concatenate_audio(file_list: list[str], output_filename: str):
                  print(f"Formato {OUTPUT_FORMAT} no soportado directamente para carga. Usando detección automática.")
                  segment = AudioSegment.from_file(file_path) # Intenta detectar
 
+            offsets[-1] = len(combined) / 1000.0
             combined += segment
             print(f" - Añadido {Path(file_path).name}")
         except Exception as e:
@@ -120,10 +165,41 @@ def concatenate_audio(file_list: list[str], output_filename: str):
     try:
         combined.export(output_filename, format=OUTPUT_FORMAT)
         print(f"Audio final guardado en: {output_filename}")
-        return True
+        return offsets
     except Exception as e:
         print(f"Error al exportar el audio final: {e}")
+        return None
+
+def write_srt_from_boundaries(script_text: str, palabras: list[tuple], output_srt_path: str,
+                              estilo=None) -> bool:
+    """
+    Escribe el SRT de la narración con los límites de palabra de la síntesis: los
+    tiempos son los del propio TTS (no hace falta Whisper) y el texto es el del guion,
+    con su puntuación (edge-tts da las palabras sin ella).
+
+    Args:
+        script_text: Texto del guion.
+        palabras: Lista de (palabra, inicio, fin) en segundos del audio final.
+        output_srt_path: Ruta del SRT.
+        estilo: SubtitleStyle del render para agrupar por ancho (por defecto, el de 1080p).
+    """
+    # Importación diferida: alineacion carga el análisis de audio y los subtítulos
+    from alineacion import alinear_con_transcripcion, escribir_srt_palabras, palabras_guion
+    from sprites_subtitulos import estilo_subtitulos_video
+
+    guion = palabras_guion(script_text)
+    if not palabras or not guion:
+        print("No hay límites de palabra del TTS; no se escribe el SRT.")
+        return False
+    alineadas, coincidencia = alinear_con_transcripcion(guion, palabras)
+    try:
+        entradas = escribir_srt_palabras(alineadas, output_srt_path, estilo=estilo or estilo_subtitulos_video())
+    except OSError as e:
+        print(f"Error al escribir el SRT {output_srt_path}: {e}")
         return False
+    print(f"SRT desde los límites de palabra del TTS: {entradas} entradas en {output_srt_path} "
+          f"({coincidencia:.0%} de las palabras del guion con tiempo propio)")
+    return True
 
 def cleanup_files(file_list: list[str], temp_dir: str):
     """
@@ -146,9 +222,15 @@ def cleanup_files(file_list: list[str], temp_dir: str):
 
 # --- Función Principal de Orquestación ---
 
-async def create_voiceover_from_script(script_path: str, output_audio_path: str, voice: str = DEFAULT_VOICE):
+async def create_voiceover_from_script(script_path: str, output_audio_path: str, voice: str = DEFAULT_VOICE,
+                                       output_srt_path: str = None, backend=None, estilo_subtitulos=None):
     """
     Orquesta el proceso completo: leer guion, dividir, generar TTS, concatenar y limpiar.
+    Con `output_srt_path` escribe además los subtítulos con los límites de palabra de
+    la síntesis, desplazados al instante en que empieza cada chunk en el audio final.
+    `backend` sustituye a EdgeTTSBackend (p. ej. para pruebas sin red).
+    `estilo_subtitulos` es el SubtitleStyle con el que se quemarán los subtítulos: las
+    palabras se agrupan por su ancho con él (por defecto, el de un vídeo 1080p).
     """
     print(f"Iniciando generación de voz en off para: {script_path}")
     # 1. Leer el guion
@@ -172,18 +254,27 @@ async def create_voiceover_from_script(script_path: str, output_audio_path: str,
         return None
 
     # 3. Generar audio para cada chunk
-    temp_audio_files = await generate_speech_for_chunks(chunks, voice, TEMP_AUDIO_DIR)
+    generated = await generate_speech_for_chunks(chunks, voice, TEMP_AUDIO_DIR, backend)
+    temp_audio_files = [f for f, _ in generated]
     if not temp_audio_files:
         print("Error: No se generaron archivos de audio para los chunks.")
         cleanup_files([], TEMP_AUDIO_DIR) # Intenta limpiar el directorio si se creó
         return None
 
     # 4. Concatenar audios
-    success = concatenate_audio(temp_audio_files, output_audio_path)
+    offsets = concatenate_audio(temp_audio_files, output_audio_path)
+    success = offsets is not None
 
     # 5. Limpiar archivos temporales
     cleanup_files(temp_audio_files, TEMP_AUDIO_DIR)
 
+    # 6. Subtítulos con los tiempos de la síntesis (cada chunk desplazado a su inicio)
+    if success and output_srt_path:
+        palabras = [(palabra, offset + inicio, offset + inicio + duracion)
+                    for (_, limites), offset in zip(generated, offsets) if offset is not None
+                    for palabra, inicio, duracion in limites]
+        write_srt_from_boundaries(script_text, palabras, output_srt_path, estilo=estilo_subtitulos)
+
     if success:
         print(f"¡Voz en off generada exitosamente en {output_audio_path}!")
         return output_audio_path # Devuelve la ruta del archivo final
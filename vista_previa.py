@@ -0,0 +1,181 @@
+import os
+import random
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from ingesta import cargar_imagen
+
+# Resolución del lienzo de la vista previa
+TAMANO_PREVIEW = (640, 360)
+# Paso de tiempo de la vista previa: los instantes se redondean a 1/12 s para
+# reutilizar los frames ya renderizados al arrastrar el deslizador
+FPS_PREVIEW = 12
+# Número de frames y miniaturas que se guardan en memoria
+MAX_FRAMES_CACHE = 48
+
+
+class PreviewRenderer:
+    """
+    Renderiza frames de la línea de tiempo real (efectos, transiciones y overlays)
+    a la resolución del lienzo, en un hilo en segundo plano.
+
+    La línea de tiempo se construye con la misma función que el render final, con las
+    imágenes normalizadas al tamaño del lienzo y los efectos en calidad 'draft', y solo
+    se reconstruye cuando cambian las imágenes o los parámetros. Las peticiones se
+    atienden en orden inverso: si llegan varias mientras se renderiza un frame, solo se
+    procesa la última, de modo que arrastrar el deslizador no acumula trabajo.
+    """
+
+    def __init__(self, tamano=TAMANO_PREVIEW, on_frame=None, max_frames=MAX_FRAMES_CACHE):
+        """
+        Args:
+            tamano: Tamaño (ancho, alto) de los frames renderizados.
+            on_frame: Callback on_frame(t, imagen, duracion) llamado desde el hilo de
+                      render cuando un frame está listo (imagen es None si falló).
+            max_frames: Tamaño máximo de la caché LRU de frames renderizados.
+        """
+        self.tamano = (int(tamano[0]), int(tamano[1]))
+        self.on_frame = on_frame
+        self.max_frames = max_frames
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._condicion = threading.Condition()
+        self._peticion = None
+        self._configuracion = None
+        self._clave_configuracion = None
+        self._video = None
+        self._clave_video = None
+        self._hilo = None
+        self._detener = False
+
+    @property
+    def duration(self):
+        """Duración de la línea de tiempo construida, o None si aún no existe."""
+        return self._video.duration if self._video is not None else None
+
+    def configure(self, archivos, parametros, semilla=None):
+        """
+        Establece las imágenes y los parámetros de la línea de tiempo a previsualizar.
+
+        Args:
+            archivos: Lista ordenada de rutas de imágenes.
+            parametros: Argumentos para app.construir_linea_de_tiempo (efectos,
+                        transiciones, fades, overlays y settings).
+            semilla: Semilla de los efectos aleatorios; usar la misma que el render
+                     final para ver las mismas direcciones de Ken Burns.
+        """
+        clave = (tuple(archivos), repr(sorted(parametros.items())), semilla)
+        with self._condicion:
+            if clave != self._clave_configuracion:
+                self._configuracion = (list(archivos), dict(parametros), semilla)
+                self._clave_configuracion = clave
+
+    def request_frame(self, t):
+        """Pide el frame del instante t; el resultado llega por on_frame."""
+        with self._condicion:
+            self._peticion = t
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle_render, daemon=True)
+                self._hilo.start()
+            self._condicion.notify()
+
+    def shutdown(self):
+        """Detiene el hilo de render."""
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify()
+
+    def thumbnail(self, archivo):
+        """
+        Devuelve una miniatura de la imagen ajustada al lienzo. Los JPEG se decodifican
+        a escala reducida y el resultado se guarda en la caché LRU.
+        """
+        st = os.stat(archivo)
+        clave = ('miniatura', os.path.abspath(archivo), st.st_mtime_ns, self.tamano)
+        imagen = self._obtener_cache(clave)
+        if imagen is None:
+            img = cargar_imagen(archivo, self.tamano)
+            imagen = ImageOps.contain(img, self.tamano, method=Image.Resampling.BILINEAR)
+            img.close()
+            self._guardar_cache(clave, imagen)
+        return imagen
+
+    def render_frame(self, t):
+        """
+        Renderiza el frame del instante t de forma síncrona.
+
+        Returns:
+            Imagen PIL del tamaño del lienzo, o None si no hay línea de tiempo.
+        """
+        video = self._obtener_video()
+        if video is None:
+            return None
+        t = min(max(0.0, t), max(0.0, video.duration - 1.0 / FPS_PREVIEW))
+        paso = round(t * FPS_PREVIEW)
+        clave = ('frame', self._clave_video, paso)
+        imagen = self._obtener_cache(clave)
+        if imagen is None:
+            frame = video.get_frame(paso / FPS_PREVIEW)
+            imagen = Image.fromarray(np.clip(frame, 0, 255).astype('uint8'))
+            self._guardar_cache(clave, imagen)
+        return imagen
+
+    def _obtener_video(self):
+        """Construye (o reutiliza) la línea de tiempo para la configuración actual."""
+        with self._condicion:
+            configuracion = self._configuracion
+            clave = self._clave_configuracion
+        if configuracion is None:
+            return None
+        if clave == self._clave_video:
+            return self._video
+
+        # Importación diferida: app importa moviepy y el resto de módulos de render
+        from app import construir_linea_de_tiempo
+
+        archivos, parametros, semilla = configuracion
+        if not archivos:
+            return None
+        self._video = construir_linea_de_tiempo(
+            archivos,
+            tamano_salida=self.tamano,
+            ajustes_calidad={'quality': 'draft'},
+            rng_efectos=random.Random(semilla),
+            cache_dir=Path(archivos[0]).parent / '.cache' / 'preview',
+            **parametros)
+        self._clave_video = clave
+        return self._video
+
+    def _bucle_render(self):
+        while True:
+            with self._condicion:
+                while self._peticion is None and not self._detener:
+                    self._condicion.wait()
+                if self._detener:
+                    return
+                t, self._peticion = self._peticion, None
+            try:
+                imagen = self.render_frame(t)
+            except Exception as e:
+                print(f"Error al renderizar la vista previa en t={t:.2f}s: {e}")
+                imagen = None
+            if self.on_frame:
+                self.on_frame(t, imagen, self.duration)
+
+    def _obtener_cache(self, clave):
+        with self._cache_lock:
+            imagen = self._cache.get(clave)
+            if imagen is not None:
+                self._cache.move_to_end(clave)
+            return imagen
+
+    def _guardar_cache(self, clave, imagen):
+        with self._cache_lock:
+            self._cache[clave] = imagen
+            self._cache.move_to_end(clave)
+            while len(self._cache) > self.max_frames:
+                self._cache.popitem(last=False)